@@ -0,0 +1,111 @@
+"""
+🔤 Benchmark - Índice léxico BM25
+
+Construye el índice BM25 de una categoría a partir de sus PDFs (mismo chunking
+que la API) y mide la latencia por consulta y el primer resultado para
+consultas con términos exactos (no usa OpenAI ni la API).
+
+Uso:
+    python benchmark_bm25.py --category old_compliance --repeticiones 200
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from lexical_index import BM25Index
+
+CONSULTAS = [
+    "Ley 16744",
+    "¿Qué establece la ley 16.744 sobre accidentes del trabajo?",
+    "DS132",
+    "Reglamento de seguridad minera DS 132",
+    "Ley 20551 cierre de faenas",
+    "Ley 19300",
+    "servicios mínimos en minería"
+]
+
+
+def cargar_chunks(category: str):
+    """Chunks de todos los PDFs de la categoría."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
+    chunks = []
+    for pdf in sorted(glob.glob(f"docs/{category}/*.pdf")):
+        try:
+            chunks.extend(splitter.split_documents(PyPDFLoader(pdf).load()))
+        except Exception as e:
+            print(f"⚠️  {os.path.basename(pdf)}: {e}")
+    return chunks
+
+
+def ejecutar_benchmark(category: str, repeticiones: int, k: int):
+    print("\n" + "=" * 70)
+    print(f"🔤 BENCHMARK BM25 - categoría '{category}'")
+    print("=" * 70)
+
+    chunks = cargar_chunks(category)
+    print(f"\n📄 {len(chunks)} chunks")
+
+    directorio = tempfile.mkdtemp(prefix="bench_bm25_")
+    try:
+        # Colección temporal solo con textos (BM25 no usa embeddings)
+        coleccion = chromadb.EphemeralClient().get_or_create_collection(f"bench_{category}")
+        for inicio in range(0, len(chunks), 1000):
+            lote = chunks[inicio:inicio + 1000]
+            coleccion.add(
+                ids=[f"chunk-{inicio + i}" for i in range(len(lote))],
+                documents=[doc.page_content for doc in lote],
+                embeddings=np.zeros((len(lote), 8), dtype=np.float32),
+                metadatas=[{"source": doc.metadata.get("source", "")} for doc in lote]
+            )
+
+        ruta = os.path.join(directorio, category)
+        inicio = time.perf_counter()
+        BM25Index.build(coleccion, ruta, version="bench")
+        tiempo_build = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        indice = BM25Index(ruta)
+        tiempo_carga = time.perf_counter() - inicio
+
+        print(f"⏱️  Construcción: {tiempo_build:.2f}s - carga: {tiempo_carga * 1000:.1f}ms "
+              f"- tamaño: {sum(os.path.getsize(os.path.join(ruta, f)) for f in os.listdir(ruta)) / 1024:.0f} KB")
+
+        fuentes = {f"chunk-{i}": os.path.basename(doc.metadata.get("source", "")) for i, doc in enumerate(chunks)}
+
+        print(f"\n{'Consulta':<45}{'p50 (ms)':>10}{'p99 (ms)':>10}  Primer resultado")
+        print("─" * 110)
+        for consulta in CONSULTAS:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultados = indice.search(consulta, k)
+                tiempos.append(time.perf_counter() - inicio)
+
+            primero = fuentes[resultados[0][0]] if resultados else "-"
+            print(f"{consulta[:44]:<45}{np.percentile(tiempos, 50) * 1000:>10.3f}"
+                  f"{np.percentile(tiempos, 99) * 1000:>10.3f}  {primero[:50]}")
+
+        print("\n" + "=" * 70)
+        print("✅ BENCHMARK COMPLETADO")
+        print("=" * 70)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del índice léxico BM25")
+    parser.add_argument("--category", default="old_compliance")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    ejecutar_benchmark(args.category, args.repeticiones, args.k)
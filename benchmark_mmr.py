@@ -0,0 +1,67 @@
+"""
+⚡ Micro-benchmark - MMR vectorizado vs MMR de LangChain
+
+Mide el costo del re-ranking MMR para distintos valores de fetch_k y verifica
+que ambas implementaciones eligen los mismos chunks (no usa OpenAI ni la API).
+
+Uso:
+    python benchmark_mmr.py --dim 1536 --k 2 --repeticiones 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from langchain_core.vectorstores.utils import maximal_marginal_relevance as mmr_langchain
+
+from mmr import maximal_marginal_relevance as mmr_vectorizado
+
+FETCH_K_VALORES = [10, 20, 50, 100]
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Tiempo medio por llamada en milisegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def ejecutar_benchmark(dim: int, k: int, repeticiones: int, lambda_mult: float):
+    rng = np.random.default_rng(7)
+
+    print("\n" + "=" * 70)
+    print(f"⚡ MICRO-BENCHMARK MMR (dim={dim}, k={k}, lambda={lambda_mult})")
+    print("=" * 70)
+    print(f"\n{'fetch_k':>8}{'LangChain (ms)':>18}{'Vectorizado (ms)':>20}{'Mejora':>10}{'Iguales':>10}")
+    print("─" * 66)
+
+    for fetch_k in FETCH_K_VALORES:
+        consulta = rng.normal(size=dim).astype(np.float32)
+        candidatos = rng.normal(size=(fetch_k, dim)).astype(np.float32)
+
+        # Misma selección en ambas implementaciones
+        esperado = mmr_langchain(consulta, candidatos, k=k, lambda_mult=lambda_mult)
+        obtenido, _ = mmr_vectorizado(consulta, candidatos, k=k, lambda_mult=lambda_mult)
+        iguales = list(obtenido) == list(esperado)
+
+        t_langchain = medir(lambda: mmr_langchain(consulta, candidatos, k=k, lambda_mult=lambda_mult), repeticiones)
+        t_vectorizado = medir(lambda: mmr_vectorizado(consulta, candidatos, k=k, lambda_mult=lambda_mult), repeticiones)
+
+        print(f"{fetch_k:>8}{t_langchain:>18.3f}{t_vectorizado:>20.3f}"
+              f"{t_langchain / t_vectorizado:>9.1f}x{'✅' if iguales else '❌':>9}")
+
+    print("\n" + "=" * 70)
+    print("✅ BENCHMARK COMPLETADO")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark del re-ranking MMR")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    args = parser.parse_args()
+
+    ejecutar_benchmark(args.dim, args.k, args.repeticiones, args.lambda_mult)
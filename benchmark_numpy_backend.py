@@ -0,0 +1,137 @@
+"""
+🧮 Benchmark - Backend NumPy vs Chroma
+
+Compara latencia y recall de la búsqueda exacta en matriz NumPy frente a la
+búsqueda HNSW de Chroma sobre una colección sintética (no usa OpenAI ni la API).
+
+Uso:
+    python benchmark_numpy_backend.py --chunks 5000 --dim 1536 --queries 200
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import FakeEmbeddings
+
+from numpy_store import NumpyVectorStore
+
+
+def generar_vectores(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Vectores agrupados en clusters (más realista que ruido uniforme)."""
+    centros = rng.normal(size=(clusters, dim)).astype(np.float32)
+    asignacion = rng.integers(0, clusters, size=n)
+    vectores = centros[asignacion] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+
+def percentil(tiempos, p):
+    return float(np.percentile(tiempos, p)) * 1000
+
+
+def medir(funcion, consultas):
+    """Ejecuta funcion(q) para cada consulta y devuelve (resultados, tiempos)."""
+    resultados, tiempos = [], []
+    for q in consultas:
+        inicio = time.perf_counter()
+        resultados.append(funcion(q))
+        tiempos.append(time.perf_counter() - inicio)
+    return resultados, tiempos
+
+
+def ejecutar_benchmark(chunks: int, dim: int, queries: int, k: int, fetch_k: int):
+    rng = np.random.default_rng(42)
+    directorio = tempfile.mkdtemp(prefix="bench_numpy_")
+    embeddings = FakeEmbeddings(size=dim)
+
+    try:
+        print("\n" + "=" * 70)
+        print(f"🧮 BENCHMARK BACKEND NUMPY vs CHROMA ({chunks:,} chunks, dim={dim}, k={k})")
+        print("=" * 70)
+
+        # Preparación: colección Chroma sintética
+        vectores = generar_vectores(chunks, dim, clusters=max(1, chunks // 50), rng=rng)
+        cliente = chromadb.PersistentClient(path=os.path.join(directorio, "chroma"))
+        coleccion = cliente.create_collection("benchmark")
+        for inicio in range(0, chunks, 1000):
+            fin = min(inicio + 1000, chunks)
+            coleccion.add(
+                ids=[f"chunk-{i}" for i in range(inicio, fin)],
+                embeddings=vectores[inicio:fin],
+                documents=[f"Chunk sintético {i}" for i in range(inicio, fin)],
+                metadatas=[{"source": f"doc_{i % 20}.pdf", "page": i % 30} for i in range(inicio, fin)]
+            )
+        chroma = Chroma(client=cliente, collection_name="benchmark", embedding_function=embeddings)
+
+        # Exportación y carga de la matriz
+        ruta_numpy = os.path.join(directorio, "numpy", "benchmark")
+        os.makedirs(os.path.dirname(ruta_numpy))
+        inicio = time.perf_counter()
+        NumpyVectorStore.build(coleccion, ruta_numpy, version="bench")
+        tiempo_export = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        numpy_store = NumpyVectorStore(ruta_numpy, embeddings)
+        tiempo_carga = time.perf_counter() - inicio
+
+        consultas = generar_vectores(queries, dim, clusters=max(1, chunks // 50), rng=rng).tolist()
+
+        # Top-k
+        res_chroma, t_chroma = medir(lambda q: chroma.similarity_search_by_vector(q, k=k), consultas)
+        res_numpy, t_numpy = medir(lambda q: numpy_store.similarity_search_by_vector(q, k=k), consultas)
+
+        # Recall de Chroma (HNSW) respecto a la búsqueda exacta
+        recall = np.mean([
+            len({d.id for d in a} & {d.id for d in b}) / k
+            for a, b in zip(res_chroma, res_numpy)
+        ])
+
+        # MMR (misma configuración que /ask)
+        _, t_mmr_chroma = medir(
+            lambda q: chroma.max_marginal_relevance_search_by_vector(q, k=k, fetch_k=fetch_k), consultas
+        )
+        _, t_mmr_numpy = medir(
+            lambda q: numpy_store.max_marginal_relevance_search_by_vector(q, k=k, fetch_k=fetch_k), consultas
+        )
+
+        print(f"\n📦 Exportación a matriz: {tiempo_export:.2f}s - carga (memmap): {tiempo_carga * 1000:.1f}ms")
+        print(f"💾 Memoria estimada NumPy: {numpy_store.nbytes / 1024 / 1024:.1f} MB")
+
+        print(f"\n{'Operación':<22}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}")
+        print("─" * 58)
+        for nombre, tiempos in [
+            ("Chroma top-k", t_chroma),
+            ("NumPy top-k", t_numpy),
+            (f"Chroma MMR ({fetch_k})", t_mmr_chroma),
+            (f"NumPy MMR ({fetch_k})", t_mmr_numpy),
+        ]:
+            print(f"{nombre:<22}{percentil(tiempos, 50):>12.2f}{percentil(tiempos, 95):>12.2f}{percentil(tiempos, 99):>12.2f}")
+
+        print(f"\n🎯 Recall@{k} de Chroma (HNSW) vs búsqueda exacta: {recall:.3f}")
+        print(f"⚡ Top-k NumPy: {np.median(t_chroma) / np.median(t_numpy):.1f}x más rápido (p50)")
+
+        print("\n" + "=" * 70)
+        print("✅ BENCHMARK COMPLETADO")
+        print("=" * 70)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del backend NumPy frente a Chroma")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        ejecutar_benchmark(args.chunks, args.dim, args.queries, args.k, args.fetch_k)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrumpido por el usuario")
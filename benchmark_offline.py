@@ -0,0 +1,669 @@
+"""
+🧪 Benchmark offline de extremo a extremo (p50/p95/p99)
+
+Arranca la API en el mismo proceso (startup y shutdown incluidos) sobre un
+directorio temporal con copias de docs/{categoria} y videos/, sin red:
+    - embeddings locales (EMBEDDING_PROVIDER=hashing)
+    - LLM stub (LLM_PROVIDER=stub) con TTFT y tokens/s configurables
+    - MongoDB en memoria: MemoryMongoManager ejecuta la lógica real de
+      MongoManager sobre colecciones en memoria (latencia opcional por operación)
+
+Recorre por etapas, con la concurrencia indicada: indexación, /ask en cada
+formato sin caché y con caché, /ask/stream, /ask-video, conversaciones (/ask
+con session_id, /conversations/new y /conversations/{id}/ask) y subidas de
+PDFs hasta que termina su indexación. Reporta por etapa peticiones, errores,
+throughput y latencias p50/p95/p99.
+
+--output guarda los resultados en JSON; --baseline los compara con un JSON
+anterior y termina con código 1 si alguna etapa empeora más de --tolerance.
+
+Uso:
+    python benchmark_offline.py --requests 40 --concurrency 4
+    python benchmark_offline.py --output benchmarks/base.json
+    python benchmark_offline.py --baseline benchmarks/base.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from mongo_manager import MongoManager
+
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+RESULTS_VERSION = 1
+FORMATOS = ["html", "plain", "both"]
+
+PREGUNTAS = [
+    "¿Qué es el modelo de prevención de delitos?",
+    "¿Cómo se maneja la información confidencial?",
+    "¿Quién es el encargado de prevención de delitos?",
+    "¿Qué sanciones existen por incumplimiento?",
+    "¿Cuáles son los deberes de abstención?",
+    "Resume el procedimiento de denuncia",
+    "¿Qué es la fortificación en minería?",
+    "¿Qué factores causan las caídas de rocas?"
+]
+
+
+# ==================== MONGODB EN MEMORIA ====================
+
+def _get(doc: Dict, key: str):
+    for part in key.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _set(doc: Dict, key: str, value):
+    *parents, last = key.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _matches(doc: Dict, query: Optional[Dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, option) for option in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            for op, arg in condition.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op in ("$lt", "$lte", "$gt", "$gte") and value is None:
+                    return False
+                if (op == "$lt" and not value < arg) or (op == "$lte" and not value <= arg) \
+                        or (op == "$gt" and not value > arg) or (op == "$gte" and not value >= arg):
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if included:
+        doc = {key: doc[key] for key in included + ["_id"] if key in doc}
+    if projection.get("_id") == 0:
+        doc.pop("_id", None)
+    return doc
+
+
+class _Cursor:
+    def __init__(self, docs: List[Dict]):
+        self._docs = docs
+
+    def sort(self, key: str, direction: int = 1):
+        self._docs.sort(key=lambda doc: (_get(doc, key) is not None, _get(doc, key)), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class MemoryCollection:
+    """Subconjunto de la API de pymongo que usa MongoManager, en memoria."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._docs: List[Dict] = []
+        self._lock = threading.RLock()
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply(self, doc: Dict, update: Dict, inserting: bool):
+        for key, value in update.get("$set", {}).items():
+            _set(doc, key, copy.deepcopy(value))
+        for key, value in update.get("$inc", {}).items():
+            _set(doc, key, (_get(doc, key) or 0) + value)
+        if inserting:
+            for key, value in update.get("$setOnInsert", {}).items():
+                _set(doc, key, copy.deepcopy(value))
+        for key, value in update.get("$push", {}).items():
+            items = _get(doc, key) or []
+            if isinstance(value, dict) and "$each" in value:
+                items = items + copy.deepcopy(value["$each"])
+                if "$slice" in value:
+                    items = items[value["$slice"]:] if value["$slice"] < 0 else items[:value["$slice"]]
+            else:
+                items = items + [copy.deepcopy(value)]
+            _set(doc, key, items)
+
+    def _upsert(self, query: Dict, update: Optional[Dict] = None, replacement: Optional[Dict] = None) -> Dict:
+        doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+        if replacement is not None:
+            doc.update(copy.deepcopy(replacement))
+        else:
+            self._apply(doc, update, inserting=True)
+        doc.setdefault("_id", str(ObjectId()))
+        self._docs.append(doc)
+        return doc
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        self._round_trip()
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    return _project(doc, projection)
+        return None
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> _Cursor:
+        self._round_trip()
+        with self._lock:
+            return _Cursor([_project(doc, projection) for doc in self._docs if _matches(doc, query)])
+
+    def count_documents(self, query: Dict) -> int:
+        self._round_trip()
+        with self._lock:
+            return sum(1 for doc in self._docs if _matches(doc, query))
+
+    def insert_one(self, doc: Dict):
+        self._round_trip()
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", str(ObjectId()))
+        with self._lock:
+            self._docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        self._round_trip()
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    self._apply(doc, update, inserting=False)
+                    return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+            upserted = self._upsert(query, update)["_id"] if upsert else None
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=upserted)
+
+    def replace_one(self, query: Dict, replacement: Dict, upsert: bool = False):
+        self._round_trip()
+        with self._lock:
+            for i, doc in enumerate(self._docs):
+                if _matches(doc, query):
+                    self._docs[i] = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+                    return SimpleNamespace(matched_count=1, modified_count=1)
+            if upsert:
+                self._upsert(query, replacement=replacement)
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+    def find_one_and_update(self, query: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document=None) -> Optional[Dict]:
+        self._round_trip()
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    before = _project(doc, projection)
+                    self._apply(doc, update, inserting=False)
+                    return _project(doc, projection) if return_document else before
+            if upsert:
+                doc = self._upsert(query, update)
+                return _project(doc, projection) if return_document else None
+        return None
+
+    def delete_one(self, query: Dict):
+        self._round_trip()
+        with self._lock:
+            for i, doc in enumerate(self._docs):
+                if _matches(doc, query):
+                    del self._docs[i]
+                    return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def delete_many(self, query: Dict):
+        self._round_trip()
+        with self._lock:
+            kept = [doc for doc in self._docs if not _matches(doc, query)]
+            deleted = len(self._docs) - len(kept)
+            self._docs = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    def aggregate(self, pipeline: List[Dict]) -> List[Dict]:
+        """Solo $group con $sum (estadísticas del caché)."""
+        self._round_trip()
+        with self._lock:
+            docs = [copy.deepcopy(doc) for doc in self._docs]
+        for stage in pipeline:
+            if "$group" in stage:
+                spec = stage["$group"]
+                groups: Dict = {}
+                for doc in docs:
+                    key = _get(doc, spec["_id"][1:]) if isinstance(spec["_id"], str) else spec["_id"]
+                    group = groups.setdefault(key, {"_id": key, **{name: 0 for name in spec if name != "_id"}})
+                    for name, accumulator in spec.items():
+                        if name != "_id":
+                            value = accumulator["$sum"]
+                            group[name] += (_get(doc, value[1:]) or 0) if isinstance(value, str) else value
+                docs = list(groups.values())
+        return docs
+
+
+class _MemoryDatabase:
+    def __init__(self, latency: float):
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._latency = latency
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self._collections.setdefault(name, MemoryCollection(self._latency))
+
+
+class MemoryMongoManager(MongoManager):
+    """MongoManager sobre colecciones en memoria (misma lógica de caché, historial y trabajos)."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.mongo_uri = "memory://"
+        self.database_name = "rag_benchmark"
+        self.client = SimpleNamespace(admin=SimpleNamespace(command=lambda *args: {"ok": 1}), close=lambda: None)
+        self.db = _MemoryDatabase(latency_ms / 1000)
+        self._setup_collections()
+
+
+# ==================== ENTORNO ====================
+
+def preparar_directorio(directorio: str, categoria: str, categoria_videos: str, max_archivos: int):
+    """Copia los PDFs de la categoría, las transcripciones y la configuración al directorio de trabajo."""
+    origen = os.path.join(REPO_DIRECTORY, "docs", categoria)
+    pdfs = sorted(f for f in os.listdir(origen) if f.endswith(".pdf"))[:max_archivos]
+    if not pdfs:
+        raise ValueError(f"No hay PDFs en {origen}")
+    os.makedirs(os.path.join(directorio, "docs", categoria))
+    for pdf in pdfs:
+        shutil.copy(os.path.join(origen, pdf), os.path.join(directorio, "docs", categoria, pdf))
+
+    videos = os.path.join(REPO_DIRECTORY, "videos", categoria_videos)
+    if os.path.isdir(videos):
+        shutil.copytree(videos, os.path.join(directorio, "videos", categoria_videos))
+
+    configuracion = os.path.join(REPO_DIRECTORY, "categories_config.json")
+    if os.path.exists(configuracion):
+        shutil.copy(configuracion, directorio)
+    return [os.path.join(directorio, "docs", categoria, pdf) for pdf in pdfs]
+
+
+def configurar_entorno(args):
+    """Variables que la API lee al importarse: proveedores locales y sin tareas de fondo."""
+    os.environ.update({
+        "EMBEDDING_PROVIDER": "hashing",
+        "HASHING_EMBEDDING_DIMENSION": str(args.dim),
+        "LLM_PROVIDER": "stub",
+        "STUB_LLM_TTFT_MS": str(args.ttft_ms),
+        "STUB_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "STUB_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+        "WARMUP_ON_STARTUP": "false",
+        "FS_WATCHER": "false",
+        "CATEGORY_CATALOG_BACKEND": "file"
+    })
+    os.environ.pop("MONGO_URI", None)
+
+
+# ==================== MEDICIÓN ====================
+
+def resumir(latencias: List[float], errores: int, duracion: float, extra: Optional[List[float]] = None) -> Dict:
+    ms = np.array(latencias) * 1000
+    resultado = {
+        "requests": len(latencias) + errores,
+        "errors": errores,
+        "duration_s": round(duracion, 3),
+        "throughput_rps": round(len(latencias) / duracion, 2) if duracion > 0 else 0.0,
+        "latency_ms": {}
+    }
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        resultado["latency_ms"] = {
+            "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "mean": round(float(ms.mean()), 2), "max": round(float(ms.max()), 2)
+        }
+    # Los streams sin tokens no tienen TTFT (None)
+    extra = [valor for valor in (extra or []) if valor is not None]
+    if extra:
+        p50, p95 = np.percentile(extra, [50, 95])
+        resultado["ttft_ms"] = {"p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+    return resultado
+
+
+async def ejecutar_etapa(nombre: str, total: int, concurrencia: int,
+                         peticion: Callable[[int], Awaitable[Optional[float]]], silencio) -> Dict:
+    """
+    Ejecuta total peticiones con concurrencia workers.
+
+    Args:
+        peticion: Corrutina peticion(i); puede retornar un TTFT en ms
+    """
+    latencias, ttfts, errores = [], [], []
+    indices = iter(range(total))
+
+    async def worker():
+        for i in indices:
+            inicio = time.perf_counter()
+            try:
+                ttft = await peticion(i)
+                latencias.append(time.perf_counter() - inicio)
+                if ttft is not None:
+                    ttfts.append(ttft)
+            except Exception as e:
+                errores.append(str(e))
+
+    inicio = time.perf_counter()
+    with silencio():
+        await asyncio.gather(*(worker() for _ in range(min(concurrencia, total))))
+    resultado = resumir(latencias, len(errores), time.perf_counter() - inicio, ttfts)
+
+    latencia = resultado["latency_ms"]
+    print(f"  {nombre:<26}{resultado['requests']:>6}{resultado['errors']:>6}{resultado['throughput_rps']:>9.1f}"
+          f"{latencia.get('p50', 0):>10.1f}{latencia.get('p95', 0):>10.1f}{latencia.get('p99', 0):>10.1f}")
+    if errores:
+        print(f"    ❌ {errores[0][:150]}")
+    return resultado
+
+
+def comprobar(respuesta):
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f"HTTP {respuesta.status_code}: {respuesta.text[:200]}")
+    return respuesta
+
+
+async def ejecutar_benchmark(args, api) -> Dict:
+    import httpx
+
+    categoria = api.normalize_category(args.category)
+
+    @contextlib.contextmanager
+    def silencio():
+        # Los logs de la API por petición no forman parte de la medición
+        if args.verbose:
+            yield
+            return
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    with silencio():
+        mongo_memoria = MemoryMongoManager(latency_ms=args.mongo_latency_ms)
+        api.get_mongo_manager = lambda: mongo_memoria
+        api.app.dependency_overrides[api.require_auth] = lambda: api.ClerkUser("bench-user", "bench@example.com")
+        await api.startup()
+    etapas: Dict[str, Dict] = {}
+    transporte = httpx.ASGITransport(app=api.app)
+
+    try:
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=300) as cliente:
+            async def pregunta(formato: str, texto: str, **extra) -> Dict:
+                respuesta = await cliente.post("/ask", json={"question": texto, "category": categoria,
+                                                             "format": formato, **extra})
+                return comprobar(respuesta).json()
+
+            print(f"\n  {'Etapa':<26}{'Req':>6}{'Err':>6}{'Req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            print("  " + "─" * 77)
+
+            async def indexar(i):
+                await asyncio.to_thread(api.reindex_category, categoria)
+            etapas["indexacion"] = await ejecutar_etapa("indexacion", 1, 1, indexar, silencio)
+
+            # Warm-up: vectorstores, índices derivados y LLM cargados antes de medir
+            with silencio():
+                await pregunta("plain", "warm-up")
+                videos = sorted(api.get_video_mapping(args.video_category))
+                if videos:
+                    await cliente.post("/ask-video", json={"question": "warm-up", "video_id": videos[0],
+                                                           "category": args.video_category, "format": "plain"})
+
+            n = args.requests
+            for formato in FORMATOS:
+                async def sin_cache(i, formato=formato):
+                    # Pregunta distinta en cada petición: nunca está en el caché
+                    await pregunta(formato, f"{PREGUNTAS[i % len(PREGUNTAS)]} [{formato} {i}]")
+                etapas[f"ask_{formato}_sin_cache"] = await ejecutar_etapa(
+                    f"ask_{formato}_sin_cache", n, args.concurrency, sin_cache, silencio)
+
+            for formato in FORMATOS:
+                with silencio():
+                    for texto in PREGUNTAS:
+                        await pregunta(formato, texto)
+
+                async def con_cache(i, formato=formato):
+                    await pregunta(formato, PREGUNTAS[i % len(PREGUNTAS)])
+                etapas[f"ask_{formato}_con_cache"] = await ejecutar_etapa(
+                    f"ask_{formato}_con_cache", n, args.concurrency, con_cache, silencio)
+
+            async def streaming(i):
+                respuesta = comprobar(await cliente.post("/ask/stream", json={
+                    "question": f"{PREGUNTAS[i % len(PREGUNTAS)]} [stream {i}]", "category": categoria, "format": "plain"
+                }))
+                eventos = [linea for linea in respuesta.text.splitlines() if linea.startswith("data: ")]
+                fin = json.loads(eventos[-1][len("data: "):])
+                if "ttft_ms" not in fin:
+                    raise RuntimeError(f"Stream incompleto: {fin}")
+                return fin["ttft_ms"]
+            etapas["ask_stream"] = await ejecutar_etapa("ask_stream", n, args.concurrency, streaming, silencio)
+
+            if videos:
+                async def video(i):
+                    comprobar(await cliente.post("/ask-video", json={
+                        "question": f"{PREGUNTAS[i % len(PREGUNTAS)]} [video {i}]",
+                        "video_id": videos[i % len(videos)], "category": args.video_category, "format": "both"
+                    }))
+                etapas["ask_video"] = await ejecutar_etapa("ask_video", n, args.concurrency, video, silencio)
+
+            async def conversacion_sesion(i):
+                await pregunta("plain", f"{PREGUNTAS[i % len(PREGUNTAS)]} [sesión {i}]",
+                               session_id=f"bench-sesion-{i % args.sessions}")
+            etapas["conversacion_sesion"] = await ejecutar_etapa(
+                "conversacion_sesion", n, args.concurrency, conversacion_sesion, silencio)
+
+            conversaciones = []
+
+            async def conversacion_nueva(i):
+                conversaciones.append(comprobar(await cliente.post("/conversations/new")).json()["conversation_id"])
+            etapas["conversacion_nueva"] = await ejecutar_etapa(
+                "conversacion_nueva", args.sessions, args.concurrency, conversacion_nueva, silencio)
+
+            async def conversacion_ask(i):
+                comprobar(await cliente.post(f"/conversations/{conversaciones[i % len(conversaciones)]}/ask", json={
+                    "question": f"{PREGUNTAS[i % len(PREGUNTAS)]} [conversación {i}]",
+                    "category": categoria, "format": "plain"
+                }))
+            if conversaciones:
+                etapas["conversacion_ask"] = await ejecutar_etapa(
+                    "conversacion_ask", n, args.concurrency, conversacion_ask, silencio)
+
+            with open(args.upload_file, "rb") as f:
+                contenido = f.read()
+
+            async def subida(i):
+                comprobar(await cliente.post(f"/categories/{categoria}/upload", files={
+                    "file": (f"bench_subida_{i}.pdf", contenido, "application/pdf")
+                }))
+            etapas["subida"] = await ejecutar_etapa("subida", args.uploads, args.concurrency, subida, silencio)
+
+            async def indexacion_subidas(i):
+                # Hasta que la cola termina de indexar los archivos subidos
+                while True:
+                    estado = api.job_queue.stats()
+                    if not estado["queued"] and not estado["running"]:
+                        break
+                    await asyncio.sleep(0.05)
+                fallidos = [job for job in api.job_queue.list(limit=args.uploads) if job["status"] == "failed"]
+                if fallidos:
+                    raise RuntimeError(f"Indexación fallida: {fallidos[0].get('error')}")
+            etapas["indexacion_subidas"] = await ejecutar_etapa(
+                "indexacion_subidas", 1, 1, indexacion_subidas, silencio)
+    finally:
+        with silencio():
+            await api.cleanup()
+        api.app.dependency_overrides.clear()
+
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "config": {
+            "category": categoria,
+            "files": args.max_files,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "sessions": args.sessions,
+            "uploads": args.uploads,
+            "dim": args.dim,
+            "ttft_ms": args.ttft_ms,
+            "tokens_per_second": args.tokens_per_second,
+            "output_tokens": args.output_tokens,
+            "mongo_latency_ms": args.mongo_latency_ms
+        },
+        "stages": etapas
+    }
+
+
+# ==================== LÍNEA BASE ====================
+
+def comparar(resultados: Dict, base: Dict, tolerancia: float, margen_ms: float) -> List[str]:
+    """
+    Compara cada etapa con la línea base.
+
+    Es regresión tener más errores, un p50 o p95 mayor en más de tolerancia
+    (y de margen_ms, para que el ruido de etapas de pocos ms no cuente) o un
+    throughput menor en más de tolerancia. El throughput se evalúa por sí
+    solo: si el servidor atiende las peticiones de a una (p. ej. el event loop
+    bloqueado) el throughput cae aunque el p50 no cambie. Su margen es que la
+    etapa completa tarde más de margen_ms adicionales.
+    """
+    if base.get("config") != resultados["config"]:
+        print("⚠️  La configuración difiere de la línea base; la comparación puede no ser válida")
+
+    regresiones = []
+    print(f"\n  {'Etapa':<26}{'p50 base':>10}{'p50':>10}{'p95 base':>10}{'p95':>10}{'Req/s base':>12}{'Req/s':>9}")
+    print("  " + "─" * 87)
+    for nombre, anterior in base["stages"].items():
+        actual = resultados["stages"].get(nombre)
+        if actual is None:
+            print(f"  {nombre:<26}(sin datos en esta ejecución)")
+            continue
+
+        problemas = []
+        if actual["errors"] > anterior["errors"]:
+            problemas.append(f"errores {anterior['errors']} -> {actual['errors']}")
+        for percentil in ("p50", "p95"):
+            antes = anterior["latency_ms"].get(percentil)
+            ahora = actual["latency_ms"].get(percentil)
+            if antes is not None and ahora is not None and ahora - antes > max(antes * tolerancia, margen_ms):
+                problemas.append(f"{percentil} {antes:.1f} -> {ahora:.1f} ms")
+        if actual["throughput_rps"] < anterior["throughput_rps"] * (1 - tolerancia) and \
+                (actual["duration_s"] - anterior["duration_s"]) * 1000 > margen_ms:
+            problemas.append(f"throughput {anterior['throughput_rps']:.1f} -> {actual['throughput_rps']:.1f} req/s")
+
+        print(f"  {nombre:<26}{anterior['latency_ms'].get('p50', 0):>10.1f}{actual['latency_ms'].get('p50', 0):>10.1f}"
+              f"{anterior['latency_ms'].get('p95', 0):>10.1f}{actual['latency_ms'].get('p95', 0):>10.1f}"
+              f"{anterior['throughput_rps']:>12.1f}{actual['throughput_rps']:>9.1f}  {'❌' if problemas else '✅'}")
+        regresiones.extend(f"{nombre}: {problema}" for problema in problemas)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de extremo a extremo de la API")
+    parser.add_argument("--category", default="compliance", help="Categoría de docs/ a copiar e indexar")
+    parser.add_argument("--max-files", type=int, default=3, help="Máximo de PDFs de la categoría")
+    parser.add_argument("--video-category", default="geomecanica")
+    parser.add_argument("--requests", type=int, default=40, help="Peticiones por etapa")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=8, help="Sesiones/conversaciones distintas")
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--upload-file", help="PDF a subir (por defecto el primero de la categoría)")
+    parser.add_argument("--dim", type=int, default=384, help="Dimensión de los embeddings hashing")
+    parser.add_argument("--ttft-ms", type=float, default=20, help="Time-to-first-token del LLM stub")
+    parser.add_argument("--tokens-per-second", type=float, default=1000, help="Velocidad del LLM stub (0 = sin espera)")
+    parser.add_argument("--output-tokens", type=int, default=50, help="Tokens por respuesta del LLM stub")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0, help="Latencia simulada por operación de MongoDB")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento relativo admitido")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Empeoramiento absoluto mínimo para contar")
+    parser.add_argument("--keep", action="store_true", help="Conserva el directorio de trabajo")
+    parser.add_argument("--verbose", action="store_true", help="Muestra los logs de la API")
+    args = parser.parse_args()
+
+    base = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            base = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+
+    directorio = tempfile.mkdtemp(prefix="bench_offline_")
+    directorio_inicial = os.getcwd()
+    try:
+        pdfs = preparar_directorio(directorio, args.category, args.video_category, args.max_files)
+        args.upload_file = os.path.abspath(args.upload_file) if args.upload_file else pdfs[0]
+        configurar_entorno(args)
+        os.chdir(directorio)
+
+        print("\n" + "=" * 80)
+        print(f"🧪 BENCHMARK OFFLINE ({args.category}, {len(pdfs)} PDFs, {args.requests} peticiones/etapa, "
+              f"concurrencia {args.concurrency})")
+        print("=" * 80)
+        print(f"🤖 LLM stub: TTFT {args.ttft_ms:.0f} ms, {args.tokens_per_second:.0f} tokens/s, "
+              f"{args.output_tokens} tokens | 🧮 embeddings hashing-{args.dim} | 🍃 MongoDB en memoria")
+
+        # La API lee la configuración al importarse
+        sys.path.insert(0, REPO_DIRECTORY)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            import main as api
+
+        resultados = asyncio.run(ejecutar_benchmark(args, api))
+    finally:
+        os.chdir(directorio_inicial)
+        if args.keep:
+            print(f"\n📂 Directorio de trabajo: {directorio}")
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados guardados en {output}")
+
+    regresiones = comparar(resultados, base, args.tolerance, args.min_delta_ms) if base else []
+
+    print("\n" + "=" * 80)
+    if regresiones:
+        print(f"❌ {len(regresiones)} REGRESIONES RESPECTO A {args.baseline}")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        print("=" * 80)
+        sys.exit(1)
+    print("✅ BENCHMARK COMPLETADO" + (" (sin regresiones)" if base else ""))
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrumpido por el usuario")
@@ -0,0 +1,181 @@
+"""
+🗜️ Benchmark - Cuantización de embeddings (float16 / int8)
+
+Exporta los chunks de una categoría al backend NumPy en cada formato
+(float32, float16, int8 con escala por vector) y reporta memoria residente,
+tamaño en disco, latencia y recall@k respecto a float32 para nuestro propio
+set de preguntas, con y sin reordenar la lista corta en float32.
+
+Con --embeddings openai (por defecto) se usan los embeddings reales
+(requiere OPENAI_API_KEY); con --embeddings hashing, los del proveedor local
+(sin red, con un recall representativo de similitud léxica); con
+--embeddings fake, embeddings deterministas útiles solo para medir memoria y
+latencia.
+
+Uso:
+    python benchmark_quantization.py --category geomecanica --k 4
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_providers import HashingEmbeddings
+from index_registry import EMBEDDING_MODEL
+from numpy_store import QUANTIZATION_RESCORE_MULTIPLIER, NumpyVectorStore
+
+FORMATOS = ["none", "float16", "int8"]
+
+# Preguntas de nuestros scripts de prueba y de uso real
+PREGUNTAS = [
+    "¿Qué es la geomecánica?",
+    "¿Qué tipos de rocas existen?",
+    "¿Cuáles son los principales tipos de rocas?",
+    "¿Qué es la fortificación en minería?",
+    "¿Qué es el RMR?",
+    "¿Qué es la estabilidad de taludes?",
+    "¿Cómo se analiza la estabilidad de taludes?",
+    "¿Qué es la resistencia?",
+    "¿Qué es compliance?",
+    "¿Qué establece la ley 16.744 sobre accidentes del trabajo?",
+    "Reglamento de seguridad minera DS 132",
+    "¿Qué es la filosofía?"
+]
+
+
+def cargar_chunks(category: str):
+    """Chunks de todos los PDFs de la categoría (mismo chunking que la API)."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
+    chunks = []
+    for pdf in sorted(glob.glob(f"docs/{category}/*.pdf")):
+        try:
+            chunks.extend(splitter.split_documents(PyPDFLoader(pdf).load()))
+        except Exception as e:
+            print(f"⚠️  {os.path.basename(pdf)}: {e}")
+    return chunks
+
+
+def crear_embeddings(tipo: str, dim: int):
+    if tipo == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    if tipo == "hashing":
+        # Local y sin red, pero con similitud real entre textos (a diferencia de fake)
+        return HashingEmbeddings(dimension=dim)
+    return DeterministicFakeEmbedding(size=dim)
+
+
+def tamano_directorio(directorio: str) -> int:
+    return sum(os.path.getsize(os.path.join(directorio, f)) for f in os.listdir(directorio))
+
+
+def recall(resultados, referencia, k: int) -> float:
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(resultados, referencia)]))
+
+
+def ejecutar_benchmark(category: str, embeddings_tipo: str, dim: int, k: int, repeticiones: int):
+    print("\n" + "=" * 92)
+    print(f"🗜️  BENCHMARK CUANTIZACIÓN - categoría '{category}' (embeddings={embeddings_tipo}, k={k})")
+    print("=" * 92)
+
+    chunks = cargar_chunks(category)
+    if not chunks:
+        print(f"❌ No hay PDFs en docs/{category}")
+        return
+
+    embeddings = crear_embeddings(embeddings_tipo, dim)
+    inicio = time.perf_counter()
+    vectores = embeddings.embed_documents([doc.page_content for doc in chunks])
+    consultas = [embeddings.embed_query(pregunta) for pregunta in PREGUNTAS]
+    print(f"\n📄 {len(chunks)} chunks y {len(PREGUNTAS)} preguntas embebidos en {time.perf_counter() - inicio:.1f}s")
+
+    directorio = tempfile.mkdtemp(prefix="bench_quant_")
+    try:
+        coleccion = chromadb.EphemeralClient().get_or_create_collection(f"bench_{category}")
+        for inicio in range(0, len(chunks), 1000):
+            lote = chunks[inicio:inicio + 1000]
+            coleccion.add(
+                ids=[f"chunk-{inicio + i}" for i in range(len(lote))],
+                documents=[doc.page_content for doc in lote],
+                embeddings=vectores[inicio:inicio + len(lote)],
+                metadatas=[{"source": doc.metadata.get("source", "")} for doc in lote]
+            )
+
+        referencia = None
+        filas = []
+        for formato in FORMATOS:
+            ruta = os.path.join(directorio, formato)
+            NumpyVectorStore.build(coleccion, ruta, version="bench", quantization=formato)
+
+            inicio = time.perf_counter()
+            store = NumpyVectorStore(ruta, embeddings)
+            tiempo_carga = time.perf_counter() - inicio
+
+            # Con reordenamiento en float32 (configuración por defecto)
+            tiempos, resultados = [], []
+            for consulta in consultas:
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    indices, _ = store._top_k(consulta, k)
+                    tiempos.append(time.perf_counter() - inicio)
+                resultados.append(indices.tolist())
+
+            # Solo primera pasada (sin reordenar)
+            store.rescore_multiplier = 0
+            sin_reordenar = [store._top_k(consulta, k)[0].tolist() for consulta in consultas]
+
+            if referencia is None:
+                referencia = resultados
+
+            filas.append((
+                "float32" if formato == "none" else formato,
+                store.matrix_nbytes / 1024 / 1024,
+                tamano_directorio(ruta) / 1024 / 1024,
+                tiempo_carga * 1000,
+                float(np.percentile(tiempos, 50)) * 1000,
+                recall(sin_reordenar, referencia, k),
+                recall(resultados, referencia, k)
+            ))
+
+        base = filas[0][1]
+        print(f"\n{'Formato':<10}{'Residente (MB)':>16}{'Ahorro':>9}{'Disco (MB)':>12}{'Carga (ms)':>12}"
+              f"{'p50 (ms)':>10}{'Recall sin reord.':>19}{'Recall con reord.':>19}")
+        print("─" * 107)
+        for nombre, residente, disco, carga, p50, recall_primera, recall_final in filas:
+            ahorro = f"{(1 - residente / base) * 100:.0f}%" if base else "-"
+            print(f"{nombre:<10}{residente:>16.2f}{ahorro:>9}{disco:>12.2f}{carga:>12.2f}"
+                  f"{p50:>10.3f}{recall_primera:>19.3f}{recall_final:>19.3f}")
+
+        print(f"\nℹ️  Reordenamiento: los {QUANTIZATION_RESCORE_MULTIPLIER}·k mejores candidatos (mínimo 50) "
+              f"se puntúan de nuevo en float32")
+        print("ℹ️  En disco se conserva la matriz float32 para reordenar; el ahorro es de memoria residente")
+
+        print("\n" + "=" * 92)
+        print("✅ BENCHMARK COMPLETADO")
+        print("=" * 92)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de cuantización de embeddings")
+    parser.add_argument("--category", default="geomecanica")
+    parser.add_argument("--embeddings", choices=["openai", "hashing", "fake"], default="openai")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimensión de los embeddings hashing/fake")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        ejecutar_benchmark(args.category, args.embeddings, args.dim, args.k, args.repeticiones)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrumpido por el usuario")
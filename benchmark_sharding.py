@@ -0,0 +1,106 @@
+"""
+🧩 Benchmark - Colecciones particionadas (shards)
+
+Reparte una colección sintética en 1, 2, 4 y 8 shards por archivo fuente y
+mide la latencia de la consulta con fan-out paralelo (fetch_k de MMR) y el
+recall frente a la búsqueda exacta (no usa OpenAI ni la API).
+
+Uso:
+    python benchmark_sharding.py --chunks 20000 --dim 384 --queries 100
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from sharded_store import ShardedCollection, shard_for_source, shard_names
+
+CONFIGURACIONES = [1, 2, 4, 8]
+
+
+def generar_vectores(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Vectores agrupados en clusters (más realista que ruido uniforme)."""
+    centros = rng.normal(size=(clusters, dim)).astype(np.float32)
+    asignacion = rng.integers(0, clusters, size=n)
+    vectores = centros[asignacion] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+
+def construir(cliente, nombre: str, shards: int, vectores: np.ndarray, fuentes) -> ShardedCollection:
+    """Crea los shards y reparte los chunks por hash del archivo fuente."""
+    colecciones = [cliente.create_collection(n, metadata={"hnsw:space": "cosine"})
+                   for n in shard_names(nombre, shards)]
+    asignacion = np.array([shard_for_source(fuente, shards) for fuente in fuentes])
+    for s, coleccion in enumerate(colecciones):
+        filas = np.flatnonzero(asignacion == s)
+        for inicio in range(0, len(filas), 1000):
+            lote = filas[inicio:inicio + 1000]
+            coleccion.add(
+                ids=[f"chunk-{i}" for i in lote],
+                embeddings=vectores[lote],
+                metadatas=[{"source": fuentes[i]} for i in lote]
+            )
+    return ShardedCollection(nombre, colecciones)
+
+
+def ejecutar_benchmark(chunks: int, dim: int, queries: int, fetch_k: int, documentos: int):
+    rng = np.random.default_rng(7)
+    directorio = tempfile.mkdtemp(prefix="bench_shards_")
+
+    try:
+        print("\n" + "=" * 78)
+        print(f"🧩 BENCHMARK SHARDS ({chunks:,} chunks, {documentos} documentos, dim={dim}, fetch_k={fetch_k})")
+        print("=" * 78)
+
+        vectores = generar_vectores(chunks, dim, clusters=max(1, chunks // 50), rng=rng)
+        fuentes = [f"docs/bench/doc_{i % documentos}.pdf" for i in range(chunks)]
+        consultas = generar_vectores(queries, dim, clusters=max(1, chunks // 50), rng=rng)
+
+        # Referencia exacta (producto punto sobre vectores normalizados)
+        exactos = [set(f"chunk-{i}" for i in np.argsort(-(vectores @ q))[:fetch_k]) for q in consultas]
+
+        cliente = chromadb.PersistentClient(path=os.path.join(directorio, "chroma"))
+
+        print(f"\n{'Shards':>7}{'Construcción (s)':>18}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}"
+              f"{'Recall@fetch_k':>16}")
+        print("─" * 78)
+        for shards in CONFIGURACIONES:
+            inicio = time.perf_counter()
+            coleccion = construir(cliente, f"bench{shards}", shards, vectores, fuentes)
+            tiempo_build = time.perf_counter() - inicio
+
+            tiempos, recall = [], []
+            for q, exacto in zip(consultas, exactos):
+                inicio = time.perf_counter()
+                resultado = coleccion.query(query_embeddings=[q.tolist()], n_results=fetch_k, include=[])
+                tiempos.append(time.perf_counter() - inicio)
+                recall.append(len(set(resultado["ids"][0]) & exacto) / fetch_k)
+
+            p50, p95, p99 = np.percentile(tiempos, [50, 95, 99]) * 1000
+            print(f"{shards:>7}{tiempo_build:>18.1f}{p50:>11.2f}{p95:>11.2f}{p99:>11.2f}{np.mean(recall):>16.3f}")
+
+        print("\n" + "=" * 78)
+        print("✅ BENCHMARK COMPLETADO")
+        print("=" * 78)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de colecciones particionadas")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--documentos", type=int, default=400)
+    args = parser.parse_args()
+
+    try:
+        ejecutar_benchmark(args.chunks, args.dim, args.queries, args.fetch_k, args.documentos)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrumpido por el usuario")
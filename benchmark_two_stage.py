@@ -0,0 +1,136 @@
+"""
+📚 Benchmark - Recuperación en dos etapas (documento -> chunk)
+
+Escala sintéticamente un corpus (1x, 10x, 100x) y compara la búsqueda plana
+sobre todos los chunks con la búsqueda en dos etapas: primero los documentos
+más cercanos (embeddings resumen) y luego solo sus chunks. Reporta latencia y
+recall@k respecto a la búsqueda exacta plana (no usa OpenAI ni la API).
+
+Uso:
+    python benchmark_two_stage.py --docs 20 --chunks-por-doc 60 --dim 384
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from document_index import DOCUMENT_SEGMENTS, compute_document_vectors
+
+ESCALAS = [1, 10, 100]
+
+
+def generar_corpus(docs: int, chunks_por_doc: int, dim: int, rng):
+    """Documentos con temática propia (mezcla de temas globales) y secciones internas."""
+    temas = rng.normal(size=(max(4, docs // 4), dim)).astype(np.float32)
+    fuentes, vectores, secciones_chunk = [], [], []
+    for d in range(docs):
+        pesos = rng.dirichlet(np.ones(len(temas)) * 0.3)
+        centro = pesos @ temas + 0.5 * rng.normal(size=dim).astype(np.float32)
+        secciones = centro + 0.6 * rng.normal(size=(4, dim)).astype(np.float32)
+        for c in range(chunks_por_doc):
+            seccion = secciones[c * 4 // chunks_por_doc]
+            vectores.append(seccion + 0.8 * rng.normal(size=dim).astype(np.float32))
+            secciones_chunk.append(seccion)
+            fuentes.append(f"doc_{d}.pdf")
+
+    matriz = np.asarray(vectores, dtype=np.float32)
+    secciones_chunk = np.asarray(secciones_chunk, dtype=np.float32)
+    return (fuentes, matriz / np.linalg.norm(matriz, axis=1, keepdims=True),
+            secciones_chunk / np.linalg.norm(secciones_chunk, axis=1, keepdims=True))
+
+
+def top_k(matriz: np.ndarray, consulta: np.ndarray, k: int) -> np.ndarray:
+    scores = matriz @ consulta
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def ejecutar_escala(escala: int, docs: int, chunks_por_doc: int, dim: int, queries: int,
+                    k: int, top_documents: int, ruido: float, rng):
+    fuentes, matriz, secciones = generar_corpus(docs * escala, chunks_por_doc, dim, rng)
+
+    inicio = time.perf_counter()
+    fuentes_resumen, vectores_resumen = compute_document_vectors(fuentes, matriz, DOCUMENT_SEGMENTS)
+    tiempo_indice = time.perf_counter() - inicio
+
+    # Posiciones de los chunks de cada documento (equivalente al filtro por metadata)
+    filas_por_documento = {}
+    for i, fuente in enumerate(fuentes):
+        filas_por_documento.setdefault(fuente, []).append(i)
+    filas_por_documento = {fuente: np.asarray(filas) for fuente, filas in filas_por_documento.items()}
+
+    # Consultas: tema de una sección al azar con ruido (más vagas que un chunk,
+    # pueden parecerse a secciones de otros documentos)
+    elegidos = rng.integers(0, len(matriz), size=queries)
+    consultas = secciones[elegidos] + ruido * rng.normal(size=(queries, dim)).astype(np.float32) / np.sqrt(dim)
+    consultas /= np.linalg.norm(consultas, axis=1, keepdims=True)
+
+    t_plana, t_dos_etapas, recall = [], [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        exactos = top_k(matriz, consulta, k)
+        t_plana.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        scores_docs = vectores_resumen @ consulta
+        documentos = []
+        for i in np.argsort(-scores_docs):
+            if fuentes_resumen[i] not in documentos:
+                documentos.append(fuentes_resumen[i])
+                if len(documentos) == top_documents:
+                    break
+        filas = np.concatenate([filas_por_documento[d] for d in documentos])
+        candidatos = filas[top_k(matriz[filas], consulta, k)]
+        t_dos_etapas.append(time.perf_counter() - inicio)
+
+        recall.append(len(set(candidatos) & set(exactos)) / len(exactos))
+
+    return {
+        "escala": escala,
+        "documentos": docs * escala,
+        "chunks": len(matriz),
+        "indice_s": tiempo_indice,
+        "plana_ms": np.percentile(t_plana, [50, 95]) * 1000,
+        "dos_etapas_ms": np.percentile(t_dos_etapas, [50, 95]) * 1000,
+        "recall": float(np.mean(recall))
+    }
+
+
+def ejecutar_benchmark(docs: int, chunks_por_doc: int, dim: int, queries: int, k: int,
+                       top_documents: int, ruido: float):
+    rng = np.random.default_rng(11)
+
+    print("\n" + "=" * 86)
+    print(f"📚 BENCHMARK DOS ETAPAS (dim={dim}, k={k}, top_documents={top_documents}, "
+          f"segmentos={DOCUMENT_SEGMENTS}, ruido={ruido})")
+    print("=" * 86)
+    print(f"\n{'Escala':>7}{'Docs':>8}{'Chunks':>10}{'Plana p50/p95 (ms)':>22}"
+          f"{'2 etapas p50/p95 (ms)':>24}{'Recall@k':>11}")
+    print("─" * 86)
+
+    for escala in ESCALAS:
+        r = ejecutar_escala(escala, docs, chunks_por_doc, dim, queries, k, top_documents, ruido, rng)
+        print(f"{r['escala']:>6}x{r['documentos']:>8}{r['chunks']:>10,}"
+              f"{r['plana_ms'][0]:>13.2f} / {r['plana_ms'][1]:<6.2f}"
+              f"{r['dos_etapas_ms'][0]:>15.2f} / {r['dos_etapas_ms'][1]:<6.2f}{r['recall']:>10.3f}")
+
+    print("\n" + "=" * 86)
+    print("✅ BENCHMARK COMPLETADO")
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de recuperación en dos etapas")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chunks-por-doc", type=int, default=60)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--top-documents", type=int, default=5)
+    parser.add_argument("--ruido", type=float, default=0.8, help="Norma del ruido de las consultas")
+    args = parser.parse_args()
+
+    ejecutar_benchmark(args.docs, args.chunks_por_doc, args.dim, args.queries, args.k,
+                       args.top_documents, args.ruido)
@@ -0,0 +1,160 @@
+"""
+🧠 Benchmark - Memoria con varios workers (índices memory-mapped)
+
+Construye los índices de una categoría sintética (matriz NumPy, BM25 e índice
+de documentos) y lanza 1 y N procesos que los abren y consultan a la vez,
+como los workers de `uvicorn --workers N`. Compara abrirlos memory-mapped
+(compartidos por el page cache) con cargar una copia privada por proceso.
+
+Se reporta RSS (cuenta las páginas compartidas en cada proceso) y PSS (las
+reparte entre los procesos que las comparten; su suma es la memoria real).
+
+Uso:
+    python benchmark_workers_memory.py --chunks 20000 --dim 1536 --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from langchain_core.embeddings import FakeEmbeddings
+
+from document_index import DocumentIndex
+from lexical_index import BM25Index
+from numpy_store import NumpyVectorStore
+
+PALABRAS = ["ley", "seguridad", "minera", "trabajo", "accidentes", "reglamento", "fortificación",
+            "roca", "taludes", "riesgo", "empresa", "norma", "decreto", "faena", "trabajador"]
+
+
+class ColeccionSintetica:
+    """Colección en memoria con la API de chromadb que usan las exportaciones."""
+
+    def __init__(self, chunks: int, dim: int, rng):
+        self.name = "bench_workers"
+        self.embeddings = rng.normal(size=(chunks, dim)).astype(np.float32)
+        self.ids = [f"chunk-{i}" for i in range(chunks)]
+        self.documents = [" ".join(rng.choice(PALABRAS, size=220)) for _ in range(chunks)]
+        self.metadatas = [{"source": f"docs/bench/doc_{i // 60}.pdf", "page": i % 60} for i in range(chunks)]
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, limit=None, offset=0, include=()):
+        fin = offset + limit
+        return {
+            "ids": self.ids[offset:fin],
+            "embeddings": self.embeddings[offset:fin] if "embeddings" in include else None,
+            "documents": self.documents[offset:fin] if "documents" in include else None,
+            "metadatas": self.metadatas[offset:fin] if "metadatas" in include else None
+        }
+
+
+def memoria_proceso() -> dict:
+    """RSS y PSS del proceso actual en MB (/proc/self/smaps_rollup)."""
+    valores = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if partes[0] in ("Rss:", "Pss:"):
+                valores[partes[0][:-1].lower()] = int(partes[1]) / 1024
+    return valores
+
+
+def worker(directorio: str, modo: str, dim: int, consultas: int, barrera, cola):
+    embeddings = FakeEmbeddings(size=dim)
+    store = NumpyVectorStore(os.path.join(directorio, "numpy"), embeddings)
+    bm25 = BM25Index(os.path.join(directorio, "lexical"))
+    documentos = DocumentIndex(os.path.join(directorio, "documents"))
+
+    if modo == "copia":
+        # Como antes: cada proceso con su copia privada de matriz, textos e índices
+        store._matrix = np.array(store._matrix)
+        store.texts = list(store.texts)
+        store.metadatas = list(store.metadatas)
+        bm25._docs, bm25._weights = np.array(bm25._docs), np.array(bm25._weights)
+        documentos.vectors = np.array(documentos.vectors)
+
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(consultas):
+        consulta = rng.normal(size=dim).astype(np.float32)
+        for doc, _ in store.similarity_search_with_score_by_vector(consulta, k=4):
+            doc.page_content
+        bm25.search(" ".join(rng.choice(PALABRAS, size=3)), 10)
+        documentos.search(consulta, 5)
+    # Recorre todos los textos (como si se hubieran devuelto todos alguna vez)
+    sum(len(store.texts[i]) for i in range(store.count()))
+
+    barrera.wait()
+    cola.put(memoria_proceso())
+    barrera.wait()
+
+
+def medir(directorio: str, modo: str, workers: int, dim: int, consultas: int) -> dict:
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(workers)
+    cola = contexto.Queue()
+    procesos = [contexto.Process(target=worker, args=(directorio, modo, dim, consultas, barrera, cola))
+                for _ in range(workers)]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+    return {
+        "rss": sum(r["rss"] for r in resultados),
+        "pss": sum(r["pss"] for r in resultados)
+    }
+
+
+def ejecutar_benchmark(chunks: int, dim: int, workers: int, consultas: int):
+    rng = np.random.default_rng(3)
+    directorio = tempfile.mkdtemp(prefix="bench_workers_")
+
+    try:
+        print("\n" + "=" * 76)
+        print(f"🧠 BENCHMARK MEMORIA POR WORKERS ({chunks:,} chunks, dim={dim})")
+        print("=" * 76)
+
+        coleccion = ColeccionSintetica(chunks, dim, rng)
+        NumpyVectorStore.build(coleccion, os.path.join(directorio, "numpy"), version="bench")
+        BM25Index.build(coleccion, os.path.join(directorio, "lexical"), version="bench")
+        DocumentIndex.build(coleccion, os.path.join(directorio, "documents"), version="bench")
+        del coleccion
+
+        tamano = sum(os.path.getsize(os.path.join(raiz, f))
+                     for raiz, _, archivos in os.walk(directorio) for f in archivos)
+        print(f"\n💾 Índices en disco: {tamano / 1024 / 1024:.1f} MB")
+
+        print(f"\n{'Modo':<16}{'Workers':>8}{'RSS total (MB)':>17}{'PSS total (MB)':>17}{'PSS/worker':>13}")
+        print("─" * 76)
+        for modo in ["copia", "mmap"]:
+            for n in sorted({1, workers}):
+                r = medir(directorio, modo, n, dim, consultas)
+                nombre = "copia privada" if modo == "copia" else "memory-mapped"
+                print(f"{nombre:<16}{n:>8}{r['rss']:>17.0f}{r['pss']:>17.0f}{r['pss'] / n:>13.0f}")
+
+        print("\nℹ️  PSS total = memoria real usada por todos los workers juntos")
+
+        print("\n" + "=" * 76)
+        print("✅ BENCHMARK COMPLETADO")
+        print("=" * 76)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de memoria con varios workers")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--consultas", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        ejecutar_benchmark(args.chunks, args.dim, args.workers, args.consultas)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrumpido por el usuario")
@@ -0,0 +1,162 @@
+"""
+Catálogo de categorías en memoria
+Reemplaza las lecturas de categories_config.json en cada llamada: la
+configuración se carga una vez y se sirve desde memoria. Se recarga al
+escribir, cuando cambia el archivo (un stat como mucho cada
+check_interval segundos) o al recibir una invalidación de otro proceso.
+
+Opcionalmente se respalda en la colección "categories" de MongoDB
+(CATEGORY_CATALOG_BACKEND=mongo); migrate_to_mongo.py copia el archivo.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class CategoryCatalog:
+    """Configuración de categorías (prompts y ajustes) servida desde memoria."""
+
+    def __init__(self, path: str, store=None, check_interval: float = 1.0):
+        """
+        Args:
+            path: Archivo JSON de configuración (categories_config.json)
+            store: MongoManager para respaldar el catálogo en MongoDB (None = archivo)
+            check_interval: Segundos mínimos entre comprobaciones del archivo
+        """
+        self.path = path
+        self.store = store
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._stat = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    # ==================== CARGA ====================
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read_file(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load(self):
+        if self.store is not None:
+            entries = {}
+            for name, entry in self.store.load_categories_config().items():
+                # MongoDB guarda fechas como datetime; el catálogo usa ISO como el archivo
+                entries[name] = {
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in {**entry, "name": name}.items()
+                }
+        else:
+            self._stat = self._file_stat()
+            entries = self._read_file()
+        self._entries = entries
+        self._checked_at = time.monotonic()
+        self.loads += 1
+
+    def _current(self) -> Dict[str, Dict]:
+        """Entradas en memoria, recargadas si el archivo cambió en disco."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            elif self.store is None and time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                if self._file_stat() != self._stat:
+                    self._load()
+            return self._entries
+
+    def invalidate(self, category: Optional[str] = None):
+        """Fuerza la recarga en la próxima lectura (handler del bus de invalidación)."""
+        with self._lock:
+            self._entries = None
+
+    # ==================== LECTURA ====================
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Copia de la configuración de una categoría (None si no está configurada)."""
+        entry = self._current().get(name)
+        return dict(entry) if entry is not None else None
+
+    def all(self) -> Dict[str, Dict]:
+        """Copia de la configuración de todas las categorías."""
+        return {name: dict(entry) for name, entry in self._current().items()}
+
+    def names(self) -> List[str]:
+        return list(self._current().keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._current()
+
+    # ==================== ESCRITURA ====================
+
+    def _write_file(self, name: str, entry: Optional[Dict]):
+        """
+        Actualiza una entrada del archivo de forma atómica (tmp + rename).
+
+        Se relee el archivo bajo un bloqueo entre procesos para no pisar los
+        cambios de otros workers a otras categorías.
+        """
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = self._read_file()
+            if entry is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = entry
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+            self._entries = entries
+            self._stat = self._file_stat()
+            self._checked_at = time.monotonic()
+
+    def save(self, name: str, entry: Dict):
+        """
+        Crea o reemplaza la configuración de una categoría.
+
+        La memoria se actualiza solo después de persistir: si MongoDB o el
+        archivo fallan, la excepción se propaga y el catálogo queda igual.
+        """
+        entry = dict(entry)
+        with self._lock:
+            if self.store is not None:
+                self.store.save_category_config(name, entry)
+                self._current()[name] = entry
+            else:
+                self._write_file(name, entry)
+
+    def delete(self, name: str) -> bool:
+        """Elimina la configuración de una categoría; retorna si existía (mismas garantías que save)."""
+        with self._lock:
+            existed = name in self._current()
+            if existed:
+                if self.store is not None:
+                    self.store.delete_category_config(name)
+                    self._current().pop(name, None)
+                else:
+                    self._write_file(name, None)
+            return existed
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "mongodb" if self.store is not None else "file",
+            "categories": len(self._current()),
+            "loads": self.loads
+        }
@@ -4,8 +4,10 @@ Valida tokens JWT de Clerk y extrae información del usuario
 """
 
 import os
+import threading
+import time
 import requests
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
@@ -33,6 +35,16 @@ def get_jwks_url_from_issuer(issuer: str = None) -> str:
 # URL por defecto (se actualizará dinámicamente)
 CLERK_JWKS_URL = "https://meet-midge-16.clerk.accounts.dev/.well-known/jwks.json"
 
+# Caché de JWKS por URL: {url: (timestamp, jwks)}
+JWKS_CACHE_TTL_SECONDS = int(os.getenv("JWKS_CACHE_TTL_SECONDS", "3600"))
+_jwks_cache: Dict[str, Tuple[float, dict]] = {}
+
+# Intervalo mínimo entre descargas de JWKS por URL: un token con un kid
+# desconocido no puede forzar una llamada a Clerk en cada petición
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+_jwks_last_fetch: Dict[str, float] = {}
+_jwks_fetch_lock = threading.Lock()
+
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
@@ -52,15 +64,40 @@ class ClerkUser:
         return f"ClerkUser(user_id={self.user_id}, email={self.email})"
 
 
-def get_clerk_jwks():
-    """Obtiene las claves públicas JWKS de Clerk."""
+def get_clerk_jwks(force_refresh: bool = False):
+    """
+    Obtiene las claves públicas JWKS de Clerk.
+    
+    Las claves se cachean por JWKS_CACHE_TTL_SECONDS; si Clerk no responde
+    se usa la última copia disponible. Las descargas (también las forzadas)
+    se limitan a una cada JWKS_MIN_REFRESH_SECONDS por URL; dentro de ese
+    intervalo se responde con la caché.
+    """
+    url = CLERK_JWKS_URL
+    cached = _jwks_cache.get(url)
+    if cached and not force_refresh and time.time() - cached[0] < JWKS_CACHE_TTL_SECONDS:
+        return cached[1]
+    
+    with _jwks_fetch_lock:
+        now = time.time()
+        if now - _jwks_last_fetch.get(url, 0.0) < JWKS_MIN_REFRESH_SECONDS:
+            return cached[1] if cached else None
+        _jwks_last_fetch[url] = now
+    
     try:
-        response = requests.get(CLERK_JWKS_URL)
+        response = requests.get(url, timeout=5)
         response.raise_for_status()
-        return response.json()
+        jwks = response.json()
+        _jwks_cache[url] = (time.time(), jwks)
+        return jwks
     except Exception as e:
         print(f"❌ Error al obtener JWKS de Clerk: {e}")
-        return None
+        return cached[1] if cached else None
+
+
+def warm_jwks_cache() -> bool:
+    """Precarga las claves JWKS (usado en el arranque)."""
+    return get_clerk_jwks(force_refresh=True) is not None
 
 
 def verify_clerk_token(token: str) -> Optional[dict]:
@@ -93,18 +130,23 @@ def verify_clerk_token(token: str) -> Optional[dict]:
         # Decodificar sin verificar primero para obtener el header
         unverified_header = jwt.get_unverified_header(token)
         
-        # Encontrar la clave correcta en JWKS
+        # Encontrar la clave correcta en JWKS (si no está, puede que Clerk
+        # haya rotado las claves: refrescar la caché una vez)
         rsa_key = None
-        for key in jwks.get("keys", []):
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
+        for attempt in range(2):
+            for key in jwks.get("keys", []):
+                if key["kid"] == unverified_header["kid"]:
+                    rsa_key = {
+                        "kty": key["kty"],
+                        "kid": key["kid"],
+                        "use": key["use"],
+                        "n": key["n"],
+                        "e": key["e"]
+                    }
+                    break
+            if rsa_key or attempt:
                 break
+            jwks = get_clerk_jwks(force_refresh=True) or {}
         
         if not rsa_key:
             print(f"⚠️ No se encontró clave pública para kid: {unverified_header.get('kid')}")
@@ -0,0 +1,333 @@
+"""
+Registro de contenido por hash para deduplicar documentos entre categorías
+Un mismo PDF (mismo SHA-256) se parsea, divide y embebe una sola vez aunque
+esté en varias categorías; por categoría solo se registra la pertenencia.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+REGISTRY_DIRECTORY = os.path.join("chroma_db", "content_registry")
+REGISTRY_FILENAME = "registry.sqlite"
+
+# Precio de referencia de text-embedding-ada-002 (USD por 1K tokens)
+EMBEDDING_USD_PER_1K_TOKENS = 0.0001
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 de un archivo, leído por bloques."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 del texto de un chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)."""
+    return max(1, len(text) // 4)
+
+
+class ContentRegistry:
+    """Registro SQLite de archivos, chunks parseados, embeddings y pertenencias."""
+
+    def __init__(self, directory: str = REGISTRY_DIRECTORY):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, REGISTRY_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._setup_tables()
+
+    def _setup_tables(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    splitter TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    parsed_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS file_chunks (
+                    sha256 TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    page_content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (sha256, seq)
+                );
+                CREATE TABLE IF NOT EXISTS memberships (
+                    category TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    added_at TEXT NOT NULL,
+                    PRIMARY KEY (category, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_memberships_sha ON memberships (sha256);
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    text_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (text_hash, model)
+                );
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+            """)
+
+    def _incr(self, name: str, amount: int):
+        if amount:
+            self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, amount)
+            )
+
+    # ==================== PERTENENCIA POR CATEGORÍA ====================
+
+    def add_membership(self, category: str, path: str, sha256: str, size: int) -> List[Dict]:
+        """
+        Registra que un archivo pertenece a una categoría.
+
+        Returns:
+            Otras ubicaciones (categoría, ruta) con el mismo contenido
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memberships (category, path, sha256, size, added_at) VALUES (?, ?, ?, ?, ?)",
+                (category, path, sha256, size, datetime.utcnow().isoformat())
+            )
+            rows = self._conn.execute(
+                "SELECT category, path FROM memberships WHERE sha256 = ? AND NOT (category = ? AND path = ?)",
+                (sha256, category, path)
+            ).fetchall()
+        return [{"category": c, "path": p} for c, p in rows]
+
+    def sync_category(self, category: str, paths: List[str]):
+        """Elimina pertenencias de archivos que ya no están en la categoría."""
+        with self._lock, self._conn:
+            current = {p for (p,) in self._conn.execute(
+                "SELECT path FROM memberships WHERE category = ?", (category,)
+            )}
+            for path in current - set(paths):
+                self._conn.execute("DELETE FROM memberships WHERE category = ? AND path = ?", (category, path))
+
+    def remove_category(self, category: str):
+        """Elimina todas las pertenencias de una categoría."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memberships WHERE category = ?", (category,))
+
+    # ==================== CHUNKS PARSEADOS ====================
+
+    def load_chunks(self, path: str, category: str, splitter, loader: Callable[[str], List[Document]]) -> List[Document]:
+        """
+        Obtiene los chunks de un archivo, reutilizando el parseo si el mismo
+        contenido ya se procesó (en cualquier categoría).
+
+        Args:
+            path: Ruta del archivo
+            category: Categoría a la que pertenece
+            splitter: Text splitter (se usa su configuración como parte de la clave)
+            loader: Función que carga el archivo como lista de Documents
+        """
+        sha256 = hash_file(path)
+        size = os.path.getsize(path)
+        signature = f"{splitter._chunk_size}:{splitter._chunk_overlap}"
+        self.add_membership(category, path, sha256, size)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT splitter FROM files WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row and row[0] == signature:
+                rows = self._conn.execute(
+                    "SELECT page_content, metadata FROM file_chunks WHERE sha256 = ? ORDER BY seq", (sha256,)
+                ).fetchall()
+                with self._conn:
+                    self._incr("files_reused", 1)
+                    self._incr("chunks_reused", len(rows))
+                return [self._make_document(text, json.loads(meta), path, sha256) for text, meta in rows]
+
+        # Contenido nuevo: parsear y guardar
+        chunks = splitter.split_documents(loader(path))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM file_chunks WHERE sha256 = ?", (sha256,))
+            self._conn.executemany(
+                "INSERT INTO file_chunks (sha256, seq, page_content, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (sha256, seq, chunk.page_content,
+                     json.dumps({k: v for k, v in chunk.metadata.items() if k != "source"}, ensure_ascii=False))
+                    for seq, chunk in enumerate(chunks)
+                ]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (sha256, size, splitter, chunk_count, parsed_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, size, signature, len(chunks), datetime.utcnow().isoformat())
+            )
+            self._incr("files_parsed", 1)
+
+        return [self._make_document(c.page_content, c.metadata, path, sha256) for c in chunks]
+
+    @staticmethod
+    def _make_document(text: str, metadata: Dict, path: str, sha256: str) -> Document:
+        """Chunk con la metadata propia de esta ubicación del archivo."""
+        return Document(
+            page_content=text,
+            metadata={
+                **{k: v for k, v in metadata.items() if k != "source"},
+                "source": path,
+                "source_file": os.path.basename(path),
+                "file_sha256": sha256
+            }
+        )
+
+    # ==================== EMBEDDINGS ====================
+
+    def get_embeddings(self, text_hashes: List[str], model: str) -> Dict[str, List[float]]:
+        """Embeddings cacheados para una lista de hashes de texto."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(text_hashes), 500):
+                batch = text_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for text_hash, blob in self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ):
+                    found[text_hash] = array("f", blob).tolist()
+        return found
+
+    def put_embeddings(self, vectors: Dict[str, List[float]], model: str):
+        """Guarda embeddings nuevos."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, model, vector) VALUES (?, ?, ?)",
+                [(text_hash, model, array("f", vector).tobytes()) for text_hash, vector in vectors.items()]
+            )
+
+    def record_embedding_usage(self, reused: int, computed: int, tokens_saved: int):
+        with self._lock, self._conn:
+            self._incr("embeddings_reused", reused)
+            self._incr("embeddings_computed", computed)
+            self._incr("embedding_tokens_saved", tokens_saved)
+
+    # ==================== ESTADÍSTICAS ====================
+
+    def stats(self) -> Dict:
+        """
+        Reporte de deduplicación: archivos repetidos, trabajo de parseo y
+        embeddings evitado, y almacenamiento que agrega el registro.
+        """
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+
+            duplicates = []
+            logical_bytes = unique_bytes = 0
+            groups = self._conn.execute(
+                "SELECT sha256, MAX(size), COUNT(*) FROM memberships GROUP BY sha256"
+            ).fetchall()
+            for sha256, size, copies in groups:
+                logical_bytes += size * copies
+                unique_bytes += size
+                if copies > 1:
+                    locations = self._conn.execute(
+                        "SELECT category, path FROM memberships WHERE sha256 = ?", (sha256,)
+                    ).fetchall()
+                    duplicates.append({
+                        "sha256": sha256,
+                        "size": size,
+                        "copies": copies,
+                        "locations": [{"category": c, "path": p} for c, p in locations]
+                    })
+
+            # Lo que ocupa el propio registro. No es un ahorro: cada categoría
+            # sigue guardando sus chunks y vectores en su colección de Chroma,
+            # así que el registro suma almacenamiento a cambio de no volver a
+            # parsear ni embeber contenido repetido
+            chunk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(page_content)) + SUM(LENGTH(metadata)), 0) FROM file_chunks"
+            ).fetchone()[0]
+            vector_row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+
+        tokens_saved = counters.get("embedding_tokens_saved", 0)
+        return {
+            "unique_files": len(groups),
+            "duplicate_files": duplicates,
+            "storage": {
+                "source_bytes_total": logical_bytes,
+                "source_bytes_unique": unique_bytes,
+                "duplicate_source_bytes": logical_bytes - unique_bytes,
+                "registry_chunk_bytes": int(chunk_bytes),
+                "registry_vector_bytes": int(vector_row[1]),
+                "registry_bytes_added": int(chunk_bytes + vector_row[1])
+            },
+            "parsing": {
+                "files_parsed": counters.get("files_parsed", 0),
+                "files_reused": counters.get("files_reused", 0),
+                "chunks_reused": counters.get("chunks_reused", 0)
+            },
+            "embeddings": {
+                "cached_vectors": vector_row[0],
+                "computed": counters.get("embeddings_computed", 0),
+                "reused": counters.get("embeddings_reused", 0),
+                "tokens_saved_estimate": tokens_saved,
+                "usd_saved_estimate": round(tokens_saved / 1000 * EMBEDDING_USD_PER_1K_TOKENS, 4)
+            }
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envoltorio de embeddings que consulta el registro antes de llamar al proveedor.
+
+    Solo los textos que nunca se embebieron (con este modelo) generan llamadas.
+    """
+
+    def __init__(self, embeddings: Embeddings, registry: ContentRegistry, model: Optional[str] = None):
+        self.embeddings = embeddings
+        self.registry = registry
+        self.model = model or getattr(embeddings, "model", embeddings.__class__.__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [hash_text(text) for text in texts]
+        cached = self.registry.get_embeddings(list(set(hashes)), self.model)
+
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), vectors))
+            self.registry.put_embeddings(new, self.model)
+            cached.update(new)
+
+        reused = len(texts) - len(missing)
+        tokens_saved = sum(estimate_tokens(t) for h, t in zip(hashes, texts) if h not in missing)
+        self.registry.record_embedding_usage(reused, len(missing), tokens_saved)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,173 @@
+"""
+Índice de documentos para recuperación en dos etapas
+Guarda uno o pocos embeddings resumen por documento fuente (centroides de
+segmentos contiguos de sus chunks). La etapa gruesa elige los documentos más
+cercanos a la consulta y la etapa fina busca solo entre sus chunks con un
+filtro de metadata, lo que mantiene la búsqueda rápida y precisa en categorías
+con cientos de PDFs.
+
+Se persiste junto a la colección en chroma_db/documents/{coleccion}/ y los
+vectores se abren memory-mapped (compartidos entre workers).
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from index_publish import delete_directory, open_published, publish_directory, resolve_directory
+
+# Embeddings resumen por documento (segmentos contiguos de chunks)
+DOCUMENT_SEGMENTS = int(os.getenv("DOCUMENT_SEGMENTS", "2"))
+EXPORT_PAGE_SIZE = 1000
+HEADER_FILENAME = "index.json"
+
+# Evita que dos hilos construyan el mismo índice a la vez
+_build_lock = threading.Lock()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def compute_document_vectors(sources: Sequence[str], embeddings: np.ndarray,
+                             segments: int = DOCUMENT_SEGMENTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula los embeddings resumen de cada documento.
+
+    Args:
+        sources: Documento fuente de cada chunk (en orden de lectura)
+        embeddings: Embeddings de los chunks (n x dim)
+        segments: Máximo de centroides por documento
+
+    Returns:
+        (documento de cada vector resumen, vectores resumen normalizados)
+    """
+    embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+    positions = {}
+    for i, source in enumerate(sources):
+        positions.setdefault(source, []).append(i)
+
+    summary_sources, summary_vectors = [], []
+    for source, chunk_positions in positions.items():
+        for segment in np.array_split(np.asarray(chunk_positions), min(segments, len(chunk_positions))):
+            summary_sources.append(source)
+            summary_vectors.append(embeddings[segment].mean(axis=0))
+
+    if not summary_vectors:
+        return np.array([], dtype=str), np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(summary_sources), _normalize(np.vstack(summary_vectors)).astype(np.float32)
+
+
+class DocumentIndex:
+    """Embeddings resumen por documento fuente (solo lectura)."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Directorio del índice
+        """
+        self.path = path
+        path = resolve_directory(path)
+        with open(os.path.join(path, HEADER_FILENAME), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+
+        self.collection_name = header.get("collection")
+        self.version = header["version"]
+        self.sources = np.load(os.path.join(path, "sources.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.document_count = header["document_count"]
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    @staticmethod
+    def save(path: str, version: str, sources: np.ndarray, vectors: np.ndarray,
+             collection_name: Optional[str] = None) -> None:
+        """Escribe el índice en un directorio temporal y lo publica de forma atómica."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        try:
+            np.save(os.path.join(tmp_path, "sources.npy"), np.asarray(sources, dtype=str))
+            np.save(os.path.join(tmp_path, "vectors.npy"), vectors)
+            with open(os.path.join(tmp_path, HEADER_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "collection": collection_name,
+                    "version": version,
+                    "document_count": len(set(np.asarray(sources).tolist()))
+                }, f, ensure_ascii=False)
+
+            publish_directory(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    @classmethod
+    def build(cls, collection, path: str, version: str, segments: int = DOCUMENT_SEGMENTS) -> None:
+        """Construye el índice a partir de los embeddings y metadata de una colección Chroma."""
+        sources, embeddings = [], []
+        for offset in range(0, collection.count(), EXPORT_PAGE_SIZE):
+            page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["embeddings", "metadatas"])
+            sources.extend((metadata or {}).get("source", "") for metadata in page["metadatas"])
+            embeddings.extend(page["embeddings"])
+
+        summary_sources, vectors = compute_document_vectors(sources, np.asarray(embeddings), segments)
+        cls.save(path, version, summary_sources, vectors, collection.name)
+        print(f"📚 Índice de documentos de '{collection.name}' construido "
+              f"({len(set(sources))} documentos, {len(vectors)} vectores resumen)")
+
+    @classmethod
+    def load_or_build(cls, collection, path: str, version: str) -> "DocumentIndex":
+        """Abre el índice persistido, reconstruyéndolo si está desactualizado."""
+        with _build_lock:
+            index = open_published(cls, path)
+            if index and index.version == version:
+                return index
+
+            cls.build(collection, path, version)
+            return cls(path)
+
+    @staticmethod
+    def delete(path: str):
+        """Elimina el índice persistido de una colección (y el formato .npz anterior)."""
+        delete_directory(path)
+        try:
+            os.remove(f"{path}.npz")
+        except FileNotFoundError:
+            pass
+
+    # ==================== CONSULTA ====================
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.vectors.nbytes + self.sources.nbytes)
+
+    def search(self, embedding: Sequence[float], top_documents: int = 5) -> List[Tuple[str, float]]:
+        """
+        Etapa gruesa: documentos más cercanos a la consulta.
+
+        La puntuación de un documento es la de su vector resumen más cercano.
+
+        Returns:
+            Lista de (documento fuente, similitud coseno) en orden descendente
+        """
+        if not len(self.vectors):
+            return []
+
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        scores = self.vectors @ query
+
+        best = {}
+        for i in np.argsort(-scores):
+            source = str(self.sources[i])
+            if source not in best:
+                best[source] = float(scores[i])
+                if len(best) == top_documents:
+                    break
+        return list(best.items())
@@ -0,0 +1,105 @@
+"""
+Proveedores de embeddings
+La API y los scripts de indexación obtienen el cliente de embeddings de aquí,
+según EMBEDDING_PROVIDER:
+
+    openai   OpenAIEmbeddings (EMBEDDING_MODEL, por defecto text-embedding-ada-002)
+    hashing  HashingEmbeddings: local, determinista y sin red. Sirve para operar
+             sin conexión y para medir el rendimiento de indexación y
+             recuperación sin la latencia ni el costo de la API
+
+El nombre del modelo queda en los manifiestos y en el caché de embeddings,
+así que una colección construida con un proveedor no se sirve con otro.
+"""
+
+import hashlib
+import os
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+PROVIDER_OPENAI = "openai"
+PROVIDER_HASHING = "hashing"
+PROVIDERS = (PROVIDER_OPENAI, PROVIDER_HASHING)
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", PROVIDER_OPENAI).lower()
+HASHING_EMBEDDING_DIMENSION = int(os.getenv("HASHING_EMBEDDING_DIMENSION", "384"))
+
+# Máximo de features (token -> índice y signo) memorizadas por HashingEmbeddings
+HASHING_FEATURE_CACHE = 200_000
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings por hashing trick sobre los tokens de lexical_index.tokenize.
+
+    Cada unigrama y bigrama de tokens suma 1 + log(tf) en la posición
+    blake2b(feature) mod dimension, con signo según otro bit del hash (las
+    colisiones se cancelan en promedio). El vector se normaliza (L2), así que
+    textos con vocabulario en común quedan cerca en similitud coseno.
+
+    Determinista entre procesos y máquinas (no usa hash() de Python) y sin
+    dependencias de red ni de modelos.
+    """
+
+    def __init__(self, dimension: int = HASHING_EMBEDDING_DIMENSION):
+        if dimension <= 0:
+            raise ValueError(f"Invalid hashing embedding dimension: {dimension}")
+        self.dimension = dimension
+        self.model = f"hashing-{dimension}"
+        self._features: Dict[str, tuple] = {}
+
+    def _feature(self, feature: str) -> tuple:
+        """(índice, signo) de una feature, memorizado."""
+        cached = self._features.get(feature)
+        if cached is None:
+            value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            cached = (value % self.dimension, 1.0 if (value >> 63) & 1 else -1.0)
+            if len(self._features) < HASHING_FEATURE_CACHE:
+                self._features[feature] = cached
+        return cached
+
+    def _embed(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature, count in counts.items():
+            index, sign = self._feature(feature)
+            vector[index] += sign * (1.0 + np.log(count))
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+
+def embedding_model_name(provider: str = EMBEDDING_PROVIDER) -> str:
+    """Nombre del modelo que registran manifiestos y caché para un proveedor."""
+    if provider == PROVIDER_HASHING:
+        return f"hashing-{HASHING_EMBEDDING_DIMENSION}"
+    return os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """
+    Cliente de embeddings del proveedor configurado.
+
+    Raises:
+        ValueError: Si el proveedor no existe
+    """
+    if provider == PROVIDER_HASHING:
+        return HashingEmbeddings(HASHING_EMBEDDING_DIMENSION)
+    if provider == PROVIDER_OPENAI:
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=embedding_model_name(provider))
+    raise ValueError(f"Unknown embedding provider '{provider}' (expected one of {', '.join(PROVIDERS)})")
@@ -0,0 +1,148 @@
+"""
+Inventario de archivos en memoria (docs/ y videos/)
+Los endpoints de categorías, archivos y videos listaban directorios en cada
+petición. El inventario guarda el listado de cada categoría y lo renueva por
+polling de mtime: como mucho cada refresh_interval segundos se hace un stat
+del directorio raíz y de cada directorio de categoría (no de cada archivo);
+solo las categorías cuyo directorio cambió se vuelven a listar, y lo hacen
+en la siguiente lectura.
+
+Crear, renombrar o borrar un archivo cambia el mtime de su directorio (las
+subidas escriben en un temporal y lo renombran). Los cambios hechos por este
+proceso se aplican de inmediato con invalidate().
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class DirectoryInventory:
+    """Listado en memoria de {root}/{categoria}/*{extension}."""
+
+    def __init__(self, root: str, extension: str, refresh_interval: float = 2.0):
+        """
+        Args:
+            root: Directorio raíz con un subdirectorio por categoría (docs, videos)
+            extension: Extensión de los archivos inventariados (.pdf, .txt)
+            refresh_interval: Segundos mínimos entre comprobaciones de mtime
+        """
+        self.root = root
+        self.extension = extension
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._root_mtime = None
+        self._checked_at: Optional[float] = None
+        # categoría -> {"mtime": mtime del directorio al listar, "files": listado o None, "version": n}
+        self._categories: Dict[str, Dict] = {}
+        self.scans = 0
+
+    # ==================== REFRESCO ====================
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Comprueba mtimes (raíz y categorías) si pasó refresh_interval."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+
+        root_mtime = self._mtime(self.root)
+        if root_mtime != self._root_mtime:
+            self._root_mtime = root_mtime
+            names = set()
+            if root_mtime is not None:
+                with os.scandir(self.root) as entries:
+                    names = {e.name for e in entries if e.is_dir() and not e.name.startswith('.')}
+            for name in set(self._categories) - names:
+                del self._categories[name]
+            for name in names - set(self._categories):
+                self._categories[name] = {"mtime": None, "files": None, "version": 0}
+
+        for name, listing in self._categories.items():
+            if listing["files"] is not None and self._mtime(os.path.join(self.root, name)) != listing["mtime"]:
+                listing["files"] = None
+
+    def _scan(self, name: str, listing: Dict):
+        """Lista los archivos de una categoría (con tamaño y fechas)."""
+        path = os.path.join(self.root, name)
+        listing["mtime"] = self._mtime(path)
+        files = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.extension) and entry.is_file():
+                        stat = entry.stat()
+                        files.append({
+                            "filename": entry.name,
+                            "path": os.path.join(path, entry.name),
+                            "size": stat.st_size,
+                            "ctime": stat.st_ctime,
+                            "mtime": stat.st_mtime
+                        })
+        except FileNotFoundError:
+            pass
+        files.sort(key=lambda f: f["filename"])
+        listing["files"] = files
+        listing["version"] += 1
+        self.scans += 1
+
+    def _listing(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            listing = self._categories.get(name)
+            if listing is not None and listing["files"] is None:
+                self._scan(name, listing)
+            return listing
+
+    def invalidate(self, category: Optional[str] = None):
+        """Fuerza la comprobación en la próxima lectura (tras escribir en disco)."""
+        with self._lock:
+            self._checked_at = None
+            if category is None:
+                self._root_mtime = None
+            if category in self._categories:
+                self._categories[category]["files"] = None
+
+    # ==================== LECTURA ====================
+
+    def categories(self) -> List[str]:
+        """Subdirectorios de categoría (nombres tal como están en disco)."""
+        with self._lock:
+            self._refresh()
+            return sorted(self._categories)
+
+    def exists(self, category: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return category in self._categories
+
+    def files(self, category: str) -> List[Dict]:
+        """Archivos de una categoría: filename, path, size, ctime y mtime (vacío si no existe)."""
+        listing = self._listing(category)
+        return [dict(f) for f in listing["files"]] if listing else []
+
+    def count(self, category: str) -> int:
+        listing = self._listing(category)
+        return len(listing["files"]) if listing else 0
+
+    def snapshot(self, category: str) -> Tuple[int, List[Dict]]:
+        """(versión, archivos sin copiar, no modificar): la versión cambia al volver a listar la categoría."""
+        listing = self._listing(category)
+        return (listing["version"], listing["files"]) if listing else (0, [])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": self.root,
+                "categories": len(self._categories),
+                "files": sum(len(l["files"] or []) for l in self._categories.values()),
+                "scans": self.scans
+            }
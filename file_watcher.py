@@ -0,0 +1,165 @@
+"""
+Watcher de archivos (opt-in, FS_WATCHER=true)
+Detecta archivos agregados, modificados o eliminados directamente en disco
+(por ejemplo copiados por SSH a docs/{categoria} o videos/{categoria})
+comparando snapshots propios (tamaño y mtime de cada archivo) y agenda la
+indexación incremental de solo esos archivos. El watcher no vacía el
+inventario compartido en cada pasada: solo invalida las categorías en las
+que detectó cambios, así los endpoints siguen leyendo el listado en caché.
+
+Las ráfagas se agrupan: una categoría se notifica cuando pasan debounce
+segundos sin cambios nuevos en ella (una copia masiva o un archivo grande
+que aún se está escribiendo genera un único trabajo al terminar).
+
+Con varios workers solo uno vigila: el que obtiene el bloqueo del archivo
+watcher.lock (se libera al terminar el proceso).
+"""
+
+import asyncio
+import fcntl
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from file_inventory import DirectoryInventory
+
+
+def acquire_leader_lock(path: str):
+    """
+    Intenta tomar el bloqueo exclusivo de un archivo sin esperar.
+
+    Returns:
+        El archivo abierto (mantenerlo abierto conserva el bloqueo) o None
+        si otro proceso ya lo tiene
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class InventoryWatcher:
+    """Cambios por categoría de un inventario, agrupados con debounce."""
+
+    def __init__(self, inventory: DirectoryInventory, on_change: Callable[[str, List[str]], Awaitable[None]],
+                 interval: float = 5.0, debounce: float = 10.0):
+        """
+        Args:
+            inventory: Inventario a vigilar (docs o videos)
+            on_change: Corrutina on_change(category, paths) con los archivos
+                       agregados, modificados o eliminados de la categoría
+            interval: Segundos entre comparaciones de snapshots
+            debounce: Segundos sin cambios antes de notificar una categoría
+        """
+        self.inventory = inventory
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self._signatures: Optional[Dict[str, Dict[str, Tuple]]] = None
+        self._pending: Dict[str, set] = {}
+        self._last_change: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.notified = 0
+
+    # ==================== DETECCIÓN ====================
+
+    def _snapshot(self) -> Dict[str, Dict[str, Tuple]]:
+        """
+        {categoría: {ruta: (tamaño, mtime)}} listando el disco.
+
+        Se lista cada categoría sin pasar por el caché del inventario:
+        sobrescribir un archivo en su lugar (scp sobre uno existente) no cambia
+        el mtime del directorio, que es lo que el inventario comprueba.
+        """
+        root, extension = self.inventory.root, self.inventory.extension
+        try:
+            with os.scandir(root) as entries:
+                categories = [e.name for e in entries if e.is_dir() and not e.name.startswith('.')]
+        except FileNotFoundError:
+            return {}
+
+        snapshot = {}
+        for category in categories:
+            path = os.path.join(root, category)
+            files = {}
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(extension) and entry.is_file():
+                            stat = entry.stat()
+                            files[os.path.join(path, entry.name)] = (stat.st_size, stat.st_mtime)
+            except FileNotFoundError:
+                continue
+            snapshot[category] = files
+        return snapshot
+
+    def check(self) -> List[Tuple[str, List[str]]]:
+        """
+        Compara con el snapshot anterior y retorna las categorías listas para notificar.
+
+        La primera llamada solo registra el estado inicial.
+        """
+        with self._lock:
+            current = self._snapshot()
+            now = time.monotonic()
+
+            if self._signatures is not None:
+                for category in set(current) | set(self._signatures):
+                    before = self._signatures.get(category, {})
+                    after = current.get(category, {})
+                    changed = {path for path in set(before) | set(after) if before.get(path) != after.get(path)}
+                    if changed:
+                        self._pending.setdefault(category, set()).update(changed)
+                        self._last_change[category] = now
+                        # El listado en caché puede tener tamaños y fechas viejos
+                        self.inventory.invalidate(category)
+            self._signatures = current
+
+            ready = []
+            for category in list(self._pending):
+                if now - self._last_change[category] >= self.debounce:
+                    ready.append((category, sorted(self._pending.pop(category))))
+                    self._last_change.pop(category, None)
+            return ready
+
+    # ==================== CICLO DE VIDA ====================
+
+    async def start(self):
+        await asyncio.to_thread(self.check)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                for category, paths in await asyncio.to_thread(self.check):
+                    print(f"👀 {len(paths)} archivos cambiaron en {self.inventory.root}/{category}")
+                    self.notified += 1
+                    await self.on_change(category, paths)
+            except Exception as e:
+                print(f"⚠️ Error en watcher de {self.inventory.root}: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": self.inventory.root,
+                "interval_seconds": self.interval,
+                "debounce_seconds": self.debounce,
+                "pending": {category: len(paths) for category, paths in self._pending.items()},
+                "notified": self.notified
+            }
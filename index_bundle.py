@@ -0,0 +1,223 @@
+"""
+Bundles de índice portables
+Empaqueta la colección activa de una categoría (embeddings, textos, metadata y
+manifiesto) en un único archivo .ragbundle versionado y con checksums, para
+aprovisionar nodos nuevos sin re-embeber (reindex_documents.py) ni copiar
+chroma_db con rsync.
+
+Formato (zip sin compresión):
+    bundle.json     versión del formato, categoría, manifiesto y sha256 de cada miembro
+    embeddings.f32  matriz float32 (chunks x dimensión) tal como está en Chroma
+    chunks.jsonl    un chunk por línea: id, texto y metadata
+
+La importación verifica los checksums y el modelo de embeddings antes de
+escribir, construye una colección versionada nueva, comprueba el conteo y
+solo entonces la activa (igual que una re-indexación).
+
+Uso (con la API detenida, o reiniciándola después de importar):
+    python index_bundle.py export geomecanica --output bundles/geomecanica.ragbundle
+    python index_bundle.py import bundles/geomecanica.ragbundle
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_EXTENSION = ".ragbundle"
+METADATA_MEMBER = "bundle.json"
+EMBEDDINGS_MEMBER = "embeddings.f32"
+CHUNKS_MEMBER = "chunks.jsonl"
+EXPORT_PAGE_SIZE = 1000
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class BundleError(ValueError):
+    """Bundle corrupto, incompleto o de un formato no soportado."""
+
+
+def _hash_member(bundle: zipfile.ZipFile, member: str) -> str:
+    sha256 = hashlib.sha256()
+    with bundle.open(member) as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def write_bundle(collection, path: str, category: str, manifest: Dict,
+                 category_config: Optional[Dict] = None) -> Dict:
+    """
+    Exporta una colección Chroma a un bundle.
+
+    Args:
+        collection: Colección chromadb (o ShardedCollection) a exportar
+        path: Archivo .ragbundle de destino (se escribe de forma atómica)
+        category: Categoría a la que pertenece la colección
+        manifest: Manifiesto de la colección
+        category_config: Entrada de categories_config.json (prompts y ajustes)
+
+    Returns:
+        Metadata del bundle (bundle.json)
+    """
+    count = collection.count()
+    work_directory = tempfile.mkdtemp(prefix="bundle_")
+    embeddings_path = os.path.join(work_directory, EMBEDDINGS_MEMBER)
+    chunks_path = os.path.join(work_directory, CHUNKS_MEMBER)
+
+    try:
+        hashes = {EMBEDDINGS_MEMBER: hashlib.sha256(), CHUNKS_MEMBER: hashlib.sha256()}
+        exported, dimension = 0, None
+
+        with open(embeddings_path, "wb") as embeddings_file, open(chunks_path, "wb") as chunks_file:
+            for offset in range(0, count, EXPORT_PAGE_SIZE):
+                page = collection.get(
+                    limit=EXPORT_PAGE_SIZE, offset=offset,
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                vectors = np.ascontiguousarray(page["embeddings"], dtype=np.float32)
+                if len(vectors):
+                    dimension = vectors.shape[1]
+                data = vectors.tobytes()
+                embeddings_file.write(data)
+                hashes[EMBEDDINGS_MEMBER].update(data)
+
+                metadatas = page["metadatas"] or [None] * len(page["ids"])
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], metadatas):
+                    line = json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}},
+                                      ensure_ascii=False).encode("utf-8") + b"\n"
+                    chunks_file.write(line)
+                    hashes[CHUNKS_MEMBER].update(line)
+                exported += len(page["ids"])
+
+        if exported != count:
+            raise BundleError(f"Exported {exported} chunks, expected {count}")
+
+        metadata = {
+            "bundle_version": BUNDLE_FORMAT_VERSION,
+            "category": category,
+            "collection": manifest.get("collection"),
+            "exported_at": datetime.utcnow().isoformat(),
+            "chunk_count": count,
+            "dimension": dimension,
+            "manifest": manifest,
+            "category_config": category_config,
+            "members": {
+                member: {"sha256": sha256.hexdigest(), "bytes": os.path.getsize(os.path.join(work_directory, member))}
+                for member, sha256 in hashes.items()
+            }
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as bundle:
+            bundle.writestr(METADATA_MEMBER, json.dumps(metadata, ensure_ascii=False, indent=2))
+            bundle.write(embeddings_path, EMBEDDINGS_MEMBER)
+            bundle.write(chunks_path, CHUNKS_MEMBER)
+        os.replace(tmp_path, path)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    return metadata
+
+
+def read_bundle(path: str) -> Dict:
+    """
+    Lee y verifica un bundle (formato, tamaños y sha256 de cada miembro).
+
+    Returns:
+        Metadata del bundle (bundle.json)
+
+    Raises:
+        BundleError: Si el bundle está corrupto, incompleto o es de otra versión
+    """
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            metadata = json.loads(bundle.read(METADATA_MEMBER))
+
+            if metadata.get("bundle_version") != BUNDLE_FORMAT_VERSION:
+                raise BundleError(f"Unsupported bundle version: {metadata.get('bundle_version')}")
+
+            for member, expected in metadata["members"].items():
+                if bundle.getinfo(member).file_size != expected["bytes"]:
+                    raise BundleError(f"Size mismatch for '{member}'")
+                if _hash_member(bundle, member) != expected["sha256"]:
+                    raise BundleError(f"Checksum mismatch for '{member}'")
+    except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+        raise BundleError(f"Invalid bundle '{path}': {e}")
+
+    expected_bytes = metadata["chunk_count"] * (metadata["dimension"] or 0) * 4
+    if metadata["members"][EMBEDDINGS_MEMBER]["bytes"] != expected_bytes:
+        raise BundleError("Embeddings size does not match chunk_count x dimension")
+    return metadata
+
+
+def iter_bundle_chunks(path: str, metadata: Dict, batch_size: int = EXPORT_PAGE_SIZE
+                       ) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict]]]:
+    """Recorre los chunks de un bundle por lotes: (ids, embeddings, textos, metadatas)."""
+    row_bytes = (metadata["dimension"] or 0) * 4
+    with zipfile.ZipFile(path) as bundle, bundle.open(EMBEDDINGS_MEMBER) as embeddings_file, \
+            bundle.open(CHUNKS_MEMBER) as chunks_file:
+        while True:
+            lines = [line for line in (chunks_file.readline() for _ in range(batch_size)) if line]
+            if not lines:
+                return
+
+            chunks = [json.loads(line) for line in lines]
+            vectors = np.frombuffer(embeddings_file.read(row_bytes * len(chunks)), dtype=np.float32)
+            if len(vectors) != len(chunks) * (metadata["dimension"] or 0):
+                raise BundleError("Embeddings and chunks are out of sync")
+
+            yield (
+                [chunk["id"] for chunk in chunks],
+                vectors.reshape(len(chunks), -1),
+                [chunk["text"] for chunk in chunks],
+                [chunk["metadata"] for chunk in chunks]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta/importa bundles de índice de una categoría")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta la colección activa de una categoría")
+    export_parser.add_argument("category")
+    export_parser.add_argument("--output", help=f"Archivo de salida (por defecto bundles/{{categoria}}{BUNDLE_EXTENSION})")
+
+    import_parser = subparsers.add_parser("import", help="Importa y activa un bundle")
+    import_parser.add_argument("bundle")
+    import_parser.add_argument("--category", help="Categoría de destino (por defecto la del bundle)")
+
+    args = parser.parse_args()
+
+    # La lógica de colecciones, registro y caché vive en la API
+    import main as api
+
+    print("=" * 60)
+    inicio = time.perf_counter()
+    if args.command == "export":
+        output = args.output or os.path.join("bundles", f"{api.normalize_category(args.category)}{BUNDLE_EXTENSION}")
+        print(f"📦 EXPORTANDO '{args.category}' -> {output}")
+        print("=" * 60)
+        metadata = api.export_category_bundle(args.category, output)
+        print(f"✅ {metadata['chunk_count']} chunks exportados "
+              f"({os.path.getsize(output) / 1024 / 1024:.1f} MB) en {time.perf_counter() - inicio:.1f}s")
+    else:
+        print(f"📥 IMPORTANDO {args.bundle}")
+        print("=" * 60)
+        result = api.import_category_bundle(args.bundle, args.category)
+        duration = time.perf_counter() - inicio
+        print(f"✅ {result['chunks']} chunks importados en '{result['category']}' ({result['collection']}) "
+              f"en {duration:.1f}s ({result['chunks'] / max(duration, 1e-6):.0f} chunks/s, sin llamadas de embeddings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Publicación atómica de índices en disco
+Los índices derivados (exportación NumPy, BM25, índice de documentos) se
+construyen en un directorio temporal y se publican en {ruta}, que es un enlace
+simbólico a un directorio versionado ({ruta}.v{id}). Publicar es reemplazar el
+enlace con os.replace: {ruta} existe en todo momento, así que un worker que
+llama a load_or_build mientras otro publica abre la versión anterior o la
+nueva, y nunca ve el índice ausente ni se pone a reconstruirlo a la vez.
+
+Los lectores resuelven el enlace una sola vez (resolve_directory) y abren
+todos los archivos de esa versión aunque se publique otra mientras tanto.
+"""
+
+import glob
+import os
+import re
+import shutil
+import uuid
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Intentos de apertura cuando la versión resuelta desaparece entretanto
+OPEN_ATTEMPTS = 3
+
+_VERSION_SUFFIX = re.compile(r"\.v[0-9a-f]{32}$")
+
+
+def resolve_directory(path: str) -> str:
+    """Directorio versionado al que apunta {ruta} (o la ruta misma si no es un enlace)."""
+    return os.path.realpath(path)
+
+
+def open_published(opener: Callable[[str], T], path: str) -> Optional[T]:
+    """
+    Abre un índice publicado; None si no existe.
+
+    Si la versión resuelta se reemplazó y se borró mientras se abría, se
+    reintenta con la versión nueva en lugar de reconstruir.
+    """
+    for _ in range(OPEN_ATTEMPTS):
+        try:
+            return opener(path)
+        except FileNotFoundError:
+            if not os.path.islink(path):
+                return None
+    return None
+
+
+def publish_directory(tmp_path: str, path: str) -> None:
+    """
+    Publica un directorio recién construido como la versión actual de path.
+
+    La versión anterior se elimina después del cambio; los procesos que la
+    tengan mapeada la siguen leyendo hasta recargar (los archivos borrados
+    siguen mapeados).
+    """
+    version_path = f"{path}.v{uuid.uuid4().hex}"
+    os.rename(tmp_path, version_path)
+
+    previous = resolve_directory(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Formato anterior (directorio real): se aparta una única vez
+        previous = f"{path}.{uuid.uuid4().hex}.old"
+        os.rename(path, previous)
+
+    link_path = f"{path}.{uuid.uuid4().hex}.link"
+    os.symlink(os.path.basename(version_path), link_path)
+    try:
+        os.replace(link_path, path)
+    except OSError:
+        os.remove(link_path)
+        shutil.rmtree(version_path, ignore_errors=True)
+        raise
+
+    if previous and previous != version_path:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def delete_directory(path: str) -> None:
+    """Elimina el enlace de path y todas sus versiones."""
+    target = resolve_directory(path) if os.path.islink(path) else None
+    if os.path.islink(path):
+        os.remove(path)
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+    if target:
+        shutil.rmtree(target, ignore_errors=True)
+    # Versiones que quedaron de publicaciones simultáneas entre procesos
+    for version_path in glob.glob(f"{glob.escape(path)}.v*"):
+        if _VERSION_SUFFIX.search(version_path):
+            shutil.rmtree(version_path, ignore_errors=True)
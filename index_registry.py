@@ -0,0 +1,266 @@
+"""
+Registro de versiones de índices vectoriales
+Cada re-indexación escribe una colección Chroma nueva y versionada; un puntero
+por categoría (index_pointers.json) indica cuál está activa. El cambio de
+puntero es atómico (y se serializa entre procesos con un flock sobre
+index_pointers.json.lock), lo que permite re-indexar sin cortar el servicio y
+hacer rollback a la versión anterior.
+
+Cada colección lleva además un manifiesto (manifests/{coleccion}.json) con el
+número de chunks, modelo y dimensión de embeddings, fecha de construcción y
+hashes de los archivos fuente, que se valida al cargar sin hacer consultas.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from embedding_providers import embedding_model_name
+
+POINTERS_FILENAME = "index_pointers.json"
+MANIFESTS_DIRNAME = "manifests"
+MANIFEST_VERSION = 1
+
+# Modelo de embeddings compartido por la API y los scripts de indexación
+# (según EMBEDDING_PROVIDER, ver embedding_providers.py)
+EMBEDDING_MODEL = embedding_model_name()
+
+
+class IndexRegistry:
+    """Gestiona los punteros categoría -> colección activa."""
+
+    def __init__(self, persist_directory: str = "chroma_db"):
+        self.persist_directory = persist_directory
+        self.pointers_path = os.path.join(persist_directory, POINTERS_FILENAME)
+        self.manifests_directory = os.path.join(persist_directory, MANIFESTS_DIRNAME)
+        self._lock = threading.RLock()
+        self._pointers: Dict[str, Dict] = {}
+        self._mtime: Optional[float] = None
+        # Manifiestos leídos: {coleccion: ((mtime_ns, inode), manifiesto)}
+        self._manifests: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+
+    # ==================== LECTURA ====================
+
+    def _load(self) -> Dict[str, Dict]:
+        """Carga los punteros desde disco si el archivo cambió."""
+        try:
+            mtime = os.path.getmtime(self.pointers_path)
+        except OSError:
+            self._pointers, self._mtime = {}, None
+            return self._pointers
+
+        if mtime != self._mtime:
+            with open(self.pointers_path, 'r', encoding='utf-8') as f:
+                self._pointers = json.load(f)
+            self._mtime = mtime
+        return self._pointers
+
+    def get_active(self, category: str) -> str:
+        """
+        Nombre de la colección activa de una categoría.
+
+        Las categorías indexadas antes del versionado (reindex_documents.py)
+        no tienen puntero y usan el nombre de la categoría como colección.
+        """
+        with self._lock:
+            entry = self._load().get(category)
+            return entry["active"] if entry else category
+
+    def get_entry(self, category: str) -> Dict:
+        """Estado de versiones de una categoría."""
+        with self._lock:
+            entry = self._load().get(category)
+            if entry:
+                return dict(entry)
+            return {"active": category, "previous": None, "versions": [category], "updated_at": None}
+
+    # ==================== ESCRITURA ====================
+
+    @contextmanager
+    def _locked(self):
+        """
+        Bloqueo exclusivo entre threads y procesos para leer-modificar-escribir.
+
+        Dentro del bloqueo los punteros se releen siempre de disco, así un
+        worker nunca escribe a partir de una copia vieja y no pierde las
+        activaciones (ni la lista de versiones) de otro worker.
+        """
+        with self._lock:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            with open(f"{self.pointers_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._mtime = None
+                self._load()
+                yield
+
+    def _save(self):
+        """Escribe los punteros de forma atómica (tmp + rename); requiere _locked."""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp_path = f"{self.pointers_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._pointers, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.pointers_path)
+        self._mtime = os.path.getmtime(self.pointers_path)
+
+    def new_version(self, category: str) -> str:
+        """Genera el nombre de una colección nueva para la categoría."""
+        return f"{category}__v{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+
+    def activate(self, category: str, collection_name: str) -> List[str]:
+        """
+        Activa una colección ya construida y verificada.
+
+        Returns:
+            Colecciones sobrantes que el llamador debe eliminar (garbage collection)
+        """
+        with self._locked():
+            entry = self.get_entry(category)
+
+            # Se conservan la versión nueva y la que estaba activa (para rollback)
+            keep = [entry["active"], collection_name] if entry["active"] != collection_name else [collection_name]
+            stale = [v for v in entry["versions"] if v not in keep]
+
+            self._pointers[category] = {
+                "active": collection_name,
+                "previous": keep[0] if len(keep) == 2 else entry.get("previous"),
+                "versions": keep,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            self._save()
+
+        print(f"🔀 Categoría '{category}' ahora sirve la colección '{collection_name}'")
+        return stale
+
+    def rollback(self, category: str) -> str:
+        """
+        Vuelve a activar la versión anterior de una categoría.
+
+        Returns:
+            Nombre de la colección reactivada
+
+        Raises:
+            ValueError: Si no hay versión anterior disponible
+        """
+        with self._locked():
+            entry = self.get_entry(category)
+            previous = entry.get("previous")
+            if not previous or previous not in entry["versions"]:
+                raise ValueError(f"No previous index version available for '{category}'")
+
+            self._pointers[category] = {
+                **entry,
+                "active": previous,
+                "previous": entry["active"],
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            self._save()
+
+        print(f"⏪ Rollback de '{category}' a la colección '{previous}'")
+        return previous
+
+    def drop(self, category: str, delete_collection: Callable[[str], None]):
+        """Elimina todas las versiones de una categoría y su puntero."""
+        with self._locked():
+            entry = self.get_entry(category)
+            for name in set(entry["versions"]) | {category}:
+                try:
+                    delete_collection(name)
+                except Exception as e:
+                    print(f"⚠️ No se pudo eliminar la colección '{name}': {e}")
+
+            if self._pointers.pop(category, None) is not None:
+                self._save()
+
+    # ==================== MANIFIESTOS ====================
+
+    def _manifest_path(self, collection_name: str) -> str:
+        return os.path.join(self.manifests_directory, f"{collection_name}.json")
+
+    def write_manifest(self, collection_name: str, manifest: Dict):
+        """Guarda el manifiesto de una colección de forma atómica."""
+        os.makedirs(self.manifests_directory, exist_ok=True)
+        path = self._manifest_path(collection_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def read_manifest(self, collection_name: str) -> Optional[Dict]:
+        """
+        Manifiesto de una colección o None si no tiene (índices antiguos).
+
+        Se relee solo si el archivo cambió (un stat por llamada), así se puede
+        consultar en cada petición para detectar versiones nuevas escritas por
+        otro proceso.
+        """
+        path = self._manifest_path(collection_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._manifests.pop(collection_name, None)
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_ino)
+        cached = self._manifests.get(collection_name)
+        if cached and cached[0] == key:
+            return dict(cached[1])
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        self._manifests[collection_name] = (key, manifest)
+        return dict(manifest)
+
+    def delete_manifest(self, collection_name: str):
+        self._manifests.pop(collection_name, None)
+        try:
+            os.remove(self._manifest_path(collection_name))
+        except FileNotFoundError:
+            pass
+
+
+def build_manifest(category: str, collection_name: str, chunk_count: int, dimension: Optional[int],
+                   source_files: Dict[str, str], embedding_model: str = EMBEDDING_MODEL,
+                   chunk_size: int = 1500, chunk_overlap: int = 150, shards: int = 1) -> Dict:
+    """
+    Construye el manifiesto de una colección.
+
+    Args:
+        source_files: {ruta: sha256} de los archivos indexados
+        shards: Número de colecciones shard (1 = colección única)
+    """
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "category": category,
+        "collection": collection_name,
+        "chunk_count": chunk_count,
+        "embedding_model": embedding_model,
+        "dimension": dimension,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "shards": shards,
+        "built_at": datetime.utcnow().isoformat(),
+        "source_files": source_files
+    }
+
+
+def validate_manifest(manifest: Dict, embedding_model: str = EMBEDDING_MODEL):
+    """
+    Valida un manifiesto contra la configuración actual.
+
+    Raises:
+        ValueError: Si el índice está vacío o fue construido con otro modelo
+    """
+    if manifest.get("embedding_model") != embedding_model:
+        raise ValueError(
+            f"Index built with embedding model '{manifest.get('embedding_model')}' "
+            f"but the API is configured with '{embedding_model}'"
+        )
+    if not manifest.get("chunk_count"):
+        raise ValueError("Index is empty")
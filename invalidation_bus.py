@@ -0,0 +1,231 @@
+"""
+Bus de invalidación entre workers y nodos
+Cada cambio administrativo (re-indexación, rollback, prompts, configuración o
+borrado de una categoría) incrementa una generación por categoría y ámbito en
+un documento compartido (MongoDB o, sin MongoDB, un archivo JSON local que
+comparten los workers del nodo).
+
+Cada proceso consulta las generaciones cada pocos segundos y, ante una
+generación nueva publicada por otro proceso, ejecuta los handlers suscritos
+al ámbito (que solo descartan cachés: la recarga ocurre en la siguiente
+consulta). El retraso de propagación observado se registra en el log y en
+las estadísticas.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Ámbitos de invalidación
+SCOPE_INDEX = "index"          # colección activa / índices derivados
+SCOPE_PROMPTS = "prompts"      # prompts personalizados
+SCOPE_CONFIG = "config"        # configuración, alta o borrado de la categoría
+
+SCOPES = (SCOPE_INDEX, SCOPE_PROMPTS, SCOPE_CONFIG)
+
+DELAY_SAMPLES = 200
+
+
+def process_origin() -> str:
+    """Identificador del proceso que publica (nodo:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LocalGenerationStore:
+    """Generaciones en un archivo JSON local compartido por los workers (modo sin MongoDB)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat = None
+        self._generations: Dict[str, Dict] = {}
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Error al leer {self.path}: {e}")
+            return {}
+
+    def bump_generation(self, category: str, scope: str, origin: str) -> Optional[Dict]:
+        """Incrementa la generación de un ámbito; bloqueo de archivo entre procesos."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generations = self._read()
+            entry = generations.setdefault(category, {"category": category})
+            current = entry.get(scope) or {}
+            entry[scope] = {
+                "generation": current.get("generation", 0) + 1,
+                "published_at": time.time(),
+                "origin": origin
+            }
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(generations, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            return dict(entry)
+
+    def list_generations(self) -> List[Dict]:
+        """Generaciones de todas las categorías (el archivo se relee solo si cambió)."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+                key = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+            except FileNotFoundError:
+                key = None
+            if key != self._stat:
+                self._generations = self._read() if key else {}
+                self._stat = key
+            return list(self._generations.values())
+
+
+class InvalidationBus:
+    """
+    Difunde cambios de generación por categoría a todos los procesos.
+
+    Los cambios propios no disparan handlers (el proceso que publica ya
+    actualizó su estado); los de otros procesos sí, una vez por generación.
+    """
+
+    def __init__(self, store, poll_interval: float = 2.0, origin: Optional[str] = None):
+        """
+        Args:
+            store: Objeto con bump_generation / list_generations
+                   (MongoManager o LocalGenerationStore)
+            poll_interval: Segundos entre consultas de generaciones
+            origin: Identificador de este proceso (por defecto nodo:pid)
+        """
+        self.store = store
+        self.poll_interval = poll_interval
+        self.origin = origin or process_origin()
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {scope: [] for scope in SCOPES}
+        self._seen: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._primed = False
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self._published = 0
+        self._received = 0
+        self._last_poll = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+    # ==================== CICLO DE VIDA ====================
+
+    async def start(self):
+        """Registra las generaciones actuales y arranca la consulta periódica."""
+        await asyncio.to_thread(self.poll)
+        self._poll_task = asyncio.create_task(self._poller())
+
+    async def stop(self):
+        if self._poll_task:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    async def _poller(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.poll)
+            except Exception as e:
+                print(f"⚠️ Error consultando generaciones: {e}")
+
+    # ==================== API PÚBLICA ====================
+
+    def subscribe(self, scope: str, handler: Callable[[str], None]):
+        """Registra handler(category) para los cambios de un ámbito publicados por otros procesos."""
+        self._handlers[scope].append(handler)
+
+    def publish(self, category: str, scope: str):
+        """Anuncia a los demás procesos que un ámbito de la categoría cambió."""
+        try:
+            entry = self.store.bump_generation(category, scope, self.origin)
+        except Exception as e:
+            print(f"⚠️ No se pudo publicar la invalidación '{scope}' de '{category}': {e}")
+            return
+
+        if entry:
+            with self._lock:
+                self._seen[(category, scope)] = entry[scope]["generation"]
+                self._published += 1
+            print(f"📡 Invalidación '{scope}' de '{category}' publicada (generación {entry[scope]['generation']})")
+
+    def poll(self) -> int:
+        """
+        Consulta las generaciones y ejecuta los handlers de las que cambiaron.
+
+        Returns:
+            Número de invalidaciones recibidas de otros procesos
+        """
+        # Si otro thread está consultando, su resultado sirve para ambos
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            changes = []
+            for entry in self.store.list_generations():
+                category = entry["category"]
+                for scope in SCOPES:
+                    state = entry.get(scope)
+                    if not state:
+                        continue
+                    key = (category, scope)
+                    if self._seen.get(key, 0) >= state["generation"]:
+                        continue
+                    self._seen[key] = state["generation"]
+                    if self._primed and state.get("origin") != self.origin:
+                        changes.append((category, scope, state))
+            self._primed = True
+            self._last_poll = time.time()
+        finally:
+            self._lock.release()
+
+        for category, scope, state in changes:
+            delay = max(time.time() - state["published_at"], 0.0)
+            with self._lock:
+                self._delays.append(delay)
+                self._received += 1
+            print(f"📡 Invalidación '{scope}' de '{category}' recibida de {state['origin']} "
+                  f"(generación {state['generation']}, retraso {delay * 1000:.0f} ms)")
+            for handler in self._handlers[scope]:
+                try:
+                    handler(category)
+                except Exception as e:
+                    print(f"⚠️ Error aplicando invalidación '{scope}' de '{category}': {e}")
+        return len(changes)
+
+    def stats(self) -> Dict:
+        """Invalidaciones publicadas/recibidas y retraso de propagación observado."""
+        with self._lock:
+            delays = np.array(self._delays) * 1000
+            stats = {
+                "origin": self.origin,
+                "backend": type(self.store).__name__,
+                "poll_interval_seconds": self.poll_interval,
+                "published": self._published,
+                "received": self._received,
+                "last_poll": self._last_poll
+            }
+        if len(delays):
+            p50, p95 = np.percentile(delays, [50, 95])
+            stats["propagation_delay_ms"] = {
+                "last": round(float(delays[-1]), 1),
+                "p50": round(float(p50), 1),
+                "p95": round(float(p95), 1),
+                "max": round(float(delays.max()), 1)
+            }
+        return stats
@@ -0,0 +1,491 @@
+"""
+Cola de trabajos de indexación en segundo plano
+Encola re-indexaciones, las procesa de a una categoría y persiste su estado
+(MongoDB o disco local) para sobrevivir reinicios.
+
+Con varios workers sobre el mismo MongoDB, cada trabajo tiene un dueño
+(owner) y un lease que el dueño renueva mientras el trabajo sigue activo. Al
+arrancar, y periódicamente, un worker solo retoma los trabajos cuyo lease
+venció (su dueño murió) y los reclama de forma atómica, así que una misma
+re-indexación no se ejecuta en dos workers. La deduplicación de trabajos
+encolados y la exclusión por categoría también se resuelven en el
+almacenamiento (queue_key / run_key), no en la memoria de cada worker.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Estados posibles de un trabajo
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Trabajos de transcripciones de videos (colección aparte de la categoría)
+JOB_TYPE_VIDEO = "video"
+
+# Archivo de respaldo cuando MongoDB no está disponible
+LOCAL_JOBS_FILE = "index_jobs.json"
+LOCAL_JOBS_LIMIT = 200
+
+# Segundos de validez del lease de un trabajo; el dueño lo renueva cada tercio
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Segundos de espera antes de reintentar un trabajo cuya categoría indexa otro worker
+JOB_BUSY_RETRY_SECONDS = 5.0
+
+
+class JobLeaseLost(Exception):
+    """El trabajo ya no pertenece a este worker (o no se pudo persistir su estado)."""
+
+
+def job_key(category: str, job_type: str) -> str:
+    """
+    Clave de exclusión de un trabajo: por categoría, separando los de videos.
+
+    Se guarda como queue_key mientras el trabajo está en cola (admite un solo
+    trabajo encolado por clave) y como run_key mientras se ejecuta (admite uno
+    solo en ejecución), de modo que una categoría se indexa de a un trabajo
+    aunque haya varios workers.
+    """
+    return f"{category}:{JOB_TYPE_VIDEO if job_type == JOB_TYPE_VIDEO else 'index'}"
+
+
+def merge_queued_job(job: Dict, job_type: str, files: List[str]) -> Dict:
+    """
+    Combina un trabajo nuevo con uno ya encolado de la misma clave.
+
+    Una re-indexación completa absorbe a las incrementales y las incrementales
+    (o de videos) acumulan sus archivos.
+    """
+    if job_type == "reindex":
+        job.update({"job_type": "reindex", "files": []})
+    elif job["job_type"] in ("incremental", JOB_TYPE_VIDEO):
+        job["files"] = sorted(set(job["files"]) | set(files))
+    return job
+
+
+class LocalJobStore:
+    """
+    Persistencia de trabajos en un archivo JSON local (modo sin MongoDB).
+
+    Con varios workers (uvicorn --workers N) cada escritura relee el archivo
+    bajo un bloqueo entre procesos (flock), así que los reclamos de leases son
+    atómicos y ningún worker pisa los trabajos encolados por otro.
+    """
+
+    def __init__(self, path: str = LOCAL_JOBS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_file(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Error al leer {self.path}: {e}")
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Bloqueo exclusivo entre threads y procesos con el archivo recién leído."""
+        with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield self._read_file()
+
+    def _flush(self, jobs: Dict[str, Dict]):
+        """Escribe el archivo de forma atómica (tmp + rename); requiere _locked."""
+        # Conservar solo los trabajos más recientes
+        if len(jobs) > LOCAL_JOBS_LIMIT:
+            ordered = sorted(jobs.values(), key=lambda j: j["created_at"])
+            for job in ordered[:len(jobs) - LOCAL_JOBS_LIMIT]:
+                if job["status"] not in ACTIVE_STATUSES:
+                    jobs.pop(job["job_id"], None)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def enqueue_index_job(self, job: Dict) -> Tuple[Dict, bool]:
+        with self._locked() as jobs:
+            for queued in jobs.values():
+                if queued.get("queue_key") == job["queue_key"] and queued["status"] == JOB_QUEUED:
+                    merge_queued_job(queued, job["job_type"], job["files"])
+                    self._flush(jobs)
+                    return dict(queued), False
+            jobs[job["job_id"]] = dict(job)
+            self._flush(jobs)
+            return dict(job), True
+
+    def save_index_job(self, job_id: str, owner: str, fields: Dict) -> bool:
+        with self._locked() as jobs:
+            job = jobs.get(job_id)
+            if not job or job.get("owner") != owner:
+                return False
+            job.update(fields)
+            self._flush(jobs)
+            return True
+
+    def start_index_job(self, job_id: str, owner: str, run_key: str, fields: Dict) -> Optional[Dict]:
+        with self._locked() as jobs:
+            job = jobs.get(job_id)
+            if not job or job.get("owner") != owner or job["status"] != JOB_QUEUED:
+                return None
+            if any(j.get("run_key") == run_key and j["status"] == JOB_RUNNING for j in jobs.values()):
+                return None
+            job.update({**fields, "status": JOB_RUNNING, "queue_key": None, "run_key": run_key})
+            self._flush(jobs)
+            return dict(job)
+
+    def get_index_job(self, job_id: str) -> Optional[Dict]:
+        job = self._read_file().get(job_id)
+        return dict(job) if job else None
+
+    def list_index_jobs(self, limit: int = 50, statuses: Optional[List[str]] = None) -> List[Dict]:
+        jobs = [j for j in self._read_file().values() if not statuses or j["status"] in statuses]
+        jobs.sort(key=lambda j: j["created_at"], reverse=True)
+        return jobs[:limit]
+
+    def claim_index_job(self, job_id: str, owner: str, lease_until: float, now: float) -> Optional[Dict]:
+        with self._locked() as jobs:
+            job = jobs.get(job_id)
+            if (not job or job["status"] not in ACTIVE_STATUSES
+                    or (job.get("owner") != owner and (job.get("lease_expires_at") or 0) >= now)):
+                return None
+            job.update({"owner": owner, "lease_expires_at": lease_until})
+            self._flush(jobs)
+            return dict(job)
+
+
+class IndexJobQueue:
+    """
+    Cola de indexación con un único worker.
+
+    El worker procesa un trabajo (una categoría) a la vez y ejecuta el handler
+    en un thread para no bloquear el event loop de FastAPI.
+    """
+
+    def __init__(self, handler: Callable[[Dict, Callable[..., None]], Dict], store):
+        """
+        Args:
+            handler: Función síncrona handler(job, progress) que ejecuta el trabajo
+                     y retorna un dict con el resultado
+            store: Objeto con enqueue_index_job / save_index_job / start_index_job /
+                   get_index_job / list_index_jobs / claim_index_job
+                   (MongoManager o LocalJobStore)
+        """
+        self.handler = handler
+        self.store = store
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._lease_task: Optional[asyncio.Task] = None
+
+    # ==================== CICLO DE VIDA ====================
+
+    async def start(self):
+        """Recupera trabajos huérfanos y arranca el worker y la renovación de leases."""
+        self._queue = asyncio.Queue()
+
+        # Trabajos que quedaron encolados o a medias y cuyo dueño ya no renueva el lease
+        recovered = self._adopt_orphans()
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        if recovered:
+            print(f"♻️ {len(recovered)} trabajos de indexación recuperados tras reinicio")
+
+        self._worker_task = asyncio.create_task(self._worker())
+        self._lease_task = asyncio.create_task(self._lease_loop())
+
+    async def stop(self):
+        """Detiene el worker (los trabajos pendientes se retoman cuando vence su lease)."""
+        for task in (self._lease_task, self._worker_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker_task = None
+        self._lease_task = None
+
+    # ==================== LEASES ====================
+
+    def _lease_until(self) -> float:
+        return time.time() + JOB_LEASE_SECONDS
+
+    def _adopt_orphans(self) -> List[str]:
+        """
+        Reclama los trabajos activos con lease vencido (o sin lease).
+
+        Returns:
+            IDs de los trabajos adoptados, en orden de creación, para encolar
+            desde el event loop
+        """
+        now = time.time()
+        pending = self.store.list_index_jobs(limit=LOCAL_JOBS_LIMIT, statuses=list(ACTIVE_STATUSES))
+        pending.sort(key=lambda j: j["created_at"])
+        adopted = []
+        for job in pending:
+            if job["job_id"] in self._jobs or (job.get("lease_expires_at") or 0) >= now:
+                continue
+            # Atómico: si otro worker lo reclamó primero, claim retorna None
+            claimed = self.store.claim_index_job(job["job_id"], self.owner, self._lease_until(), now)
+            if not claimed:
+                continue
+            claimed.pop("_id", None)
+            # Ya no admite combinaciones: puede haber otro trabajo encolado para la categoría
+            reset = {"status": JOB_QUEUED, "stage": "queued", "progress": 0.0, "started_at": None,
+                     "queue_key": None, "run_key": None}
+            try:
+                if not self.store.save_index_job(claimed["job_id"], self.owner, reset):
+                    continue
+            except Exception as e:
+                print(f"⚠️ Error al adoptar trabajo {claimed['job_id']}: {e}")
+                continue
+            claimed.update(reset)
+            with self._lock:
+                self._jobs[claimed["job_id"]] = claimed
+            adopted.append(claimed["job_id"])
+        return adopted
+
+    def _renew_leases(self) -> List[str]:
+        """Renueva el lease de los trabajos propios y adopta los huérfanos."""
+        now = time.time()
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            claimed = self.store.claim_index_job(job_id, self.owner, self._lease_until(), now)
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job and claimed:
+                    job["lease_expires_at"] = claimed["lease_expires_at"]
+            if job and not claimed:
+                print(f"⚠️ Lease del trabajo {job_id} reclamado por otro worker")
+        return self._adopt_orphans()
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                adopted = await asyncio.to_thread(self._renew_leases)
+            except Exception as e:
+                print(f"⚠️ Error al renovar leases de indexación: {e}")
+                continue
+            for job_id in adopted:
+                self._queue.put_nowait(job_id)
+            if adopted:
+                print(f"♻️ {len(adopted)} trabajos de indexación huérfanos adoptados")
+
+    # ==================== API PÚBLICA ====================
+
+    def enqueue(self, category: str, job_type: str = "reindex", files: Optional[List[str]] = None) -> Tuple[Dict, bool]:
+        """
+        Encola un trabajo para una categoría.
+
+        Si ya hay un trabajo en cola (aún no iniciado) para la misma categoría,
+        en cualquier worker, se reutiliza en lugar de crear uno duplicado: una
+        re-indexación completa absorbe a las incrementales y las incrementales
+        acumulan sus archivos. Los trabajos de videos solo se combinan entre sí.
+        La comprobación es atómica en el almacenamiento.
+
+        Args:
+            category: Categoría a indexar
+            job_type: "reindex" (completa), "incremental" (solo files) o
+                      "video" (transcripciones en files)
+            files: Archivos a indexar en un trabajo incremental o de videos
+
+        Returns:
+            (job, created) donde created indica si se creó un trabajo nuevo
+        """
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "category": category,
+            "job_type": job_type,
+            "files": sorted(set(files or [])),
+            "status": JOB_QUEUED,
+            "stage": "queued",
+            "progress": 0.0,
+            "files_total": 0,
+            "files_done": 0,
+            "chunks_total": 0,
+            "chunks_done": 0,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "duration_seconds": None,
+            "error": None,
+            "result": None,
+            "owner": self.owner,
+            "lease_expires_at": self._lease_until(),
+            "queue_key": job_key(category, job_type),
+            "run_key": None
+        }
+        job, created = self.store.enqueue_index_job(job)
+        job.pop("_id", None)
+        with self._lock:
+            if created:
+                self._jobs[job["job_id"]] = job
+            elif job["job_id"] in self._jobs:
+                self._jobs[job["job_id"]].update(job)
+        if not created:
+            return dict(job), False
+
+        self._queue.put_nowait(job["job_id"])
+        print(f"📥 Trabajo {job['job_id']} encolado ({job_type} '{category}')")
+        return dict(job), True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Obtiene el estado de un trabajo (memoria o almacenamiento)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job = dict(job)
+        if job is None:
+            job = self.store.get_index_job(job_id)
+        if job and job["status"] == JOB_RUNNING and job.get("_started_monotonic"):
+            job["duration_seconds"] = round(time.monotonic() - job["_started_monotonic"], 2)
+        if job:
+            job.pop("_started_monotonic", None)
+            job.pop("_id", None)
+        return job
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Lista los trabajos más recientes."""
+        jobs = self.store.list_index_jobs(limit=limit)
+        return [self.get(job["job_id"]) or job for job in jobs]
+
+    def stats(self) -> Dict:
+        """Resumen de la cola."""
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "queued": statuses.count(JOB_QUEUED),
+            "running": statuses.count(JOB_RUNNING),
+            "worker_alive": bool(self._worker_task and not self._worker_task.done())
+        }
+
+    # ==================== WORKER ====================
+
+    def _update(self, job_id: str, **fields):
+        """
+        Actualiza y persiste un trabajo (llamado desde el thread del worker).
+
+        Solo se escriben los campos indicados y solo si este worker sigue
+        siendo el dueño, para no pisar el lease que reclamó otro worker.
+
+        Raises:
+            JobLeaseLost: Si el trabajo ya no es de este worker o el
+                almacenamiento no confirmó la escritura
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobLeaseLost(f"Trabajo {job_id} liberado por este worker")
+            job.update(fields)
+        try:
+            saved = self.store.save_index_job(job_id, self.owner, fields)
+        except Exception as e:
+            raise JobLeaseLost(f"No se pudo guardar el trabajo {job_id}: {e}") from e
+        if not saved:
+            raise JobLeaseLost(f"Lease del trabajo {job_id} reclamado por otro worker")
+
+    async def _worker(self):
+        """Procesa los trabajos en orden, de a uno."""
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"❌ Error inesperado en worker de indexación: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _release(self, job_id: str):
+        """Deja de seguir un trabajo: su lease vence y otro worker puede adoptarlo."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    async def _run(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if not job or job["status"] != JOB_QUEUED:
+            return
+
+        # Paso atómico a "running": falla si otro worker indexa la misma categoría
+        # o si este worker perdió el lease
+        try:
+            current = self.store.start_index_job(
+                job_id, self.owner, job_key(job["category"], job["job_type"]),
+                {"stage": "starting", "started_at": datetime.utcnow().isoformat()}
+            )
+        except Exception as e:
+            print(f"⚠️ Error al iniciar trabajo {job_id}: {e}")
+            current = None
+        if not current:
+            stored = self.store.get_index_job(job_id)
+            if stored and stored.get("owner") == self.owner and stored["status"] == JOB_QUEUED:
+                asyncio.get_running_loop().call_later(JOB_BUSY_RETRY_SECONDS, self._queue.put_nowait, job_id)
+            else:
+                self._release(job_id)
+            return
+
+        started = time.monotonic()
+        current.pop("_id", None)
+        with self._lock:
+            job.update(current)
+            job["_started_monotonic"] = started
+        print(f"⚙️ Procesando trabajo {job_id} ({job['job_type']} '{job['category']}')")
+
+        def progress(**fields):
+            self._update(job_id, **fields)
+
+        try:
+            handler_job = {k: v for k, v in job.items() if not k.startswith("_")}
+            result = await asyncio.to_thread(self.handler, handler_job, progress)
+            self._update(
+                job_id,
+                status=JOB_COMPLETED,
+                stage="done",
+                progress=1.0,
+                result=result,
+                run_key=None,
+                finished_at=datetime.utcnow().isoformat(),
+                duration_seconds=round(time.monotonic() - started, 2)
+            )
+            print(f"✅ Trabajo {job_id} completado en {time.monotonic() - started:.1f}s")
+        except JobLeaseLost as e:
+            print(f"⚠️ Trabajo {job_id} abandonado: {e}")
+        except Exception as e:
+            try:
+                self._update(
+                    job_id,
+                    status=JOB_FAILED,
+                    stage="failed",
+                    error=str(e),
+                    run_key=None,
+                    finished_at=datetime.utcnow().isoformat(),
+                    duration_seconds=round(time.monotonic() - started, 2)
+                )
+            except JobLeaseLost as lost:
+                print(f"⚠️ Trabajo {job_id} abandonado: {lost}")
+            print(f"❌ Trabajo {job_id} falló: {e}")
+        finally:
+            # Los trabajos terminados se consultan desde el almacenamiento
+            self._release(job_id)
@@ -0,0 +1,233 @@
+"""
+Índice léxico BM25 por colección
+Índice invertido construido al indexar y persistido junto a la colección
+(chroma_db/lexical/{coleccion}/). Complementa la búsqueda vectorial para
+consultas con términos exactos ("Ley 16744", "DS132"); ambos rankings se
+combinan con Reciprocal Rank Fusion (RRF).
+
+Los pesos BM25 de cada posting se precalculan al construir, así una consulta
+es solo la suma de unos pocos arrays NumPy (muy por debajo de 1 ms). Los
+postings y los ids se abren memory-mapped, compartidos entre workers.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from index_publish import delete_directory, open_published, publish_directory, resolve_directory
+from string_table import StringTable
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+EXPORT_PAGE_SIZE = 1000
+HEADER_FILENAME = "index.json"
+IDS_TABLE = "ids"
+
+# Palabras vacías frecuentes en español (no aportan al ranking léxico)
+STOPWORDS = {
+    "a", "al", "como", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "su", "sus", "un", "una", "y", "cual", "cuales",
+    "donde", "esta", "este", "son", "sobre", "entre", "the", "of", "and", "to"
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_ALNUM_PATTERN = re.compile(r"[a-z]+|[0-9]+")
+_THOUSANDS_PATTERN = re.compile(r"(?<=\d)\.(?=\d{3})")
+_ABBREVIATION_PATTERN = re.compile(r"\b(?:[a-z]\.){2,}")
+
+# Evita que dos hilos construyan el mismo índice a la vez
+_build_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza sin acentos ni mayúsculas y une siglas con números.
+
+    "DS132" -> ["ds132", "ds", "132"] y "Ley 16.744" -> ["ley", "16744", "ley16744"],
+    de modo que las distintas formas de escribir una norma ("D.S. 132",
+    "DS 132", "DS132") coinciden.
+    """
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = _THOUSANDS_PATTERN.sub("", text)
+    text = _ABBREVIATION_PATTERN.sub(lambda match: match.group(0).replace(".", ""), text)
+
+    tokens = []
+    previous = None
+    for token in _TOKEN_PATTERN.findall(text):
+        if token in STOPWORDS:
+            previous = None
+            continue
+        tokens.append(token)
+        parts = _ALNUM_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+        if previous and previous.isalpha() and token.isdigit():
+            tokens.append(previous + token)
+        previous = token
+    return tokens
+
+
+def _load_array(directory: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+class BM25Index:
+    """Índice invertido BM25 de solo lectura (postings memory-mapped)."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Directorio del índice
+        """
+        self.path = path
+        path = resolve_directory(path)
+        with open(os.path.join(path, HEADER_FILENAME), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+
+        self.collection_name = header["collection"]
+        self.version = header["version"]
+        self.ids = StringTable(os.path.join(path, IDS_TABLE))
+
+        # Postings en formato CSR: los del término i están en [offsets[i], offsets[i + 1])
+        self._terms = {term: i for i, term in enumerate(header["terms"])}
+        self._offsets = _load_array(path, "offsets")
+        self._docs = _load_array(path, "docs")
+        self._weights = _load_array(path, "weights")
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    @staticmethod
+    def build(collection, path: str, version: str) -> None:
+        """Construye el índice a partir de los textos de una colección Chroma."""
+        ids, doc_lengths = [], []
+        postings = defaultdict(list)
+
+        count = collection.count()
+        for offset in range(0, count, EXPORT_PAGE_SIZE):
+            page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["documents"])
+            for chunk_id, text in zip(page["ids"], page["documents"]):
+                index = len(ids)
+                ids.append(chunk_id)
+                terms = tokenize(text or "")
+                doc_lengths.append(len(terms))
+                for term, frequency in Counter(terms).items():
+                    postings[term].append((index, frequency))
+
+        terms, offsets, docs, tfs = [], [0], [], []
+        for term, entries in postings.items():
+            terms.append(term)
+            docs.extend(index for index, _ in entries)
+            tfs.extend(frequency for _, frequency in entries)
+            offsets.append(len(docs))
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float32)
+
+        # Pesos BM25 precalculados para cada posting
+        doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        average_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        document_frequency = np.diff(offsets).astype(np.float32)
+        idf = np.log(1 + (len(ids) - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[docs] / (average_length or 1.0))
+        idf = np.repeat(idf, document_frequency.astype(np.int64))
+        weights = (idf * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+        # Se escribe en un directorio temporal y se publica de forma atómica
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        try:
+            np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+            np.save(os.path.join(tmp_path, "docs.npy"), docs)
+            np.save(os.path.join(tmp_path, "weights.npy"), weights)
+            StringTable.write(os.path.join(tmp_path, IDS_TABLE), ids)
+            with open(os.path.join(tmp_path, HEADER_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "collection": collection.name,
+                    "version": version,
+                    "terms": terms
+                }, f, ensure_ascii=False, separators=(",", ":"))
+
+            publish_directory(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        print(f"🔤 Índice BM25 de '{collection.name}' construido ({count} chunks, {len(postings)} términos)")
+
+    @classmethod
+    def load_or_build(cls, collection, path: str, version: str) -> "BM25Index":
+        """Abre el índice persistido, reconstruyéndolo si está desactualizado."""
+        with _build_lock:
+            index = open_published(cls, path)
+            if index and index.version == version:
+                return index
+
+            cls.build(collection, path, version)
+            return cls(path)
+
+    @staticmethod
+    def delete(path: str):
+        """Elimina el índice persistido de una colección (y el formato JSON anterior)."""
+        delete_directory(path)
+        try:
+            os.remove(f"{path}.json")
+        except FileNotFoundError:
+            pass
+
+    # ==================== CONSULTA ====================
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada de los postings."""
+        return int(self._offsets.nbytes + self._docs.nbytes + self._weights.nbytes + self.ids.nbytes)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Chunks con mayor puntuación BM25 para la consulta.
+
+        Returns:
+            Lista de (id de chunk, puntuación) en orden descendente
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self._terms.get(term)
+            if i is not None:
+                start, end = self._offsets[i], self._offsets[i + 1]
+                scores[self._docs[start:end]] += self._weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.ids[int(i)], float(scores[i])) for i in matched]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Combina varios rankings de ids con RRF: score = sum(1 / (k + posición)).
+
+    A igual puntuación se conserva el orden de aparición (primero el ranking
+    que se pasa antes).
+
+    Returns:
+        Lista de (id, puntuación RRF) en orden descendente
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for position, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + position)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
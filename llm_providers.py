@@ -0,0 +1,169 @@
+"""
+Proveedores de LLM
+Las respuestas se generan con el proveedor de LLM_PROVIDER o con el que
+configure cada categoría ("llm_provider" en categories_config.json):
+
+    openai  ChatOpenAI (LLM_MODEL, por defecto gpt-4o-mini)
+    stub    StubChatModel: local y sin red. Emite texto determinista (según
+            el prompt) con un time-to-first-token y una velocidad en tokens/s
+            configurables, con streaming síncrono y asíncrono. Permite hacer
+            pruebas de carga y perfilar todo el camino de /ask sin gastar
+            tokens ni medir la variabilidad de OpenAI
+
+Las respuestas se generan siempre por streaming: LLMMetrics registra el
+time-to-first-token y los tokens/s de cada una (/cache/stats).
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+PROVIDER_OPENAI = "openai"
+PROVIDER_STUB = "stub"
+PROVIDERS = (PROVIDER_OPENAI, PROVIDER_STUB)
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", PROVIDER_OPENAI).lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+STUB_LLM_TOKENS_PER_SECOND = float(os.getenv("STUB_LLM_TOKENS_PER_SECOND", "50"))
+STUB_LLM_TTFT_MS = float(os.getenv("STUB_LLM_TTFT_MS", "300"))
+STUB_LLM_OUTPUT_TOKENS = int(os.getenv("STUB_LLM_OUTPUT_TOKENS", "120"))
+
+METRIC_SAMPLES = 500
+
+_WORD_PATTERN = re.compile(r"\w{4,}")
+_FALLBACK_WORDS = ["respuesta", "prueba", "documento", "seguridad", "normativa"]
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model local para pruebas de carga.
+
+    La respuesta son output_tokens palabras elegidas del propio prompt con
+    una semilla derivada de su sha256: el mismo prompt produce siempre el
+    mismo texto. El primer token llega tras ttft_ms y los siguientes a
+    tokens_per_second (sleep en streaming síncrono, asyncio.sleep en el
+    asíncrono).
+    """
+
+    tokens_per_second: float = STUB_LLM_TOKENS_PER_SECOND
+    ttft_ms: float = STUB_LLM_TTFT_MS
+    output_tokens: int = STUB_LLM_OUTPUT_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"tokens_per_second": self.tokens_per_second, "ttft_ms": self.ttft_ms,
+                "output_tokens": self.output_tokens}
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = _WORD_PATTERN.findall(prompt) or _FALLBACK_WORDS
+        return [(" " if i else "") + rng.choice(words) for i in range(self.output_tokens)]
+
+    def _delay(self, index: int) -> float:
+        """Segundos de espera antes del token index."""
+        if index == 0:
+            return self.ttft_ms / 1000
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            time.sleep(self._delay(i))
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            await asyncio.sleep(self._delay(i))
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = "".join([chunk.text async for chunk in self._astream(messages, stop, run_manager)])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def create_llm(provider: str = LLM_PROVIDER) -> BaseChatModel:
+    """
+    Chat model de un proveedor.
+
+    Raises:
+        ValueError: Si el proveedor no existe
+    """
+    if provider == PROVIDER_STUB:
+        return StubChatModel()
+    if provider == PROVIDER_OPENAI:
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=LLM_MODEL,
+            temperature=0,
+            max_tokens=2000,
+            request_timeout=30
+        )
+    raise ValueError(f"Unknown LLM provider '{provider}' (expected one of {', '.join(PROVIDERS)})")
+
+
+class LLMMetrics:
+    """Time-to-first-token, tokens/s y duración de las últimas respuestas, por proveedor."""
+
+    def __init__(self, samples: int = METRIC_SAMPLES):
+        self._samples: Dict[str, deque] = {}
+        self._maxlen = samples
+        self._lock = threading.Lock()
+        self._answers: Dict[str, int] = {}
+
+    def record(self, provider: str, ttft: Optional[float], tokens: int, duration: float):
+        """
+        Args:
+            ttft: Segundos hasta el primer token (None si no hubo tokens)
+            tokens: Chunks con contenido recibidos
+            duration: Segundos totales de la generación
+        """
+        generation = duration - (ttft or 0.0)
+        rate = (tokens - 1) / generation if tokens > 1 and generation > 0 else None
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self._maxlen)).append((ttft, rate, duration))
+            self._answers[provider] = self._answers.get(provider, 0) + 1
+
+    def stats(self) -> Dict:
+        stats = {}
+        with self._lock:
+            samples = {provider: list(values) for provider, values in self._samples.items()}
+            answers = dict(self._answers)
+        for provider, values in samples.items():
+            entry = {"answers": answers[provider]}
+            for name, index, scale in (("ttft_ms", 0, 1000), ("tokens_per_second", 1, 1), ("duration_ms", 2, 1000)):
+                column = np.array([v[index] for v in values if v[index] is not None]) * scale
+                if len(column):
+                    p50, p95 = np.percentile(column, [50, 95])
+                    entry[name] = {"p50": round(float(p50), 1), "p95": round(float(p95), 1)}
+            stats[provider] = entry
+        return stats
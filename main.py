@@ -1,33 +1,93 @@
 import os
 import glob
+import asyncio
 import json
 import shutil
 import dotenv
+import chromadb
+import chromadb.errors
+from chromadb.config import Settings
+import numpy as np
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import ChatOpenAI
 import hashlib
-from typing import Dict, List, Optional
+import string
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import unicodedata
 from datetime import datetime
 
 # Importar MongoManager
 from mongo_manager import get_mongo_manager, close_mongo_connection
 
+# Importar cola de indexación en segundo plano
+from job_queue import IndexJobQueue, LocalJobStore, JOB_TYPE_VIDEO
+
+# Importar almacenamiento de subidas por streaming
+from upload_storage import (
+    save_upload_streaming, extract_zip_pdfs, UploadSizeLimitMiddleware,
+    MAX_BULK_FILES, MAX_UPLOAD_SIZE, MAX_BULK_UPLOAD_SIZE, MULTIPART_OVERHEAD
+)
+
+# Importar registro de contenido (deduplicación entre categorías)
+from content_registry import ContentRegistry, CachedEmbeddings, hash_file
+
+# Importar registro de versiones de índices (blue-green)
+from index_registry import IndexRegistry, EMBEDDING_MODEL, build_manifest, validate_manifest
+from embedding_providers import EMBEDDING_PROVIDER, create_embeddings
+
+# Importar proveedores de LLM (OpenAI o stub local para pruebas de carga)
+from llm_providers import LLM_PROVIDER, PROVIDERS as LLM_PROVIDERS, LLMMetrics, create_llm
+
+# Caché LRU de vectorstores con presupuesto de memoria
+from vectorstore_cache import VectorstoreCache, estimate_index_bytes
+
+# Backend de búsqueda exacta en memoria (matriz NumPy)
+from numpy_store import NumpyVectorStore, collection_fingerprint
+
+# Colecciones particionadas por archivo fuente (fan-out paralelo)
+from sharded_store import ShardedVectorStore, shard_names, SHARD_SUFFIX
+
+# Bundles de índice portables (exportar/importar sin re-embeber)
+from index_bundle import read_bundle, write_bundle, iter_bundle_chunks
+
+# Catálogo de categorías en memoria (archivo JSON o MongoDB)
+from category_catalog import CategoryCatalog
+
+# Inventario en memoria de docs/ y videos/ (polling de mtime)
+from file_inventory import DirectoryInventory
+
+# Watcher opt-in de archivos copiados directamente a docs/ y videos/
+from file_watcher import InventoryWatcher, acquire_leader_lock
+
+# Bus de invalidación entre workers y nodos (generaciones por categoría)
+from invalidation_bus import InvalidationBus, LocalGenerationStore, SCOPE_INDEX, SCOPE_PROMPTS, SCOPE_CONFIG
+
+# MMR vectorizado (matriz de similitud calculada una sola vez)
+from mmr import maximal_marginal_relevance
+
+# Índice léxico BM25 y fusión por Reciprocal Rank Fusion
+from lexical_index import BM25Index, reciprocal_rank_fusion
+
+# Embeddings resumen por documento (recuperación en dos etapas)
+from document_index import DocumentIndex
+
 # Importar Clerk Auth
 from clerk_auth import (
     optional_auth, 
     require_auth, 
     get_session_id_from_user,
     get_user_metadata,
+    warm_jwks_cache,
     ClerkUser
 )
 
@@ -37,6 +97,15 @@ dotenv.load_dotenv()
 # Inicializar FastAPI
 app = FastAPI()
 
+# Cortar las subidas que superan el límite antes de recibir el cuerpo completo
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/upload": MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        "/upload-bulk": MAX_BULK_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+    },
+)
+
 # Configurar CORS - DESARROLLO (permite todos los orígenes)
 app.add_middleware(
     CORSMiddleware,
@@ -46,23 +115,280 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configurar el modelo optimizado
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0,
-    max_tokens=2000,
-    request_timeout=30
-)
+# Modelos de lenguaje: uno por proveedor (LLM_PROVIDER o "llm_provider" de la
+# categoría), creados al primer uso
+llms: Dict[str, object] = {}
+llm_lock = threading.Lock()
+llm_metrics = LLMMetrics()
 
-# Cache global
-vectorstore_cache: Dict[str, Chroma] = {}
 # answer_cache y conversation_history ahora se gestionan con MongoDB
 PERSIST_DIRECTORY = "chroma_db"
 CATEGORIES_CONFIG_FILE = "categories_config.json"
 
+# Catálogo de categorías en memoria (prompts y ajustes sin leer el JSON en cada
+# consulta). Con CATEGORY_CATALOG_BACKEND=mongo se respalda en MongoDB
+CATEGORY_CATALOG_BACKEND = os.getenv("CATEGORY_CATALOG_BACKEND", "file").lower()
+CATEGORY_CATALOG_CHECK_SECONDS = float(os.getenv("CATEGORY_CATALOG_CHECK_SECONDS", "1"))
+category_catalog = CategoryCatalog(CATEGORIES_CONFIG_FILE, check_interval=CATEGORY_CATALOG_CHECK_SECONDS)
+
+# Inventario de archivos: los endpoints no listan directorios en cada petición;
+# los cambios en disco se detectan por mtime cada FS_INVENTORY_REFRESH_SECONDS
+FS_INVENTORY_REFRESH_SECONDS = float(os.getenv("FS_INVENTORY_REFRESH_SECONDS", "2"))
+docs_inventory = DirectoryInventory("docs", ".pdf", refresh_interval=FS_INVENTORY_REFRESH_SECONDS)
+videos_inventory = DirectoryInventory("videos", ".txt", refresh_interval=FS_INVENTORY_REFRESH_SECONDS)
+
+# Punteros categoría -> colección activa
+index_registry = IndexRegistry(PERSIST_DIRECTORY)
+
+
+def estimate_vectorstore_bytes(vectorstore) -> int:
+    """Memoria estimada de un vectorstore (manifiesto o conteo de la colección)."""
+    if isinstance(vectorstore, (NumpyVectorStore, BM25Index, DocumentIndex)):
+        return vectorstore.nbytes
+    collection = vectorstore._collection
+    manifest = index_registry.read_manifest(collection.name)
+    if manifest:
+        return estimate_index_bytes(manifest.get("chunk_count") or 0, manifest.get("dimension"))
+    return estimate_index_bytes(collection.count(), None)
+
+
+# Cache global (LRU acotado por entradas y memoria estimada)
+vectorstore_cache = VectorstoreCache(estimate_size=estimate_vectorstore_bytes)
+
+# Cliente Chroma y cliente de embeddings compartidos por todas las colecciones
+# (se crean al primer uso)
+chroma_client = None
+shared_embeddings = None
+
+
+def get_chroma_client():
+    """
+    Cliente persistente único del proceso (un solo SQLite y pool de archivos).
+    
+    Expulsar un vectorstore del caché solo suelta el envoltorio de LangChain:
+    los segmentos HNSW quedan en el cliente. Por eso el cliente se crea con la
+    política LRU de segmentos de Chroma y el mismo presupuesto que el caché
+    (VECTORSTORE_CACHE_MAX_MB). El backend en Rust de chromadb >= 1.0 ignora
+    esa política y usa su propio LRU de índices, acotado por cantidad (según
+    el límite de archivos abiertos) y no por bytes.
+    """
+    global chroma_client
+    if chroma_client is None:
+        settings = Settings()
+        if vectorstore_cache.max_bytes:
+            settings.chroma_segment_cache_policy = "LRU"
+            settings.chroma_memory_limit_bytes = vectorstore_cache.max_bytes
+        chroma_client = chromadb.PersistentClient(path=PERSIST_DIRECTORY, settings=settings)
+    return chroma_client
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Cliente de embeddings único; los documentos pasan por el caché por hash.
+    
+    El proveedor se elige con EMBEDDING_PROVIDER (openai o hashing, local y sin red).
+    """
+    global shared_embeddings
+    if shared_embeddings is None:
+        shared_embeddings = CachedEmbeddings(create_embeddings(EMBEDDING_PROVIDER), get_content_registry(), model=EMBEDDING_MODEL)
+        print(f"🧮 Embeddings: {EMBEDDING_PROVIDER} ({EMBEDDING_MODEL})")
+    return shared_embeddings
+
+
+# Sharding: una categoría puede repartir sus chunks en N colecciones por hash
+# del archivo fuente (consultas en paralelo). Por categoría con "shards" en
+# categories_config.json; se aplica en la siguiente re-indexación completa
+CATEGORY_SHARDS = int(os.getenv("CATEGORY_SHARDS", "1"))
+
+
+def collection_shards(collection_name: str) -> int:
+    """Número de shards con que se construyó una colección (según su manifiesto)."""
+    manifest = index_registry.read_manifest(collection_name)
+    return (manifest.get("shards") or 1) if manifest else 1
+
+
+def open_collection(collection_name: str, shards: Optional[int] = None):
+    """
+    Abre (o crea) una colección sobre el cliente compartido.
+    
+    Es el único punto de entrada de las escrituras (indexación, videos):
+    nunca devuelve un NumpyVectorStore, que es de solo lectura.
+    
+    Args:
+        shards: Número de shards; por defecto el del manifiesto. Con más de
+            uno devuelve un ShardedVectorStore sobre {coleccion}__s{i}
+    """
+    if shards is None:
+        shards = collection_shards(collection_name)
+    if shards > 1:
+        return ShardedVectorStore(
+            collection_name,
+            [open_collection(name, shards=1) for name in shard_names(collection_name, shards)],
+            get_embeddings()
+        )
+    
+    return Chroma(
+        client=get_chroma_client(),
+        collection_name=collection_name,
+        embedding_function=get_embeddings()
+    )
+
+
+# Backend de consultas por categoría: "chroma" (HNSW) o "numpy" (búsqueda exacta
+# sobre una matriz memory-mapped, para categorías de hasta NUMPY_BACKEND_MAX_CHUNKS).
+# Con uvicorn --workers N conviene "numpy": la matriz, los chunks y los índices
+# derivados se abren memory-mapped y todos los workers comparten el page cache
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+NUMPY_BACKEND_MAX_CHUNKS = int(os.getenv("NUMPY_BACKEND_MAX_CHUNKS", "50000"))
+NUMPY_STORE_DIRECTORY = os.path.join(PERSIST_DIRECTORY, "numpy")
+# Copia cuantizada de la matriz NumPy: "none", "float16" o "int8" (la primera
+# pasada recorre la copia y la lista corta se reordena en float32)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+
+
+def collection_version(collection_name: str, collection) -> str:
+    """
+    Versión de una colección para invalidar sus índices derivados (NumPy, BM25).
+    
+    Sin manifiesto (índices antiguos) se deriva del contenido de la colección.
+    """
+    manifest = index_registry.read_manifest(collection_name)
+    return manifest["built_at"] if manifest else collection_fingerprint(collection)
+
+
+def is_current(category: str, index) -> bool:
+    """
+    Si un vectorstore o índice derivado en caché corresponde a la versión activa en disco.
+    
+    Con varios workers (uvicorn --workers N) otro proceso puede re-indexar: el
+    puntero y el manifiesto se comprueban con un stat, sin leer la colección.
+    Los vectorstores Chroma no llevan versión y solo se recargan al cambiar
+    el puntero.
+    """
+    collection_name = index_registry.get_active(category)
+    loaded = getattr(index, "collection_name", None) or getattr(index, "name", None) or index._collection.name
+    if loaded != collection_name:
+        return False
+    
+    version = getattr(index, "version", None)
+    if version is None:
+        return True
+    manifest = index_registry.read_manifest(collection_name)
+    return manifest is None or manifest["built_at"] == version
+
+
+def serving_vectorstore(collection_name: str, vectorstore: Chroma):
+    """
+    Vectorstore que atiende las consultas de una colección.
+    
+    Lo que retorna (y lo que guarda vectorstore_cache) es solo para consultas:
+    puede ser un NumpyVectorStore de solo lectura, así que ninguna ruta de
+    escritura lo usa.
+    
+    Con VECTOR_BACKEND=numpy la colección se exporta (una vez por versión del
+    manifiesto) a una matriz NumPy; Chroma sigue siendo la fuente de verdad
+    para indexar. Ante cualquier error se sirve desde Chroma.
+    """
+    if VECTOR_BACKEND != "numpy":
+        return vectorstore
+    
+    manifest = index_registry.read_manifest(collection_name)
+    chunk_count = manifest["chunk_count"] if manifest else vectorstore._collection.count()
+    if chunk_count > NUMPY_BACKEND_MAX_CHUNKS:
+        return vectorstore
+    
+    try:
+        return NumpyVectorStore.load_or_build(
+            vectorstore._collection,
+            os.path.join(NUMPY_STORE_DIRECTORY, collection_name),
+            version=collection_version(collection_name, vectorstore._collection),
+            embedding=get_embeddings(),
+            quantization=VECTOR_QUANTIZATION
+        )
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar '{collection_name}' en NumPy, se usa Chroma: {e}")
+        return vectorstore
+
+# Registro de contenido por hash (parseo y embeddings compartidos); se abre
+# al primer uso para que importar main no cree chroma_db/
+content_registry: Optional[ContentRegistry] = None
+
+
+def get_content_registry() -> ContentRegistry:
+    """Registro de contenido único del proceso."""
+    global content_registry
+    if content_registry is None:
+        content_registry = ContentRegistry(os.path.join(PERSIST_DIRECTORY, "content_registry"))
+    return content_registry
+
 # Instancia global de MongoDB
 mongo = None
 
+# Warm-up al arrancar: precarga vectorstores, prompts, JWKS y pool de MongoDB
+# antes de que /ready acepte tráfico. Es de solo lectura: abre los índices
+# existentes pero nunca embebe (las transcripciones sin indexar quedan para
+# la primera consulta o la cola de indexación)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_VIDEOS = os.getenv("WARMUP_VIDEOS", "true").lower() == "true"
+warmup_state = {
+    "status": "pending",
+    "started_at": None,
+    "finished_at": None,
+    "duration_seconds": None,
+    "steps": {},
+    "errors": {}
+}
+warmup_task: Optional[asyncio.Task] = None
+
+# Cola global de trabajos de indexación (se inicia en startup)
+job_queue: Optional[IndexJobQueue] = None
+INDEX_BATCH_SIZE = 100
+# Chunks por página al copiar una colección a su versión nueva
+COPY_PAGE_SIZE = 1000
+
+# Bus de invalidación: cada cambio administrativo se anuncia al resto de
+# workers y nodos, que descartan sus cachés y recargan en la siguiente consulta
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "2"))
+GENERATIONS_FILE = os.path.join(PERSIST_DIRECTORY, "generations.json")
+invalidation_bus: Optional[InvalidationBus] = None
+
+# Watcher de archivos (opt-in): agenda la indexación incremental de lo que se
+# copia, modifica o borra directamente en docs/ y videos/ (p. ej. por SSH)
+FS_WATCHER = os.getenv("FS_WATCHER", "false").lower() == "true"
+FS_WATCHER_INTERVAL = float(os.getenv("FS_WATCHER_INTERVAL", "5"))
+FS_WATCHER_DEBOUNCE_SECONDS = float(os.getenv("FS_WATCHER_DEBOUNCE_SECONDS", "10"))
+file_watchers: List[InventoryWatcher] = []
+watcher_lock = None
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """
+    Bus de invalidación del proceso (MongoDB o, sin MongoDB, archivo local).
+    
+    También se usa fuera de la API (index_bundle.py) para avisar a los
+    workers en ejecución.
+    """
+    global invalidation_bus
+    if invalidation_bus is None:
+        invalidation_bus = InvalidationBus(
+            mongo or LocalGenerationStore(GENERATIONS_FILE),
+            poll_interval=INVALIDATION_POLL_SECONDS
+        )
+        invalidation_bus.subscribe(SCOPE_INDEX, drop_category_caches)
+        invalidation_bus.subscribe(SCOPE_CONFIG, drop_category_caches)
+        invalidation_bus.subscribe(SCOPE_CONFIG, lambda category: docs_inventory.invalidate())
+        # Lambda: el catálogo se reemplaza en startup si se respalda en MongoDB
+        invalidation_bus.subscribe(SCOPE_CONFIG, lambda category: category_catalog.invalidate(category))
+        invalidation_bus.subscribe(SCOPE_PROMPTS, lambda category: category_catalog.invalidate(category))
+    return invalidation_bus
+
+
+def drop_category_caches(category: str):
+    """Descarta el vectorstore y los índices derivados en caché de una categoría."""
+    for key in category_cache_keys(category):
+        vectorstore_cache.pop(key, None)
+
+
 # Modelos de datos
 class QuestionRequest(BaseModel):
     question: str
@@ -82,12 +408,20 @@ class CategoryCreate(BaseModel):
     description: str
     prompt_html: Optional[str] = None
     prompt_plain: Optional[str] = None
+    two_stage_retrieval: Optional[bool] = None  # None = automático según número de documentos
+    two_stage_top_documents: Optional[int] = None
+    shards: Optional[int] = None  # None = CATEGORY_SHARDS
+    llm_provider: Optional[str] = None  # None = LLM_PROVIDER
 
 class CategoryUpdate(BaseModel):
     display_name: Optional[str] = None
     description: Optional[str] = None
     prompt_html: Optional[str] = None
     prompt_plain: Optional[str] = None
+    two_stage_retrieval: Optional[bool] = None
+    two_stage_top_documents: Optional[int] = None
+    shards: Optional[int] = None
+    llm_provider: Optional[str] = None
 
 class PromptUpdate(BaseModel):
     prompt_html: str
@@ -105,6 +439,165 @@ class CategoryInfo(BaseModel):
     prompt_plain: Optional[str] = None
 
 
+# Búsqueda híbrida: BM25 (términos exactos como "Ley 16744") + vectorial, fusionadas con RRF
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_INDEX_DIRECTORY = os.path.join(PERSIST_DIRECTORY, "lexical")
+
+
+def lexical_index_path(collection_name: str) -> str:
+    return os.path.join(LEXICAL_INDEX_DIRECTORY, collection_name)
+
+
+def lexical_cache_key(category: str) -> str:
+    return f"bm25_{category}"
+
+
+def load_lexical_index(category: str, collection_name: str, collection) -> BM25Index:
+    """Carga (o construye) el índice BM25 de la colección y lo deja en caché."""
+    index = BM25Index.load_or_build(
+        collection,
+        lexical_index_path(collection_name),
+        version=collection_version(collection_name, collection)
+    )
+    vectorstore_cache[lexical_cache_key(category)] = index
+    return index
+
+
+def get_or_create_lexical_index(category: str) -> BM25Index:
+    """Índice BM25 de la colección activa de una categoría."""
+    index = vectorstore_cache.get(lexical_cache_key(category))
+    if index is None or not is_current(category, index):
+        collection_name = index_registry.get_active(category)
+        index = load_lexical_index(category, collection_name, open_collection(collection_name)._collection)
+    return index
+
+
+# Recuperación en dos etapas (documento -> chunk) para categorías grandes.
+# Por categoría en categories_config.json: "two_stage_retrieval" (true/false;
+# sin definir = automático a partir de TWO_STAGE_MIN_DOCUMENTS documentos) y
+# "two_stage_top_documents"
+TWO_STAGE_MIN_DOCUMENTS = int(os.getenv("TWO_STAGE_MIN_DOCUMENTS", "50"))
+TWO_STAGE_TOP_DOCUMENTS = int(os.getenv("TWO_STAGE_TOP_DOCUMENTS", "5"))
+DOCUMENT_INDEX_DIRECTORY = os.path.join(PERSIST_DIRECTORY, "documents")
+
+
+def document_index_path(collection_name: str) -> str:
+    return os.path.join(DOCUMENT_INDEX_DIRECTORY, collection_name)
+
+
+def document_cache_key(category: str) -> str:
+    return f"documents_{category}"
+
+
+def category_cache_keys(category: str) -> List[str]:
+    """Entradas del caché asociadas a una categoría (vectorstore e índices derivados)."""
+    return [category, lexical_cache_key(category), document_cache_key(category)]
+
+
+def load_document_index(category: str, collection_name: str, collection) -> DocumentIndex:
+    """Carga (o construye) el índice de documentos de la colección y lo deja en caché."""
+    index = DocumentIndex.load_or_build(
+        collection,
+        document_index_path(collection_name),
+        version=collection_version(collection_name, collection)
+    )
+    vectorstore_cache[document_cache_key(category)] = index
+    return index
+
+
+def get_or_create_document_index(category: str) -> DocumentIndex:
+    """Índice de documentos de la colección activa de una categoría."""
+    index = vectorstore_cache.get(document_cache_key(category))
+    if index is None or not is_current(category, index):
+        collection_name = index_registry.get_active(category)
+        index = load_document_index(category, collection_name, open_collection(collection_name)._collection)
+    return index
+
+
+def get_category_shards(category: str) -> int:
+    """Shards configurados para la próxima re-indexación completa de una categoría."""
+    entry = category_catalog.get(category) or {}
+    return max(1, int(entry.get("shards") or CATEGORY_SHARDS))
+
+
+def get_llm_provider(category: Optional[str] = None) -> str:
+    """Proveedor de LLM de una categoría (por defecto LLM_PROVIDER)."""
+    entry = (category_catalog.get(category) if category else None) or {}
+    return entry.get("llm_provider") or LLM_PROVIDER
+
+
+def get_llm(provider: str):
+    """Chat model único por proveedor."""
+    with llm_lock:
+        if provider not in llms:
+            llms[provider] = create_llm(provider)
+            print(f"🤖 LLM: {provider}")
+        return llms[provider]
+
+
+async def stream_answer(prompt: str, category: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Genera una respuesta con el LLM de la categoría, token a token (astream).
+    
+    Registra el time-to-first-token y los tokens/s de cada respuesta
+    (llm_metrics).
+    """
+    provider = get_llm_provider(category)
+    start = time.perf_counter()
+    ttft = None
+    tokens = 0
+    async for chunk in get_llm(provider).astream(prompt):
+        if chunk.content:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            tokens += 1
+            yield chunk.content
+    llm_metrics.record(provider, ttft, tokens, time.perf_counter() - start)
+
+
+async def generate_answer(prompt: str, category: Optional[str] = None) -> str:
+    """
+    Respuesta completa del LLM de la categoría.
+    
+    Se genera con stream_answer: no bloquea el event loop mientras espera al
+    proveedor, así las peticiones concurrentes a /ask se atienden en paralelo,
+    y el texto es el mismo que con invoke().
+    """
+    return "".join([token async for token in stream_answer(prompt, category)])
+
+
+def check_llm_provider(provider: Optional[str]):
+    """Valida el proveedor de LLM de una categoría (None = el global)."""
+    if provider is not None and provider not in LLM_PROVIDERS:
+        raise HTTPException(status_code=400, detail=f"Invalid llm_provider '{provider}' (expected one of {', '.join(LLM_PROVIDERS)})")
+
+
+def get_retrieval_settings(category: str) -> dict:
+    """Configuración de recuperación de una categoría (two_stage None = automático)."""
+    entry = category_catalog.get(category) or {}
+    return {
+        "two_stage": entry.get("two_stage_retrieval"),
+        "top_documents": entry.get("two_stage_top_documents") or TWO_STAGE_TOP_DOCUMENTS
+    }
+
+
+def load_derived_indexes(category: str, collection_name: str, collection):
+    """Construye al indexar los índices derivados (BM25, documentos); sus errores no detienen la indexación."""
+    if HYBRID_SEARCH:
+        try:
+            load_lexical_index(category, collection_name, collection)
+        except Exception as e:
+            print(f"⚠️ No se pudo construir el índice BM25 de '{category}': {e}")
+    
+    if get_retrieval_settings(category)["two_stage"] is not False:
+        try:
+            load_document_index(category, collection_name, collection)
+        except Exception as e:
+            print(f"⚠️ No se pudo construir el índice de documentos de '{category}': {e}")
+
+
 def normalize_category(category: str) -> str:
     """Normaliza el nombre de la categoría."""
     category = category.lower()
@@ -113,36 +606,15 @@ def normalize_category(category: str) -> str:
     return category
 
 
-def load_categories_config() -> dict:
-    """Carga la configuración de categorías desde archivo JSON."""
-    if os.path.exists(CATEGORIES_CONFIG_FILE):
-        with open(CATEGORIES_CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-
-def save_categories_config(config: dict):
-    """Guarda la configuración de categorías en archivo JSON."""
-    with open(CATEGORIES_CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
-
-
 def get_category_info(category_name: str) -> dict:
     """Obtiene información de una categoría específica."""
-    config = load_categories_config()
     category_name = normalize_category(category_name)
+    category_data = category_catalog.get(category_name)
     
-    if category_name not in config:
+    if category_data is None:
         return None
     
-    # Contar archivos
-    docs_path = f"docs/{category_name}"
-    file_count = 0
-    if os.path.exists(docs_path):
-        file_count = len([f for f in os.listdir(docs_path) if f.endswith('.pdf')])
-    
-    category_data = config[category_name].copy()
-    category_data['file_count'] = file_count
+    category_data['file_count'] = docs_inventory.count(category_name)
     category_data['has_custom_prompt'] = bool(category_data.get('prompt_html') or category_data.get('prompt_plain'))
     
     return category_data
@@ -215,13 +687,13 @@ Respuesta:"""
 
 def get_prompts_for_category(category: str) -> tuple:
     """Obtiene los prompts para una categoría (personalizados o por defecto)."""
-    config = load_categories_config()
     category = normalize_category(category)
+    entry = category_catalog.get(category) or {}
     
-    if category in config and (config[category].get('prompt_html') or config[category].get('prompt_plain')):
+    if entry.get('prompt_html') or entry.get('prompt_plain'):
         # Usar prompts personalizados
-        html_prompt = config[category].get('prompt_html')
-        plain_prompt = config[category].get('prompt_plain')
+        html_prompt = entry.get('prompt_html')
+        plain_prompt = entry.get('prompt_plain')
         
         # Si falta uno, usar el por defecto
         if not html_prompt or not plain_prompt:
@@ -235,71 +707,396 @@ def get_prompts_for_category(category: str) -> tuple:
         return get_default_prompts(category)
 
 
-async def reindex_category_auto(category: str):
-    """Re-indexa una categoría automáticamente después de cambios en archivos."""
+def load_category_chunks(category: str, pdf_files: List[str], report: Callable[..., None]) -> list:
+    """
+    Carga y divide PDFs en chunks.
+    
+    El registro de contenido reutiliza el parseo de archivos idénticos ya
+    procesados en cualquier categoría.
+    """
+    report(stage="loading", progress=0.0, files_total=len(pdf_files), files_done=0)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1500,
+        chunk_overlap=150
+    )
+    splits = []
+    for i, pdf_file in enumerate(pdf_files, start=1):
+        splits.extend(get_content_registry().load_chunks(
+            pdf_file, category, text_splitter, lambda path: PyPDFLoader(path).load()
+        ))
+        report(files_done=i, progress=round(0.2 * i / len(pdf_files), 3))
+    return splits
+
+
+def add_chunks_in_batches(vectorstore: Chroma, splits: list, report: Callable[..., None]):
+    """Agrega chunks a una colección por lotes, reportando el avance."""
+    if isinstance(vectorstore, NumpyVectorStore):
+        raise TypeError("Cannot index into a read-only NumpyVectorStore; use open_collection")
+    report(stage="embedding", progress=0.25, chunks_total=len(splits), chunks_done=0)
+    for i in range(0, len(splits), INDEX_BATCH_SIZE):
+        batch = splits[i:i + INDEX_BATCH_SIZE]
+        vectorstore.add_documents(batch)
+        
+        done = i + len(batch)
+        report(chunks_done=done, progress=round(0.25 + 0.75 * done / len(splits), 3))
+
+
+def reindex_category(category: str, progress: Optional[Callable[..., None]] = None) -> dict:
+    """
+    Re-indexa una categoría completa.
+    
+    Función síncrona: se ejecuta en el worker de indexación (job_queue) y
+    reporta el avance mediante progress(stage=..., progress=..., ...).
+    """
+    report = progress or (lambda **fields: None)
+    
     try:
         category = normalize_category(category)
         docs_path = f"docs/{category}"
         
         if not os.path.exists(docs_path):
-            return
+            raise ValueError(f"Category '{category}' not found")
         
         pdf_files = glob.glob(os.path.join(docs_path, "*.pdf"))
         
         if not pdf_files:
             # Si no hay PDFs, eliminar vectorstore
-            if category in vectorstore_cache:
-                del vectorstore_cache[category]
-            return
+            drop_category_caches(category)
+            get_invalidation_bus().publish(category, SCOPE_INDEX)
+            return {"files": 0, "chunks": 0}
         
         print(f"🔄 Re-indexando categoría '{category}' automáticamente...")
         
-        # Eliminar de caché
-        if category in vectorstore_cache:
-            del vectorstore_cache[category]
+        splits = load_category_chunks(category, pdf_files, report)
+        get_content_registry().sync_category(category, pdf_files)
         
-        # Cargar documentos
-        documents = []
-        for pdf_file in pdf_files:
-            loader = PyPDFLoader(pdf_file)
-            documents.extend(loader.load())
-        
-        if not documents:
-            return
+        if not splits:
+            return {"files": len(pdf_files), "chunks": 0}
         
-        # Dividir en chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,
-            chunk_overlap=150
-        )
-        splits = text_splitter.split_documents(documents)
-        
-        # Crear vectorstore
-        embeddings = OpenAIEmbeddings()
-        
-        # Eliminar colección existente
-        persist_path = os.path.join(PERSIST_DIRECTORY, category)
-        if os.path.exists(persist_path):
-            shutil.rmtree(persist_path)
-        
-        # Crear nueva colección
-        vectorstore = Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            collection_name=category,
-            persist_directory=PERSIST_DIRECTORY
-        )
+        # Construir una colección nueva y versionada mientras la actual sigue
+        # sirviendo consultas (blue-green); se activa solo al verificarla.
+        # Solo se embeben chunks que nunca se embebieron
+        collection_name = index_registry.new_version(category)
+        shards = get_category_shards(category)
+        vectorstore = open_collection(collection_name, shards=shards)
         
-        # Guardar en caché
-        vectorstore_cache[category] = vectorstore
+        try:
+            add_chunks_in_batches(vectorstore, splits, report)
+            
+            # Verificar la colección nueva antes de activarla
+            report(stage="verifying")
+            stored = vectorstore._collection.count()
+            if stored != len(splits):
+                raise ValueError(f"New collection has {stored} chunks, expected {len(splits)}")
+            write_collection_manifest(category, vectorstore, collection_name, splits)
+        except Exception:
+            delete_collection(collection_name, shards=shards)
+            raise
+        
+        # Cambio atómico de puntero y de caché; las consultas en curso terminan
+        # con la versión anterior
+        report(stage="activating")
+        stale = index_registry.activate(category, collection_name)
+        vectorstore_cache[category] = serving_vectorstore(collection_name, vectorstore)
+        load_derived_indexes(category, collection_name, vectorstore._collection)
+        get_invalidation_bus().publish(category, SCOPE_INDEX)
+        
+        # Garbage collection de versiones antiguas (se conserva la anterior para rollback)
+        for name in stale:
+            delete_collection(name)
         
         print(f"✅ Categoría '{category}' re-indexada exitosamente ({len(splits)} chunks)")
+        return {"files": len(pdf_files), "chunks": len(splits), "collection": collection_name}
         
     except Exception as e:
         print(f"❌ Error re-indexando categoría '{category}': {str(e)}")
         raise
 
 
+def copy_unchanged_chunks(source: Chroma, vectorstore: Chroma, exclude: set, report: Callable[..., None]) -> int:
+    """
+    Copia a otra colección los chunks (con sus embeddings) cuyo archivo no está en exclude.
+    
+    Returns:
+        Número de chunks copiados
+    """
+    report(stage="copying", progress=0.2)
+    collection = source._collection
+    copied = 0
+    for offset in range(0, collection.count(), COPY_PAGE_SIZE):
+        page = collection.get(limit=COPY_PAGE_SIZE, offset=offset, include=["embeddings", "documents", "metadatas"])
+        keep = [i for i, metadata in enumerate(page["metadatas"]) if (metadata or {}).get("source") not in exclude]
+        if keep:
+            vectorstore._collection.add(
+                ids=[page["ids"][i] for i in keep],
+                embeddings=[page["embeddings"][i] for i in keep],
+                documents=[page["documents"][i] for i in keep],
+                metadatas=[page["metadatas"][i] for i in keep]
+            )
+            copied += len(keep)
+    return copied
+
+
+def index_files_incremental(category: str, files: List[str], progress: Optional[Callable[..., None]] = None) -> dict:
+    """
+    Re-indexa solo los archivos indicados, en una versión nueva de la colección.
+    
+    Igual que la re-indexación completa (blue-green), la colección activa no
+    se modifica: los chunks de los demás archivos se copian de ella con sus
+    embeddings a una colección nueva, se agregan los chunks de los archivos
+    indicados (los que ya no existen solo se quitan) y la versión nueva se
+    verifica y se activa. Un fallo a mitad de camino deja la activa intacta y
+    la anterior queda disponible para rollback. Si la categoría aún no tiene
+    índice, hace una re-indexación completa.
+    """
+    report = progress or (lambda **fields: None)
+    category = normalize_category(category)
+    
+    active_name = index_registry.get_active(category)
+    active = open_collection(active_name)
+    
+    if active._collection.count() == 0:
+        return reindex_category(category, progress)
+    
+    pdf_files = [f for f in files if os.path.exists(f)]
+    removed = [f for f in files if f not in pdf_files]
+    print(f"➕ Indexación incremental de '{category}': {len(pdf_files)} archivos"
+          + (f", {len(removed)} eliminados" if removed else ""))
+    
+    splits = load_category_chunks(category, pdf_files, report)
+    
+    collection_name = index_registry.new_version(category)
+    shards = get_category_shards(category)
+    vectorstore = open_collection(collection_name, shards=shards)
+    
+    try:
+        copied = copy_unchanged_chunks(active, vectorstore, set(files), report)
+        if not copied and not splits:
+            raise ValueError(
+                f"Incremental update would leave '{category}' with an empty index; run a full reindex instead"
+            )
+        add_chunks_in_batches(vectorstore, splits, report)
+        
+        # Verificar la colección nueva antes de activarla
+        report(stage="verifying")
+        stored = vectorstore._collection.count()
+        if stored != copied + len(splits):
+            raise ValueError(f"New collection has {stored} chunks, expected {copied + len(splits)}")
+        write_collection_manifest(category, vectorstore, collection_name, splits,
+                                  previous_collection=active_name, removed=removed)
+        validate_manifest(index_registry.read_manifest(collection_name))
+    except Exception:
+        delete_collection(collection_name, shards=shards)
+        raise
+    
+    report(stage="activating")
+    stale = index_registry.activate(category, collection_name)
+    if removed:
+        get_content_registry().sync_category(category, glob.glob(os.path.join(f"docs/{category}", "*.pdf")))
+    vectorstore_cache[category] = serving_vectorstore(collection_name, vectorstore)
+    load_derived_indexes(category, collection_name, vectorstore._collection)
+    get_invalidation_bus().publish(category, SCOPE_INDEX)
+    
+    for name in stale:
+        delete_collection(name)
+    
+    print(f"✅ Categoría '{category}' actualizada ({len(splits)} chunks nuevos, {copied} copiados)")
+    return {"files": len(pdf_files), "removed": len(removed), "chunks": len(splits),
+            "copied": copied, "collection": collection_name}
+
+
+def write_collection_manifest(category: str, vectorstore: Chroma, collection_name: str, splits: list,
+                              previous_collection: Optional[str] = None, removed: List[str] = ()):
+    """
+    Registra el manifiesto de una colección tras (re)indexarla.
+    
+    Args:
+        previous_collection: Colección de la que se copiaron los chunks sin
+            cambios (indexación incremental); sus archivos fuente se conservan
+    """
+    source_files = {doc.metadata["source"]: doc.metadata.get("file_sha256") for doc in splits}
+    
+    previous = index_registry.read_manifest(previous_collection) if previous_collection else None
+    if previous:
+        source_files = {**previous["source_files"], **source_files}
+    for path in removed:
+        source_files.pop(path, None)
+    
+    # Una colección importada sigue siéndolo tras actualizarla (ver changed_category_files)
+    origin = {key: previous[key] for key in ("imported_from", "imported_at") if previous and key in previous}
+    
+    sample = vectorstore._collection.get(limit=1, include=["embeddings"])
+    dimension = len(sample["embeddings"][0]) if len(sample["embeddings"]) else None
+    
+    index_registry.write_manifest(collection_name, {**build_manifest(
+        category=category,
+        collection_name=collection_name,
+        chunk_count=vectorstore._collection.count(),
+        dimension=dimension,
+        source_files=source_files,
+        shards=len(vectorstore.shards) if isinstance(vectorstore, ShardedVectorStore) else 1
+    ), **origin})
+
+
+def delete_collection(collection_name: str, shards: Optional[int] = None):
+    """
+    Elimina una colección Chroma (sus shards y su manifiesto) del directorio persistente.
+    
+    Args:
+        shards: Número de shards con que se creó; por defecto el del manifiesto.
+            Además se eliminan las colecciones {coleccion}__s{i} que existan,
+            para no dejar shards huérfanos de una construcción que falló antes
+            de escribir su manifiesto
+    """
+    if shards is None:
+        shards = collection_shards(collection_name)
+    index_registry.delete_manifest(collection_name)
+    NumpyVectorStore.delete(os.path.join(NUMPY_STORE_DIRECTORY, collection_name))
+    BM25Index.delete(lexical_index_path(collection_name))
+    DocumentIndex.delete(document_index_path(collection_name))
+    
+    names = shard_names(collection_name, shards) if shards > 1 else [collection_name]
+    try:
+        prefix = f"{collection_name}{SHARD_SUFFIX}"
+        for collection in get_chroma_client().list_collections():
+            name = getattr(collection, "name", collection)
+            if name.startswith(prefix) and name[len(prefix):].isdigit() and name not in names:
+                names.append(name)
+    except Exception as e:
+        print(f"⚠️ Error al listar shards de '{collection_name}': {e}")
+    
+    for name in names:
+        try:
+            get_chroma_client().delete_collection(name)
+            print(f"🗑️ Colección '{name}' eliminada")
+        except chromadb.errors.NotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Error al eliminar colección '{name}': {e}")
+
+
+def export_category_bundle(category: str, path: str) -> dict:
+    """
+    Exporta la colección activa de una categoría a un bundle portable.
+    
+    Returns:
+        Metadata del bundle
+    """
+    category = normalize_category(category)
+    collection_name = index_registry.get_active(category)
+    manifest = index_registry.read_manifest(collection_name)
+    if not manifest:
+        raise ValueError(f"Collection '{collection_name}' has no manifest; reindex '{category}' before exporting")
+    
+    vectorstore = open_collection(collection_name)
+    metadata = write_bundle(vectorstore._collection, path, category, manifest, category_catalog.get(category))
+    print(f"📦 Bundle de '{category}' exportado a {path} ({metadata['chunk_count']} chunks)")
+    return metadata
+
+
+def import_category_bundle(path: str, category: Optional[str] = None) -> dict:
+    """
+    Importa un bundle como versión nueva de la categoría y la activa.
+    
+    Los embeddings vienen en el bundle: no se llama al proveedor de embeddings.
+    La colección se verifica (conteo y primer vector) antes de activarla.
+    """
+    bundle = read_bundle(path)
+    manifest = bundle["manifest"]
+    validate_manifest(manifest)
+    category = normalize_category(category or bundle["category"])
+    
+    collection_name = index_registry.new_version(category)
+    shards = manifest.get("shards") or 1
+    vectorstore = open_collection(collection_name, shards=shards)
+    first_row = None
+    
+    try:
+        for ids, embeddings, texts, metadatas in iter_bundle_chunks(path, bundle):
+            if first_row is None:
+                first_row = (ids[0], embeddings[0])
+            vectorstore._collection.add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[metadata or None for metadata in metadatas]
+            )
+        
+        stored = vectorstore._collection.count()
+        if stored != bundle["chunk_count"]:
+            raise ValueError(f"Imported collection has {stored} chunks, expected {bundle['chunk_count']}")
+        if first_row is not None:
+            sample = vectorstore._collection.get(ids=[first_row[0]], include=["embeddings"])
+            if not np.allclose(sample["embeddings"][0], first_row[1]):
+                raise ValueError("Imported embeddings do not match the bundle")
+        
+        index_registry.write_manifest(collection_name, {
+            **manifest,
+            "category": category,
+            "collection": collection_name,
+            "imported_from": bundle["collection"],
+            "imported_at": datetime.utcnow().isoformat()
+        })
+    except Exception:
+        delete_collection(collection_name, shards=shards)
+        raise
+    
+    # La categoría debe existir en este nodo (docs/ y configuración)
+    os.makedirs(f"docs/{category}", exist_ok=True)
+    docs_inventory.invalidate()
+    if category not in category_catalog and bundle.get("category_config"):
+        category_catalog.save(category, {**bundle["category_config"], "name": category})
+        get_invalidation_bus().publish(category, SCOPE_CONFIG)
+    
+    stale = index_registry.activate(category, collection_name)
+    drop_category_caches(category)
+    vectorstore_cache[category] = serving_vectorstore(collection_name, vectorstore)
+    load_derived_indexes(category, collection_name, vectorstore._collection)
+    get_invalidation_bus().publish(category, SCOPE_INDEX)
+    
+    for name in stale:
+        delete_collection(name)
+    
+    print(f"📥 Bundle importado en '{category}' ({stored} chunks, colección '{collection_name}')")
+    return {"category": category, "collection": collection_name, "chunks": stored}
+
+
+def run_index_job(job: dict, progress: Callable[..., None]) -> dict:
+    """Handler del worker de indexación: indexa y limpia el caché de respuestas."""
+    category = job["category"]
+    if job["job_type"] == JOB_TYPE_VIDEO:
+        # Las respuestas de videos no usan el caché de respuestas de la categoría
+        return refresh_video_transcripts(category, job.get("files", []), progress)
+    if job["job_type"] == "incremental":
+        result = index_files_incremental(category, job.get("files", []), progress)
+    else:
+        result = reindex_category(category, progress)
+    
+    # Limpiar caché de respuestas de esta categoría en MongoDB
+    try:
+        deleted = mongo.clear_cache(category=category)
+        print(f"🗑️ Caché limpiado para categoría {category}: {deleted} entradas")
+    except Exception as e:
+        print(f"⚠️ Error al limpiar caché: {e}")
+    
+    return result
+
+
+def job_accepted_response(job: dict, created: bool, message: str, **extra) -> JSONResponse:
+    """Respuesta 202 estándar para trabajos encolados."""
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": message,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "deduplicated": not created,
+            "status_url": f"/jobs/{job['job_id']}",
+            **extra
+        }
+    )
+
+
 def get_cache_key(question: str, category: str, format_type: str) -> str:
     """Genera clave única para caché."""
     content = f"{question.lower().strip()}:{category}:{format_type}"
@@ -350,33 +1147,35 @@ def get_or_create_vectorstore(category: str):
     category = normalize_category(category)
     
     # Verificar que la categoría existe
-    docs_path = f"docs/{category}"
-    if not os.path.exists(docs_path):
+    if not docs_inventory.exists(category):
         raise HTTPException(status_code=404, detail=f"Category '{category}' not found.")
     
-    # Cache en memoria
-    if category in vectorstore_cache:
-        return vectorstore_cache[category]
-    
-    # Cargar desde disco usando el nombre de categoría directamente
-    embeddings = OpenAIEmbeddings()
+    # Cache en memoria (salvo que otro worker haya activado una versión nueva)
+    vectorstore = vectorstore_cache.get(category)
+    if vectorstore is not None:
+        if is_current(category, vectorstore):
+            return vectorstore
+        print(f"🔄 Nueva versión del índice de '{category}' en disco, recargando...")
+        drop_category_caches(category)
     
+    # Cargar desde disco (colección activa de la categoría)
     try:
-        print(f"📦 Cargando vectorstore '{category}' desde disco...")
-        vectorstore = Chroma(
-            collection_name=category,
-            persist_directory=PERSIST_DIRECTORY,
-            embedding_function=embeddings
-        )
-        
-        # Verificar que tiene documentos
-        test_docs = vectorstore.similarity_search("test", k=1)
-        if not test_docs:
+        collection_name = index_registry.get_active(category)
+        print(f"📦 Cargando vectorstore '{category}' ({collection_name}) desde disco...")
+        vectorstore = open_collection(collection_name)
+        
+        # Validar con el manifiesto (sin consultas ni llamadas de embeddings)
+        manifest = index_registry.read_manifest(collection_name)
+        if manifest:
+            validate_manifest(manifest)
+        elif vectorstore._collection.count() == 0:
+            # Índices antiguos sin manifiesto: basta el conteo local de la colección
             raise HTTPException(
                 status_code=500, 
                 detail=f"Vectorstore '{category}' existe pero está vacío. Ejecuta: python reindex_documents.py"
             )
         
+        vectorstore = serving_vectorstore(collection_name, vectorstore)
         vectorstore_cache[category] = vectorstore
         print(f"✅ Vectorstore '{category}' cargado correctamente")
         return vectorstore
@@ -388,96 +1187,268 @@ def get_or_create_vectorstore(category: str):
         )
 
 
+# Mapeos de videos por categoría: (versión del inventario, mapeo)
+video_mappings: Dict[str, tuple] = {}
+
+
 def get_video_mapping(category: str = "geomecanica") -> Dict[str, str]:
-    """Retorna mapeo de IDs de video a archivos."""
+    """Retorna mapeo de IDs de video a archivos (recalculado solo si cambió el directorio)."""
     category = normalize_category(category)
-    videos_path = f"videos/{category}"
+    version, files = videos_inventory.snapshot(category)
     
-    if not os.path.exists(videos_path):
-        return {}
+    cached = video_mappings.get(category)
+    if cached and cached[0] == version:
+        return dict(cached[1])
     
-    txt_files = glob.glob(os.path.join(videos_path, "*.txt"))
     mapping = {}
+    for file in files:
+        video_id = video_id_from_filename(file["filename"])
+        if video_id:
+            mapping[video_id] = file["path"]
     
-    for txt_file in txt_files:
-        filename = os.path.basename(txt_file)
-        if filename.startswith("Modulo_"):
-            parts = filename.split("_")
-            if len(parts) >= 2 and parts[1].isdigit():
-                video_id = f"modulo_{parts[1]}"
-                mapping[video_id] = txt_file
-        else:
-            video_id = os.path.splitext(filename)[0].lower().replace(" ", "_")
-            mapping[video_id] = txt_file
+    video_mappings[category] = (version, mapping)
+    return dict(mapping)
+
+
+def video_id_from_filename(filename: str) -> Optional[str]:
+    """ID de video de una transcripción (Modulo_N_... -> modulo_N)."""
+    if filename.startswith("Modulo_"):
+        parts = filename.split("_")
+        if len(parts) >= 2 and parts[1].isdigit():
+            return f"modulo_{parts[1]}"
+        return None
+    return os.path.splitext(filename)[0].lower().replace(" ", "_")
+
+
+def load_video_transcription(video_id: str, category: str = "geomecanica"):
+    """Carga la transcripción de un video."""
+    category = normalize_category(category)
+    video_mapping = get_video_mapping(category)
+    
+    if video_id.lower() not in video_mapping:
+        available_ids = list(video_mapping.keys())
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Video ID '{video_id}' not found. Available: {available_ids}"
+        )
+    
+    txt_file = video_mapping[video_id.lower()]
+    
+    with open(txt_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    document = Document(
+        page_content=content,
+        metadata={
+            "source": txt_file,
+            "video_id": video_id.lower(),
+            "category": category,
+            "type": "video_transcription"
+        }
+    )
     
-    return mapping
+    return [document]
+
+
+# Evita indexar dos veces el mismo video con consultas simultáneas
+video_index_lock = threading.Lock()
+
+
+def video_collection_name(category: str) -> str:
+    """Colección de transcripciones de una categoría (un video = filtro por video_id)."""
+    return f"video_{normalize_category(category)}"
+
+
+def get_or_create_video_vectorstore(video_id: str, category: str = "geomecanica"):
+    """
+    Obtiene la colección de videos de la categoría asegurando que el video
+    esté indexado. Las consultas deben filtrar por {"video_id": video_id}.
+    """
+    category = normalize_category(category)
+    video_id = video_id.lower()
+    cache_key = video_collection_name(category)
+    
+    vectorstore = vectorstore_cache.get(cache_key)
+    loaded = vectorstore is None
+    if loaded:
+        vectorstore = open_collection(cache_key)
+    
+    # Indexar la transcripción la primera vez que se consulta el video
+    with video_index_lock:
+        if not vectorstore._collection.get(where={"video_id": video_id}, limit=1)["ids"]:
+            documents = load_video_transcription(video_id, category)
+            
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1500,
+                chunk_overlap=150
+            )
+            splits = text_splitter.split_documents(documents)
+            vectorstore.add_documents(splits)
+            loaded = True
+            print(f"🎬 Video '{video_id}' indexado en '{cache_key}' ({len(splits)} chunks)")
+            
+            # Los índices antiguos de un directorio por video ya no se usan
+            legacy_path = os.path.join(PERSIST_DIRECTORY, f"video_{category}_{video_id}")
+            if os.path.isdir(legacy_path):
+                shutil.rmtree(legacy_path, ignore_errors=True)
+                print(f"🗑️ Índice antiguo '{legacy_path}' eliminado")
+    
+    # Se (re)inserta al cargar o indexar para actualizar la memoria estimada
+    if loaded:
+        vectorstore_cache[cache_key] = vectorstore
+    return vectorstore
+
+
+def refresh_video_transcripts(category: str, files: List[str], progress: Optional[Callable[..., None]] = None) -> dict:
+    """
+    Re-indexa transcripciones agregadas, modificadas o eliminadas en videos/{categoria}.
+    
+    Se borran los chunks previos de cada video y los que siguen en disco se
+    indexan de nuevo (los textos sin cambios reutilizan sus embeddings).
+    """
+    report = progress or (lambda **fields: None)
+    category = normalize_category(category)
+    videos_inventory.invalidate(category)
+    mapping = get_video_mapping(category)
+    vectorstore = vectorstore_cache.get(video_collection_name(category)) or open_collection(video_collection_name(category))
+    
+    indexed, removed = [], []
+    for i, path in enumerate(files, start=1):
+        video_id = video_id_from_filename(os.path.basename(path))
+        if video_id:
+            with video_index_lock:
+                vectorstore._collection.delete(where={"video_id": video_id})
+            if mapping.get(video_id) == path:
+                get_or_create_video_vectorstore(video_id, category)
+                indexed.append(video_id)
+            else:
+                removed.append(video_id)
+        report(files_done=i, progress=round(i / len(files), 3))
+    
+    print(f"🎬 Videos de '{category}' actualizados ({len(indexed)} re-indexados, {len(removed)} eliminados)")
+    return {"files": len(files), "indexed": indexed, "removed": removed}
+
+
+# Parámetros de MMR: candidatos por consulta y peso relevancia/diversidad
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "50"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
 
 
-def load_video_transcription(video_id: str, category: str = "geomecanica"):
-    """Carga la transcripción de un video."""
-    from langchain.schema import Document
+def mmr_search(vectorstore, question: str, k: int = 2, fetch_k: int = MMR_FETCH_K,
+               filter: Optional[dict] = None, embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+    """
+    Busca los fetch_k chunks más cercanos y re-ordena con MMR vectorizado.
     
-    category = normalize_category(category)
-    video_mapping = get_video_mapping(category)
+    Returns:
+        Lista de (documento, puntuación MMR) en orden de selección
+    """
+    if embedding is None:
+        embedding = vectorstore.embeddings.embed_query(question)
     
-    if video_id.lower() not in video_mapping:
-        available_ids = list(video_mapping.keys())
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Video ID '{video_id}' not found. Available: {available_ids}"
+    if isinstance(vectorstore, NumpyVectorStore):
+        return vectorstore.max_marginal_relevance_search_with_score_by_vector(
+            embedding, k, fetch_k, MMR_LAMBDA, filter
         )
     
-    txt_file = video_mapping[video_id.lower()]
+    results = vectorstore._collection.query(
+        query_embeddings=[embedding],
+        n_results=fetch_k,
+        where=filter,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    if not results["ids"][0]:
+        return []
     
-    with open(txt_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    selected, scores = maximal_marginal_relevance(embedding, results["embeddings"][0], k, MMR_LAMBDA)
+    return [
+        (Document(
+            id=results["ids"][0][i],
+            page_content=results["documents"][0][i],
+            metadata=results["metadatas"][0][i] or {}
+        ), float(score))
+        for i, score in zip(selected, scores)
+    ]
+
+
+def hybrid_search(category: str, vectorstore, question: str, k: int = 2, filter: Optional[dict] = None,
+                  embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+    """
+    Fusiona con RRF los candidatos vectoriales (MMR) y los de BM25.
     
-    document = Document(
-        page_content=content,
-        metadata={
-            "source": txt_file,
-            "video_id": video_id,
-            "category": category,
-            "type": "video_transcription"
-        }
-    )
+    Un chunk que coincide exactamente con la consulta sube en el ranking
+    aunque el vectorial no lo encuentre, pero RRF no le garantiza un puesto:
+    los chunks que aparecen en ambas listas suman las dos contribuciones y
+    pueden quedar por delante del 1º de BM25.
     
-    return [document]
+    Returns:
+        Lista de (documento, puntuación RRF)
+    """
+    vector_results = mmr_search(vectorstore, question, HYBRID_CANDIDATES, filter=filter, embedding=embedding)
+    try:
+        lexical_results = get_or_create_lexical_index(category).search(question, HYBRID_CANDIDATES)
+    except Exception as e:
+        print(f"⚠️ Búsqueda BM25 no disponible para '{category}': {e}")
+        lexical_results = []
+    
+    documents = {doc.id: doc for doc, _ in vector_results}
+    fused = reciprocal_rank_fusion(
+        [[doc.id for doc, _ in vector_results], [chunk_id for chunk_id, _ in lexical_results]],
+        k=RRF_K
+    )[:k]
+    
+    # Los chunks que solo encontró BM25 se leen por id
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in documents]
+    if missing:
+        documents.update({doc.id: doc for doc in vectorstore.get_by_ids(missing)})
+    
+    return [(documents[chunk_id], score) for chunk_id, score in fused if chunk_id in documents]
 
 
-def get_or_create_video_vectorstore(video_id: str, category: str = "geomecanica"):
-    """Crea vectorstore para un video."""
-    category = normalize_category(category)
-    cache_key = f"video_{category}_{video_id}"
-    
-    if cache_key in vectorstore_cache:
-        return vectorstore_cache[cache_key]
+def select_documents(category: str, embedding: List[float]) -> Optional[dict]:
+    """
+    Etapa gruesa de la recuperación en dos etapas.
     
-    documents = load_video_transcription(video_id, category)
+    Returns:
+        Filtro de metadata con los documentos más cercanos, o None para buscar
+        en todos los chunks (categoría pequeña o dos etapas desactivadas)
+    """
+    settings = get_retrieval_settings(category)
+    if settings["two_stage"] is False:
+        return None
     
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1500,
-        chunk_overlap=150
-    )
-    splits = text_splitter.split_documents(documents)
+    try:
+        index = get_or_create_document_index(category)
+    except Exception as e:
+        print(f"⚠️ Índice de documentos no disponible para '{category}': {e}")
+        return None
     
-    embeddings = OpenAIEmbeddings()
-    persist_path = os.path.join(PERSIST_DIRECTORY, f"video_{category}_{video_id}")
+    if settings["two_stage"] is None and index.document_count < TWO_STAGE_MIN_DOCUMENTS:
+        return None
+    if index.document_count <= settings["top_documents"]:
+        return None
     
-    if os.path.exists(persist_path):
-        vectorstore = Chroma(
-            persist_directory=persist_path,
-            embedding_function=embeddings
-        )
-    else:
-        vectorstore = Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            persist_directory=persist_path
-        )
+    sources = [source for source, _ in index.search(embedding, settings["top_documents"])]
+    return {"source": {"$in": sources}}
+
+
+def retrieve_category_documents(category: str, question: str, k: int = 2) -> List[Document]:
+    """
+    Recupera los chunks relevantes de una categoría (índices fijados en caché mientras se usan).
     
-    vectorstore_cache[cache_key] = vectorstore
-    return vectorstore
+    En categorías grandes la búsqueda vectorial se limita a los chunks de los
+    documentos elegidos en la etapa gruesa; BM25 sigue buscando en toda la
+    categoría para no perder coincidencias exactas.
+    """
+    with vectorstore_cache.pinned(*category_cache_keys(category)):
+        vectorstore = get_or_create_vectorstore(category)
+        embedding = vectorstore.embeddings.embed_query(question)
+        filter = select_documents(category, embedding)
+        
+        if HYBRID_SEARCH:
+            results = hybrid_search(category, vectorstore, question, k, filter=filter, embedding=embedding)
+        else:
+            results = mmr_search(vectorstore, question, k, filter=filter, embedding=embedding)
+        return [doc for doc, _ in results]
 
 
 @app.post("/ask")
@@ -513,13 +1484,7 @@ async def ask_question(
                 return cached_answer
         
         # Obtener vectorstore y buscar documentos relevantes
-        vectorstore = get_or_create_vectorstore(category)
-        retriever = vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 2, "fetch_k": 10}
-        )
-        
-        relevant_docs = retriever.invoke(question)
+        relevant_docs = retrieve_category_documents(category, question)
         context = "\n\n".join([doc.page_content for doc in relevant_docs])
         
         # Extraer fuentes
@@ -558,7 +1523,7 @@ async def ask_question(
             # Insertar historial conversacional si existe
             full_context = f"{conversation_context}\n\nINFORMACIÓN DE DOCUMENTOS:\n{context}" if conversation_context else context
             prompt = html_prompt_template.format(context=full_context, question=question)
-            answer = llm.invoke(prompt).content
+            answer = await generate_answer(prompt, category)
             result["answer"] = answer
             result["sources"] = f"<ul>{sources_html}</ul>"
             
@@ -577,7 +1542,7 @@ async def ask_question(
             # Insertar historial conversacional si existe
             full_context = f"{conversation_context}\n\nINFORMACIÓN DE DOCUMENTOS:\n{context}" if conversation_context else context
             prompt = plain_prompt_template.format(context=full_context, question=question)
-            answer_plain = llm.invoke(prompt).content
+            answer_plain = await generate_answer(prompt, category)
             result["answer_plain"] = answer_plain
             result["sources_plain"] = sources_plain
             
@@ -605,6 +1570,87 @@ async def ask_question(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Evento Server-Sent Events con datos JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(
+    question_request: QuestionRequest,
+    user: Optional[ClerkUser] = Depends(optional_auth)
+):
+    """
+    Igual que /ask pero la respuesta llega por streaming (Server-Sent Events).
+    
+    Eventos: "sources" (fuentes de los documentos recuperados), "token"
+    (fragmentos de la respuesta), "done" (tokens, time-to-first-token y
+    duración) o "error". Admite format html o plain; las respuestas por
+    streaming no pasan por el caché de respuestas.
+    """
+    question = question_request.question
+    category = normalize_category(question_request.category)
+    format_type = question_request.format.lower()
+    session_id = get_session_id_from_user(user, question_request.session_id)
+    
+    if format_type not in ["html", "plain"]:
+        raise HTTPException(status_code=400, detail="Invalid format (streaming supports html or plain)")
+    
+    try:
+        relevant_docs = retrieve_category_documents(category, question)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    context = "\n\n".join([doc.page_content for doc in relevant_docs])
+    sources = [
+        f"{doc.metadata.get('source', 'Fuente desconocida')} (pág. {doc.metadata.get('page', 'Página no especificada')})"
+        for doc in relevant_docs
+    ]
+    
+    conversation_context = ""
+    if session_id:
+        conversation_context = format_conversation_context(get_conversation_history(session_id))
+    full_context = f"{conversation_context}\n\nINFORMACIÓN DE DOCUMENTOS:\n{context}" if conversation_context else context
+    
+    html_prompt_template, plain_prompt_template = get_prompts_for_category(category)
+    template = html_prompt_template if format_type == "html" else plain_prompt_template
+    prompt = template.format(context=full_context, question=question)
+    
+    async def events():
+        yield sse_event("sources", {"question": question, "category": category, "format": format_type, "sources": sources})
+        
+        start = time.perf_counter()
+        ttft = None
+        parts = []
+        try:
+            async for token in stream_answer(prompt, category):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        
+        answer = "".join(parts)
+        if session_id:
+            metadata = {"category": category, "format": format_type}
+            if user:
+                metadata.update(get_user_metadata(user))
+            add_to_conversation(session_id, "user", question, metadata)
+            add_to_conversation(session_id, "assistant", answer, metadata)
+        
+        yield sse_event("done", {
+            "tokens": len(parts),
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.post("/ask-video")
 async def ask_video_question(request: VideoQuestionRequest):
     """Endpoint para videos - También simplificado."""
@@ -617,10 +1663,13 @@ async def ask_video_question(request: VideoQuestionRequest):
         raise HTTPException(status_code=400, detail="Invalid format")
 
     try:
-        vectorstore = get_or_create_video_vectorstore(video_id, category)
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
-        
-        relevant_docs = retriever.invoke(question)
+        with vectorstore_cache.pinned(video_collection_name(category)):
+            vectorstore = get_or_create_video_vectorstore(video_id, category)
+            retriever = vectorstore.as_retriever(
+                search_kwargs={"k": 4, "filter": {"video_id": video_id}}
+            )
+            
+            relevant_docs = retriever.invoke(question)
         context = "\n\n".join([doc.page_content for doc in relevant_docs])
         
         video_metadata = relevant_docs[0].metadata if relevant_docs else {}
@@ -652,7 +1701,7 @@ INSTRUCCIONES:
 
 Respuesta:"""
             
-            answer = llm.invoke(prompt).content
+            answer = await generate_answer(prompt, category)
             result["answer_html"] = f"""
 <div>
     <h2>Video {video_id.upper()}</h2>
@@ -679,7 +1728,7 @@ INSTRUCCIONES:
 
 Respuesta:"""
             
-            answer = llm.invoke(prompt).content
+            answer = await generate_answer(prompt, category)
             result["answer_plain"] = f"{answer}"
         
         return result
@@ -721,36 +1770,48 @@ async def list_videos(category: str):
 
 @app.get("/cache/stats")
 async def cache_stats():
-    """Estadísticas del caché desde MongoDB."""
+    """Estadísticas del caché de respuestas (MongoDB) y del caché de vectorstores."""
     try:
-        stats = mongo.get_cache_stats()
+        stats = mongo.get_cache_stats() if mongo else {}
         stats["vectorstore_cache_size"] = len(vectorstore_cache)
+        stats["vectorstore_cache"] = vectorstore_cache.stats()
+        stats["invalidation"] = get_invalidation_bus().stats()
+        stats["category_catalog"] = category_catalog.stats()
+        stats["file_inventory"] = {"docs": docs_inventory.stats(), "videos": videos_inventory.stats()}
+        stats["file_watchers"] = [watcher.stats() for watcher in file_watchers]
+        stats["llm"] = {"provider": LLM_PROVIDER, "metrics": llm_metrics.stats()}
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
 
 
+@app.get("/dedup/stats")
+async def dedup_stats():
+    """Reporte de deduplicación de contenido: archivos repetidos y ahorro."""
+    try:
+        return get_content_registry().stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
+
+
 @app.get("/categories/{category_name}/files")
 async def list_category_files(category_name: str):
     """Lista archivos de una categoría."""
     try:
         category_name = normalize_category(category_name)
-        docs_path = f"docs/{category_name}"
         
-        if not os.path.exists(docs_path):
+        if not docs_inventory.exists(category_name):
             raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
         
-        files = []
-        for filename in os.listdir(docs_path):
-            if filename.endswith('.pdf'):
-                filepath = os.path.join(docs_path, filename)
-                stat = os.stat(filepath)
-                files.append({
-                    "filename": filename,
-                    "size": stat.st_size,
-                    "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
+        files = [
+            {
+                "filename": f["filename"],
+                "size": f["size"],
+                "created_at": datetime.fromtimestamp(f["ctime"]).isoformat(),
+                "modified_at": datetime.fromtimestamp(f["mtime"]).isoformat()
+            }
+            for f in docs_inventory.files(category_name)
+        ]
         
         return {
             "category": category_name,
@@ -770,47 +1831,179 @@ async def upload_file(category_name: str, file: UploadFile = File(...)):
     try:
         category_name = normalize_category(category_name)
         
+        if not docs_inventory.exists(category_name):
+            raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
+        
         # Verificar que es PDF
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Crear directorio si no existe
+        # Guardar archivo por streaming (sin cargarlo completo en memoria)
         docs_path = f"docs/{category_name}"
-        os.makedirs(docs_path, exist_ok=True)
+        stored = await save_upload_streaming(file, docs_path)
+        docs_inventory.invalidate(category_name)
+        duplicates = get_content_registry().add_membership(
+            category_name, stored["path"], stored["sha256"], stored["size"]
+        )
         
-        # Guardar archivo
-        file_path = os.path.join(docs_path, file.filename)
+        # Indexar el archivo nuevo en segundo plano (el caché se limpia al terminar el trabajo)
+        job, created = job_queue.enqueue(category_name, "incremental", [stored["path"]])
+        
+        return job_accepted_response(
+            job, created,
+            f"File '{stored['filename']}' uploaded successfully to category '{category_name}'. Indexing queued.",
+            filename=stored["filename"],
+            size=stored["size"],
+            sha256=stored["sha256"],
+            duplicate_of=duplicates,
+            category=category_name
+        )
         
-        # Verificar si ya existe
-        if os.path.exists(file_path):
-            raise HTTPException(status_code=400, detail=f"File '{file.filename}' already exists")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/categories/{category_name}/upload-bulk")
+async def upload_files_bulk(category_name: str, files: List[UploadFile] = File(...)):
+    """
+    Sube varios PDFs (o ZIPs con PDFs) a una categoría.
+    
+    Todos los archivos se validan y guardan, y luego se encola una única
+    indexación incremental con los archivos nuevos.
+    """
+    category_name = normalize_category(category_name)
+    
+    if not docs_inventory.exists(category_name):
+        raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
+    
+    docs_path = f"docs/{category_name}"
+    
+    results = []
+    stored_count = 0
+    for file in files:
+        # Lo que exceda el máximo por subida se rechaza sin escribirlo a disco
+        if file.filename.lower().endswith(".zip"):
+            extracted = await asyncio.to_thread(
+                extract_zip_pdfs, file, docs_path, max_files=MAX_BULK_FILES - stored_count
+            )
+            stored_count += sum(1 for r in extracted if r["status"] == "stored")
+            results.extend(extracted)
+            continue
         
-        # Escribir archivo
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        if not file.filename.endswith('.pdf'):
+            results.append({"filename": file.filename, "status": "rejected", "error": "Only PDF files are allowed"})
+            continue
         
-        # Re-indexar automáticamente
-        await reindex_category_auto(category_name)
+        if stored_count >= MAX_BULK_FILES:
+            results.append({"filename": file.filename, "status": "rejected",
+                            "error": f"More than {MAX_BULK_FILES} files per upload"})
+            continue
         
-        # Limpiar caché de respuestas de esta categoría en MongoDB
         try:
-            deleted = mongo.clear_cache(category=category_name)
-            print(f"🗑️ Caché limpiado para categoría {category_name}: {deleted} entradas")
-        except Exception as e:
-            print(f"⚠️ Error al limpiar caché: {e}")
-        
-        return {
-            "message": f"File '{file.filename}' uploaded successfully to category '{category_name}'",
-            "filename": file.filename,
-            "size": len(content),
-            "category": category_name
-        }
-        
-    except HTTPException:
-        raise
+            stored = await save_upload_streaming(file, docs_path)
+            results.append({**stored, "status": "stored"})
+            stored_count += 1
+        except HTTPException as e:
+            results.append({"filename": file.filename, "status": "rejected", "error": e.detail})
+    
+    docs_inventory.invalidate(category_name)
+    stored_files = [r for r in results if r["status"] == "stored"]
+    for result in stored_files:
+        result["duplicate_of"] = get_content_registry().add_membership(
+            category_name, result["path"], result["sha256"], result["size"]
+        )
+    
+    summary = {
+        "category": category_name,
+        "stored": len(stored_files),
+        "rejected": len(results) - len(stored_files),
+        "files": results
+    }
+    
+    if not stored_files:
+        raise HTTPException(status_code=400, detail=summary)
+    
+    # Una sola pasada de indexación incremental para todos los archivos nuevos
+    job, created = job_queue.enqueue(category_name, "incremental", [r["path"] for r in stored_files])
+    
+    return job_accepted_response(
+        job, created,
+        f"{len(stored_files)} files uploaded to category '{category_name}'. Indexing queued.",
+        **summary
+    )
+
+
+@app.post("/categories/{category_name}/reindex")
+async def reindex_category_endpoint(category_name: str):
+    """Encola la re-indexación completa de una categoría."""
+    category_name = normalize_category(category_name)
+    
+    if not docs_inventory.exists(category_name):
+        raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
+    
+    job, created = job_queue.enqueue(category_name)
+    return job_accepted_response(job, created, f"Re-indexing queued for category '{category_name}'")
+
+
+@app.get("/categories/{category_name}/index")
+async def get_category_index(category_name: str):
+    """Versiones del índice de una categoría (activa y anterior) y manifiesto activo."""
+    category_name = normalize_category(category_name)
+    entry = index_registry.get_entry(category_name)
+    return {
+        "category": category_name,
+        **entry,
+        "manifest": index_registry.read_manifest(entry["active"])
+    }
+
+
+@app.post("/categories/{category_name}/index/rollback")
+async def rollback_category_index(category_name: str):
+    """Vuelve a servir la versión anterior del índice de una categoría."""
+    category_name = normalize_category(category_name)
+    
+    try:
+        collection_name = index_registry.rollback(category_name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    # Forzar la carga de la colección reactivada en la próxima consulta
+    drop_category_caches(category_name)
+    get_invalidation_bus().publish(category_name, SCOPE_INDEX)
+    
+    try:
+        deleted = mongo.clear_cache(category=category_name)
+        print(f"🗑️ Caché limpiado para categoría {category_name}: {deleted} entradas")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"⚠️ Error al limpiar caché: {e}")
+    
+    return {
+        "message": f"Category '{category_name}' rolled back",
+        "category": category_name,
+        **index_registry.get_entry(category_name)
+    }
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """Lista los trabajos de indexación más recientes."""
+    jobs = job_queue.list(limit=limit)
+    return {
+        "queue": job_queue.stats(),
+        "jobs": jobs,
+        "total": len(jobs)
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado de un trabajo de indexación: etapa, avance, chunks y duración."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
 
 
 @app.put("/categories/{category_name}/prompt")
@@ -820,17 +2013,16 @@ async def update_category_prompt(category_name: str, prompt_data: PromptUpdate):
         category_name = normalize_category(category_name)
         
         # Verificar que la categoría existe
-        docs_path = f"docs/{category_name}"
-        if not os.path.exists(docs_path):
+        if not docs_inventory.exists(category_name):
             raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
         
         # Cargar configuración
-        config = load_categories_config()
+        entry = category_catalog.get(category_name)
         
         # Si no existe en config, crear entrada básica
-        if category_name not in config:
+        if entry is None:
             now = datetime.now().isoformat()
-            config[category_name] = {
+            entry = {
                 "name": category_name,
                 "display_name": category_name.title(),
                 "description": f"Categoría {category_name}",
@@ -839,11 +2031,12 @@ async def update_category_prompt(category_name: str, prompt_data: PromptUpdate):
             }
         
         # Actualizar prompts
-        config[category_name]["prompt_html"] = prompt_data.prompt_html
-        config[category_name]["prompt_plain"] = prompt_data.prompt_plain
-        config[category_name]["updated_at"] = datetime.now().isoformat()
+        entry["prompt_html"] = prompt_data.prompt_html
+        entry["prompt_plain"] = prompt_data.prompt_plain
+        entry["updated_at"] = datetime.now().isoformat()
         
-        save_categories_config(config)
+        category_catalog.save(category_name, entry)
+        get_invalidation_bus().publish(category_name, SCOPE_PROMPTS)
         
         # Limpiar caché de respuestas de esta categoría en MongoDB
         try:
@@ -873,8 +2066,8 @@ async def get_category_prompt(category_name: str):
         html_prompt, plain_prompt = get_prompts_for_category(category_name)
         
         # Verificar si son personalizados
-        config = load_categories_config()
-        is_custom = category_name in config and (config[category_name].get('prompt_html') or config[category_name].get('prompt_plain'))
+        entry = category_catalog.get(category_name)
+        is_custom = entry is not None and (entry.get('prompt_html') or entry.get('prompt_plain'))
         
         return {
             "category": category_name,
@@ -894,17 +2087,16 @@ async def reset_category_prompt(category_name: str):
         category_name = normalize_category(category_name)
         
         # Cargar configuración
-        config = load_categories_config()
+        entry = category_catalog.get(category_name)
         
-        if category_name in config:
+        if entry is not None:
             # Eliminar prompts personalizados
-            if 'prompt_html' in config[category_name]:
-                del config[category_name]['prompt_html']
-            if 'prompt_plain' in config[category_name]:
-                del config[category_name]['prompt_plain']
+            entry.pop('prompt_html', None)
+            entry.pop('prompt_plain', None)
             
-            config[category_name]["updated_at"] = datetime.now().isoformat()
-            save_categories_config(config)
+            entry["updated_at"] = datetime.now().isoformat()
+            category_catalog.save(category_name, entry)
+            get_invalidation_bus().publish(category_name, SCOPE_PROMPTS)
         
         # Limpiar caché de respuestas de esta categoría en MongoDB
         try:
@@ -1070,37 +2262,30 @@ async def list_conversations():
 @app.get("/categories")
 async def list_categories():
     """Lista categorías disponibles con información detallada."""
-    config = load_categories_config()
-    
     # Obtener categorías de configuración
     configured_categories = {}
-    for name, data in config.items():
+    for name in category_catalog.names():
         category_info = get_category_info(name)
         if category_info:
             configured_categories[name] = category_info
     
     # Buscar categorías en filesystem que no estén en config
-    docs_path = "docs"
     filesystem_categories = {}
-    if os.path.exists(docs_path):
-        for d in os.listdir(docs_path):
-            dir_path = os.path.join(docs_path, d)
-            if os.path.isdir(dir_path) and not d.startswith('.'):
-                normalized_name = normalize_category(d)
-                if normalized_name not in configured_categories:
-                    # Crear entrada básica para categorías no configuradas
-                    file_count = len([f for f in os.listdir(dir_path) if f.endswith('.pdf')])
-                    filesystem_categories[normalized_name] = {
-                        "name": normalized_name,
-                        "display_name": d.title(),
-                        "description": f"Categoría {d} (no configurada)",
-                        "created_at": "unknown",
-                        "updated_at": "unknown",
-                        "file_count": file_count,
-                        "has_custom_prompt": False,
-                        "prompt_html": None,
-                        "prompt_plain": None
-                    }
+    for d in docs_inventory.categories():
+        normalized_name = normalize_category(d)
+        if normalized_name not in configured_categories:
+            # Crear entrada básica para categorías no configuradas
+            filesystem_categories[normalized_name] = {
+                "name": normalized_name,
+                "display_name": d.title(),
+                "description": f"Categoría {d} (no configurada)",
+                "created_at": "unknown",
+                "updated_at": "unknown",
+                "file_count": docs_inventory.count(d),
+                "has_custom_prompt": False,
+                "prompt_html": None,
+                "prompt_plain": None
+            }
     
     all_categories = {**configured_categories, **filesystem_categories}
     
@@ -1116,34 +2301,41 @@ async def create_category(category: CategoryCreate):
     try:
         category_name = normalize_category(category.name)
         
+        check_llm_provider(category.llm_provider)
+        
         # Verificar que no existe
-        config = load_categories_config()
-        if category_name in config:
+        if category_name in category_catalog:
             raise HTTPException(status_code=400, detail=f"Category '{category_name}' already exists")
         
         # Crear directorio
         docs_path = f"docs/{category_name}"
         os.makedirs(docs_path, exist_ok=True)
+        docs_inventory.invalidate()
         
         # Crear entrada en configuración
         now = datetime.now().isoformat()
-        config[category_name] = {
+        category_catalog.save(category_name, {
             "name": category_name,
             "display_name": category.display_name,
             "description": category.description,
             "created_at": now,
             "updated_at": now,
             "prompt_html": category.prompt_html,
-            "prompt_plain": category.prompt_plain
-        }
-        
-        save_categories_config(config)
+            "prompt_plain": category.prompt_plain,
+            "two_stage_retrieval": category.two_stage_retrieval,
+            "two_stage_top_documents": category.two_stage_top_documents,
+            "shards": category.shards,
+            "llm_provider": category.llm_provider
+        })
+        get_invalidation_bus().publish(category_name, SCOPE_CONFIG)
         
         return {
             "message": f"Category '{category_name}' created successfully",
             "category": get_category_info(category_name)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1157,9 +2349,8 @@ async def get_category(category_name: str):
         
         if not category_info:
             # Verificar si existe en filesystem
-            docs_path = f"docs/{category_name}"
-            if os.path.exists(docs_path):
-                file_count = len([f for f in os.listdir(docs_path) if f.endswith('.pdf')])
+            if docs_inventory.exists(category_name):
+                file_count = docs_inventory.count(category_name)
                 return {
                     "name": category_name,
                     "display_name": category_name.title(),
@@ -1189,16 +2380,15 @@ async def update_category(category_name: str, update_data: CategoryUpdate):
         category_name = normalize_category(category_name)
         
         # Verificar que existe
-        config = load_categories_config()
-        if category_name not in config:
+        entry = category_catalog.get(category_name)
+        if entry is None:
             # Si no está en config pero existe en filesystem, crear entrada
-            docs_path = f"docs/{category_name}"
-            if not os.path.exists(docs_path):
+            if not docs_inventory.exists(category_name):
                 raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found")
             
             # Crear entrada básica
             now = datetime.now().isoformat()
-            config[category_name] = {
+            entry = {
                 "name": category_name,
                 "display_name": category_name.title(),
                 "description": f"Categoría {category_name}",
@@ -1208,17 +2398,27 @@ async def update_category(category_name: str, update_data: CategoryUpdate):
         
         # Actualizar campos
         if update_data.display_name is not None:
-            config[category_name]["display_name"] = update_data.display_name
+            entry["display_name"] = update_data.display_name
         if update_data.description is not None:
-            config[category_name]["description"] = update_data.description
+            entry["description"] = update_data.description
         if update_data.prompt_html is not None:
-            config[category_name]["prompt_html"] = update_data.prompt_html
+            entry["prompt_html"] = update_data.prompt_html
         if update_data.prompt_plain is not None:
-            config[category_name]["prompt_plain"] = update_data.prompt_plain
-        
-        config[category_name]["updated_at"] = datetime.now().isoformat()
-        
-        save_categories_config(config)
+            entry["prompt_plain"] = update_data.prompt_plain
+        if update_data.two_stage_retrieval is not None:
+            entry["two_stage_retrieval"] = update_data.two_stage_retrieval
+        if update_data.two_stage_top_documents is not None:
+            entry["two_stage_top_documents"] = update_data.two_stage_top_documents
+        if update_data.shards is not None:
+            entry["shards"] = update_data.shards
+        if update_data.llm_provider is not None:
+            check_llm_provider(update_data.llm_provider)
+            entry["llm_provider"] = update_data.llm_provider
+        
+        entry["updated_at"] = datetime.now().isoformat()
+        
+        category_catalog.save(category_name, entry)
+        get_invalidation_bus().publish(category_name, SCOPE_CONFIG)
         
         return {
             "message": f"Category '{category_name}' updated successfully",
@@ -1241,20 +2441,17 @@ async def delete_category(category_name: str):
         docs_path = f"docs/{category_name}"
         if os.path.exists(docs_path):
             shutil.rmtree(docs_path)
+        docs_inventory.invalidate()
         
-        # Eliminar vectorstore
-        if category_name in vectorstore_cache:
-            del vectorstore_cache[category_name]
+        # Eliminar vectorstore (todas sus versiones)
+        drop_category_caches(category_name)
         
-        vectorstore_path = os.path.join(PERSIST_DIRECTORY, category_name)
-        if os.path.exists(vectorstore_path):
-            shutil.rmtree(vectorstore_path)
+        index_registry.drop(category_name, delete_collection)
+        get_content_registry().remove_category(category_name)
         
         # Eliminar de configuración
-        config = load_categories_config()
-        if category_name in config:
-            del config[category_name]
-            save_categories_config(config)
+        category_catalog.delete(category_name)
+        get_invalidation_bus().publish(category_name, SCOPE_CONFIG)
         
         # Limpiar caché de respuestas relacionadas en MongoDB
         try:
@@ -1281,6 +2478,18 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check para balanceadores: 200 solo cuando terminó el warm-up
+    ("ready", o "degraded" si se interrumpió y el resto se carga bajo demanda).
+    
+    /health sigue indicando solo que el proceso está vivo.
+    """
+    status_code = 200 if warmup_state["status"] in ("ready", "degraded") else 503
+    return JSONResponse(status_code=status_code, content=warmup_state)
+
+
 @app.get("/")
 async def root():
     """Info de la API."""
@@ -1304,12 +2513,17 @@ async def root():
                 "/categories": "GET - Lista categorías, POST - Crear categoría",
                 "/categories/{name}": "GET - Info, PUT - Actualizar, DELETE - Eliminar",
                 "/categories/{name}/files": "GET - Lista archivos",
-                "/categories/{name}/upload": "POST - Subir archivo PDF",
+                "/categories/{name}/upload": "POST - Subir archivo PDF (202 + job_id)",
+                "/categories/{name}/upload-bulk": "POST - Subir varios PDFs o un ZIP (una sola indexación)",
+                "/categories/{name}/reindex": "POST - Encolar re-indexación (202 + job_id)",
+                "/categories/{name}/index": "GET - Versiones y manifiesto del índice",
+                "/categories/{name}/index/rollback": "POST - Volver a la versión anterior del índice",
                 "/categories/{name}/files/{filename}": "DELETE - Eliminar archivo",
                 "/categories/{name}/prompt": "GET/PUT/DELETE - Gestión prompts"
             },
             "queries": {
                 "/ask": "POST - Consulta PDFs (con session_id opcional para conversación)",
+                "/ask/stream": "POST - Consulta PDFs con la respuesta por streaming (SSE, format html o plain)",
                 "/ask-video": "POST - Consulta videos por ID",
                 "/videos/{category}": "GET - Lista videos disponibles"
             },
@@ -1318,7 +2532,12 @@ async def root():
                 "/conversations": "DELETE - Limpia todas las conversaciones"
             },
             "system": {
+                "/health": "GET - Liveness (proceso vivo)",
+                "/ready": "GET - Readiness (200 al terminar el warm-up, 503 antes)",
+                "/jobs": "GET - Lista trabajos de indexación",
+                "/jobs/{job_id}": "GET - Estado de un trabajo (etapa, avance, chunks, duración)",
                 "/cache/stats": "GET - Estadísticas del caché",
+                "/dedup/stats": "GET - Documentos duplicados y ahorro de parseo/embeddings",
                 "/cache/clear": "DELETE - Limpia caché de respuestas"
             }
         },
@@ -1927,6 +3146,7 @@ async def admin_panel():
                 document.getElementById('systemStats').innerHTML = `
                     <p><strong>Caché de respuestas:</strong> ${data.answer_cache_size}/${data.answer_cache_max} items</p>
                     <p><strong>Vectorstores cargados:</strong> ${data.vectorstore_cache_size} categorías</p>
+                    <p><strong>Memoria estimada:</strong> ${(data.vectorstore_cache.estimated_bytes / 1048576).toFixed(1)} MB (expulsiones: ${data.vectorstore_cache.evictions})</p>
                     <p><strong>Categorías totales:</strong> ${categories.length}</p>
                 `;
             } catch (error) {
@@ -1979,16 +3199,242 @@ async def admin_panel():
     return HTMLResponse(content=html_content)
 
 
+def list_known_categories() -> List[str]:
+    """Categorías configuradas más las que existen en docs/."""
+    categories = set(category_catalog.names())
+    categories.update(normalize_category(d) for d in docs_inventory.categories())
+    return sorted(categories)
+
+
+def check_prompt_template(template: str) -> List[str]:
+    """Valida una plantilla de prompt; retorna los placeholders faltantes."""
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    return sorted({"context", "question"} - fields)
+
+
+async def warm_up():
+    """
+    Fase de calentamiento en segundo plano; /ready responde 200 al terminar.
+    
+    Un error en un paso se registra en warmup_state["errors"] y no detiene el
+    resto. Siempre termina en un estado final: "ready", o "degraded" si el
+    warm-up se interrumpió por un error inesperado (las categorías que falten
+    se cargan en la primera consulta).
+    """
+    started = time.monotonic()
+    warmup_state.update(status="warming", started_at=datetime.utcnow().isoformat())
+    steps, errors = warmup_state["steps"], warmup_state["errors"]
+    print("🔥 Iniciando warm-up...")
+    
+    try:
+        await run_warm_up_steps(steps, errors)
+        status = "ready"
+    except Exception as e:
+        errors["warmup"] = str(e)
+        status = "degraded"
+    
+    duration = round(time.monotonic() - started, 2)
+    warmup_state.update(status=status, finished_at=datetime.utcnow().isoformat(), duration_seconds=duration)
+    print(f"{'✅' if status == 'ready' else '⚠️'} Warm-up {status} en {duration}s "
+          f"({len(steps.get('vectorstores', []))} categorías, {len(steps.get('videos', []))} videos, "
+          f"{len(errors)} errores)")
+
+
+async def run_warm_up_steps(steps: Dict, errors: Dict):
+    """Pasos del warm-up: MongoDB, JWKS, prompts, vectorstores y videos."""
+    # Pool de MongoDB
+    if mongo:
+        try:
+            steps["mongodb"] = await asyncio.to_thread(mongo.warm_up)
+        except Exception as e:
+            errors["mongodb"] = str(e)
+    
+    # Claves JWKS de Clerk
+    try:
+        steps["jwks"] = await asyncio.to_thread(warm_jwks_cache)
+    except Exception as e:
+        errors["jwks"] = str(e)
+    
+    categories = list_known_categories()
+    
+    # Prompts: cargar y validar plantillas de cada categoría
+    steps["prompts"] = 0
+    for category in categories:
+        try:
+            templates = get_prompts_for_category(category)
+        except Exception as e:
+            errors[f"prompt:{category}"] = str(e)
+            continue
+        for name, template in zip(("html", "plain"), templates):
+            try:
+                missing = check_prompt_template(template)
+                if missing:
+                    errors[f"prompt:{category}:{name}"] = f"Missing placeholders: {missing}"
+                steps["prompts"] += 1
+            except Exception as e:
+                errors[f"prompt:{category}:{name}"] = str(e)
+    
+    # Vectorstores de categorías (e índices derivados)
+    steps["vectorstores"] = []
+    for category in categories:
+        if not docs_inventory.exists(category):
+            continue
+        try:
+            await asyncio.to_thread(get_or_create_vectorstore, category)
+            if HYBRID_SEARCH:
+                await asyncio.to_thread(get_or_create_lexical_index, category)
+            if get_retrieval_settings(category)["two_stage"] is not False:
+                await asyncio.to_thread(get_or_create_document_index, category)
+            steps["vectorstores"].append(category)
+        except Exception as e:
+            errors[f"vectorstore:{category}"] = getattr(e, "detail", str(e))
+    
+    # Colecciones de videos: solo se abren las ya indexadas. Las transcripciones
+    # sin indexar no se embeben aquí (sería trabajo lento o pagado que retrasa
+    # /ready): se indexan en la primera consulta del video o con un trabajo
+    # de la cola
+    steps["videos"] = []
+    steps["videos_unindexed"] = []
+    if WARMUP_VIDEOS:
+        for category in videos_inventory.categories():
+            try:
+                indexed, unindexed = await asyncio.to_thread(warm_up_video_collection, category)
+                steps["videos"].extend(indexed)
+                steps["videos_unindexed"].extend(unindexed)
+            except Exception as e:
+                errors[f"video:{category}"] = getattr(e, "detail", str(e))
+
+
+def warm_up_video_collection(category: str) -> tuple:
+    """
+    Abre la colección de videos de una categoría sin indexar nada.
+    
+    Returns:
+        (videos indexados, videos sin indexar) como "categoria/video_id"
+    """
+    category = normalize_category(category)
+    cache_key = video_collection_name(category)
+    vectorstore = vectorstore_cache.get(cache_key) or open_collection(cache_key)
+    
+    indexed, unindexed = [], []
+    for video_id in get_video_mapping(category):
+        if vectorstore._collection.get(where={"video_id": video_id.lower()}, limit=1)["ids"]:
+            indexed.append(f"{category}/{video_id}")
+        else:
+            unindexed.append(f"{category}/{video_id}")
+    if indexed:
+        vectorstore_cache[cache_key] = vectorstore
+    return indexed, unindexed
+
+
+def changed_category_files(category: str, paths: List[str]) -> List[str]:
+    """
+    Archivos de la categoría que difieren de la colección activa.
+    
+    Con manifiesto se descartan los que ya están indexados con el mismo
+    contenido (p. ej. subidos por la API) y los eliminados que nunca se
+    indexaron; sin manifiesto se consideran todos.
+    
+    Las eliminaciones no cuentan si la colección se importó de un bundle (el
+    nodo no tiene los PDFs fuente) ni si docs/{categoria} quedó vacío o no
+    existe: borrarían todos los chunks y dejarían la categoría sin índice.
+    Para vaciar una categoría a propósito se usa la re-indexación completa.
+    """
+    manifest = index_registry.read_manifest(index_registry.get_active(category))
+    if not manifest:
+        return paths
+    
+    indexed = manifest["source_files"]
+    count_deletions = not manifest.get("imported_from") and bool(glob.glob(os.path.join(f"docs/{category}", "*.pdf")))
+    changed = []
+    for path in paths:
+        if not os.path.exists(path):
+            if path in indexed and count_deletions:
+                changed.append(path)
+        elif path.endswith(".pdf") and indexed.get(path) != hash_file(path):
+            changed.append(path)
+    return changed
+
+
+async def on_docs_changed(category: str, paths: List[str]):
+    """Handler del watcher de docs/: encola una indexación incremental con los archivos cambiados."""
+    category = normalize_category(category)
+    files = await asyncio.to_thread(changed_category_files, category, paths)
+    if files:
+        job_queue.enqueue(category, "incremental", files)
+    else:
+        print(f"👀 Archivos de '{category}' sin cambios respecto al índice activo")
+
+
+async def on_videos_changed(category: str, paths: List[str]):
+    """Handler del watcher de videos/: encola la re-indexación de las transcripciones."""
+    job_queue.enqueue(normalize_category(category), JOB_TYPE_VIDEO, paths)
+
+
+async def start_file_watchers():
+    """
+    Arranca los watchers de docs/ y videos/ en un único worker.
+    
+    Al arrancar también se agendan los PDFs agregados o eliminados mientras
+    la API estaba detenida (según el manifiesto de cada categoría).
+    """
+    global watcher_lock
+    watcher_lock = acquire_leader_lock(os.path.join(PERSIST_DIRECTORY, "watcher.lock"))
+    if watcher_lock is None:
+        print("👀 Otro worker ya vigila docs/ y videos/")
+        return
+    
+    for inventory, handler in ((docs_inventory, on_docs_changed), (videos_inventory, on_videos_changed)):
+        watcher = InventoryWatcher(inventory, handler, interval=FS_WATCHER_INTERVAL, debounce=FS_WATCHER_DEBOUNCE_SECONDS)
+        await watcher.start()
+        file_watchers.append(watcher)
+    
+    for category in docs_inventory.categories():
+        manifest = index_registry.read_manifest(index_registry.get_active(normalize_category(category)))
+        if not manifest:
+            continue
+        on_disk = {f["path"] for f in docs_inventory.files(category)}
+        missing = sorted(on_disk ^ set(manifest["source_files"]))
+        if missing:
+            print(f"👀 {len(missing)} archivos de '{category}' cambiaron con la API detenida")
+            await on_docs_changed(category, missing)
+    
+    print(f"👀 Watcher de archivos activo (cada {FS_WATCHER_INTERVAL:g}s, debounce {FS_WATCHER_DEBOUNCE_SECONDS:g}s)")
+
+
 @app.on_event("startup")
 async def startup():
     """Inicialización al arrancar."""
-    global mongo
+    global mongo, job_queue, category_catalog, warmup_task
     try:
         mongo = get_mongo_manager()
         print("✅ Sistema iniciado con MongoDB")
     except Exception as e:
         print(f"❌ Error al inicializar MongoDB: {e}")
         print("⚠️ El sistema funcionará en modo limitado")
+    
+    if CATEGORY_CATALOG_BACKEND == "mongo":
+        if mongo:
+            category_catalog = CategoryCatalog(CATEGORIES_CONFIG_FILE, store=mongo)
+            print("📚 Catálogo de categorías respaldado en MongoDB")
+        else:
+            print("⚠️ CATEGORY_CATALOG_BACKEND=mongo sin MongoDB, se usa categories_config.json")
+    
+    # Cola de indexación: persiste en MongoDB o, si no está disponible, en disco
+    job_queue = IndexJobQueue(handler=run_index_job, store=mongo or LocalJobStore())
+    await job_queue.start()
+    
+    # Bus de invalidación: se crea después de MongoDB para usarlo si está disponible
+    await get_invalidation_bus().start()
+    
+    if FS_WATCHER:
+        await start_file_watchers()
+    
+    # Warm-up en segundo plano; mientras tanto /ready responde 503
+    if WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        warmup_state["status"] = "ready"
 
 
 @app.get("/my-history")
@@ -2122,13 +3568,7 @@ async def ask_in_conversation(
             raise HTTPException(status_code=400, detail="Invalid format")
         
         # Obtener vectorstore y buscar documentos relevantes
-        vectorstore = get_or_create_vectorstore(category)
-        retriever = vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 2, "fetch_k": 10}
-        )
-        
-        relevant_docs = retriever.invoke(question)
+        relevant_docs = retrieve_category_documents(category, question)
         context = "\n\n".join([doc.page_content for doc in relevant_docs])
         
         # Extraer fuentes
@@ -2161,7 +3601,7 @@ async def ask_in_conversation(
             # ⭐ CLAVE: Combinar contexto conversacional + documentos
             full_context = f"{conversation_context}\n\nINFORMACIÓN DE DOCUMENTOS:\n{context}"
             prompt = html_prompt_template.format(context=full_context, question=question)
-            answer = llm.invoke(prompt).content
+            answer = await generate_answer(prompt, category)
             result["answer"] = answer
             result["sources"] = f"<ul>{sources_html}</ul>"
             
@@ -2178,7 +3618,7 @@ async def ask_in_conversation(
         if format_type in ["plain", "both"]:
             full_context = f"{conversation_context}\n\nINFORMACIÓN DE DOCUMENTOS:\n{context}"
             prompt = plain_prompt_template.format(context=full_context, question=question)
-            answer_plain = llm.invoke(prompt).content
+            answer_plain = await generate_answer(prompt, category)
             result["answer_plain"] = answer_plain
             result["sources_plain"] = sources_plain
             
@@ -2234,8 +3674,16 @@ async def create_new_conversation(
 
 
 @app.on_event("shutdown")
-def cleanup():
+async def cleanup():
     """Limpieza al cerrar."""
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if job_queue:
+        await job_queue.stop()
+    if invalidation_bus:
+        await invalidation_bus.stop()
+    for watcher in file_watchers:
+        await watcher.stop()
     vectorstore_cache.clear()
     close_mongo_connection()
     print("👋 Sistema cerrado correctamente")
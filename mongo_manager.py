@@ -4,11 +4,12 @@ Gestiona caché, historial conversacional y configuración de categorías
 """
 
 import os
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import hashlib
+import time
 import json
 from bson import ObjectId
 
@@ -41,7 +42,8 @@ class MongoManager:
                 self.mongo_uri,
                 serverSelectionTimeoutMS=5000,
                 connectTimeoutMS=10000,
-                socketTimeoutMS=10000
+                socketTimeoutMS=10000,
+                minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
             )
             # Verificar conexión
             self.client.admin.command('ping')
@@ -74,6 +76,22 @@ class MongoManager:
             self.metrics_collection.create_index([("timestamp", DESCENDING)])
             self.metrics_collection.create_index([("type", ASCENDING)])
             
+            # Colección de trabajos de indexación en segundo plano
+            self.index_jobs_collection = self.db["index_jobs"]
+            self.index_jobs_collection.create_index([("job_id", ASCENDING)], unique=True)
+            self.index_jobs_collection.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+            # Un solo trabajo encolado y uno solo en ejecución por categoría (ver job_queue.job_key)
+            for key in ("queue_key", "run_key"):
+                self.index_jobs_collection.create_index(
+                    [(key, ASCENDING)],
+                    unique=True,
+                    partialFilterExpression={key: {"$type": "string"}}
+                )
+            
+            # Colección de generaciones del bus de invalidación (un documento por categoría)
+            self.generations_collection = self.db["generations"]
+            self.generations_collection.create_index([("category", ASCENDING)], unique=True)
+            
             print("✅ Colecciones e índices configurados correctamente")
         except Exception as e:
             print(f"⚠️ Error al configurar colecciones: {e}")
@@ -352,26 +370,27 @@ class MongoManager:
         Args:
             name: Nombre de la categoría
             config: Configuración de la categoría
+            
+        Raises:
+            Exception: Si MongoDB no confirma la escritura (el catálogo en
+                memoria no se actualiza y el endpoint responde con error)
         """
-        try:
-            # Preparar datos para guardar
-            data_to_save = {**config}
-            data_to_save["name"] = name
-            data_to_save["updated_at"] = datetime.utcnow()
-            
-            # Si no tiene created_at, agregarlo
-            if "created_at" not in data_to_save:
-                data_to_save["created_at"] = datetime.utcnow()
-            
-            # Usar replace_one para evitar conflictos con $setOnInsert
-            self.categories_collection.replace_one(
-                {"name": name},
-                data_to_save,
-                upsert=True
-            )
-            print(f"💾 Configuración de categoría '{name}' guardada")
-        except Exception as e:
-            print(f"⚠️ Error al guardar categoría: {e}")
+        # Preparar datos para guardar
+        data_to_save = {**config}
+        data_to_save["name"] = name
+        data_to_save["updated_at"] = datetime.utcnow()
+        
+        # Si no tiene created_at, agregarlo
+        if "created_at" not in data_to_save:
+            data_to_save["created_at"] = datetime.utcnow()
+        
+        # Usar replace_one para evitar conflictos con $setOnInsert
+        self.categories_collection.replace_one(
+            {"name": name},
+            data_to_save,
+            upsert=True
+        )
+        print(f"💾 Configuración de categoría '{name}' guardada")
     
     def get_category_config(self, name: str) -> Optional[Dict]:
         """
@@ -403,14 +422,227 @@ class MongoManager:
             name: Nombre de la categoría
             
         Returns:
-            True si se eliminó, False en caso contrario
+            True si se eliminó, False si no existía
+            
+        Raises:
+            Exception: Si MongoDB no confirma la eliminación
+        """
+        result = self.categories_collection.delete_one({"name": name})
+        return result.deleted_count > 0
+    
+    # ==================== TRABAJOS DE INDEXACIÓN ====================
+    
+    def enqueue_index_job(self, job: Dict) -> Tuple[Dict, bool]:
+        """
+        Encola un trabajo o lo combina con el que ya está en cola para su categoría.
+
+        El índice único sobre queue_key garantiza un solo trabajo encolado por
+        categoría aunque varios workers encolen a la vez: si la inserción
+        choca, se combina con el trabajo existente.
+
+        Args:
+            job: Trabajo nuevo (incluye job_id y queue_key)
+
+        Returns:
+            (job, created) donde created indica si se insertó el trabajo nuevo
+
+        Raises:
+            Exception: Si MongoDB no confirma la operación
+        """
+        queued = {"queue_key": job["queue_key"], "status": "queued"}
+        while True:
+            if job["job_type"] == "reindex":
+                # Una re-indexación completa absorbe a las incrementales
+                merged = self.index_jobs_collection.find_one_and_update(
+                    queued,
+                    {"$set": {"job_type": "reindex", "files": []}},
+                    projection={"_id": 0},
+                    return_document=ReturnDocument.AFTER
+                )
+            else:
+                merged = self.index_jobs_collection.find_one_and_update(
+                    {**queued, "job_type": {"$ne": "reindex"}},
+                    {"$addToSet": {"files": {"$each": job["files"]}}},
+                    projection={"_id": 0},
+                    return_document=ReturnDocument.AFTER
+                ) or self.index_jobs_collection.find_one(queued, {"_id": 0})
+            if merged:
+                return merged, False
+            try:
+                self.index_jobs_collection.insert_one(dict(job))
+                return dict(job), True
+            except DuplicateKeyError:
+                # Otro worker encoló la misma categoría entre ambas operaciones
+                continue
+
+    def save_index_job(self, job_id: str, owner: str, fields: Dict) -> bool:
+        """
+        Actualiza campos de un trabajo de indexación que pertenece a owner.
+
+        Solo se escriben los campos indicados y solo si owner sigue siendo el
+        dueño del trabajo, para no pisar el lease que reclamó otro worker.
+
+        Args:
+            job_id: ID del trabajo
+            owner: Worker que actualiza el trabajo
+            fields: Campos a actualizar
+
+        Returns:
+            True si se actualizó, False si el trabajo ya no pertenece a owner
+
+        Raises:
+            Exception: Si MongoDB no confirma la escritura
+        """
+        result = self.index_jobs_collection.update_one(
+            {"job_id": job_id, "owner": owner},
+            {"$set": fields}
+        )
+        return result.matched_count == 1
+
+    def start_index_job(self, job_id: str, owner: str, run_key: str, fields: Dict) -> Optional[Dict]:
+        """
+        Pasa de forma atómica un trabajo encolado a "running".
+
+        El índice único sobre run_key impide que dos trabajos de la misma
+        categoría se ejecuten a la vez en workers distintos.
+
+        Args:
+            job_id: ID del trabajo
+            owner: Worker que lo ejecuta (debe ser su dueño)
+            run_key: Clave de exclusión de la categoría
+            fields: Campos adicionales a actualizar
+
+        Returns:
+            Dict con el trabajo actualizado, o None si no pertenece a owner,
+            ya no está en cola u otro trabajo de la categoría se está ejecutando
+
+        Raises:
+            Exception: Si MongoDB no confirma la escritura
         """
         try:
-            result = self.categories_collection.delete_one({"name": name})
-            return result.deleted_count > 0
+            return self.index_jobs_collection.find_one_and_update(
+                {"job_id": job_id, "owner": owner, "status": "queued"},
+                {"$set": {**fields, "status": "running", "queue_key": None, "run_key": run_key}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+    
+    def get_index_job(self, job_id: str) -> Optional[Dict]:
+        """
+        Obtiene un trabajo de indexación por su ID.
+        
+        Args:
+            job_id: ID del trabajo
+            
+        Returns:
+            Dict con el estado del trabajo o None si no existe
+        """
+        try:
+            return self.index_jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
         except Exception as e:
-            print(f"⚠️ Error al eliminar categoría: {e}")
-            return False
+            print(f"⚠️ Error al obtener trabajo de indexación: {e}")
+            return None
+    
+    def list_index_jobs(self, limit: int = 50, statuses: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Lista los trabajos de indexación más recientes.
+        
+        Args:
+            limit: Número máximo de trabajos
+            statuses: Si se especifica, filtra por estado (queued, running, ...)
+            
+        Returns:
+            Lista de trabajos ordenados del más reciente al más antiguo
+        """
+        try:
+            query = {"status": {"$in": statuses}} if statuses else {}
+            return list(self.index_jobs_collection.find(
+                query,
+                {"_id": 0}
+            ).sort("created_at", DESCENDING).limit(limit))
+        except Exception as e:
+            print(f"⚠️ Error al listar trabajos de indexación: {e}")
+            return []
+
+    def claim_index_job(self, job_id: str, owner: str, lease_until: float, now: float) -> Optional[Dict]:
+        """
+        Reclama (o renueva) de forma atómica el lease de un trabajo activo.
+
+        Solo lo consigue el dueño actual o cualquier worker si el lease venció
+        (o el trabajo no tiene lease), así que dos workers nunca retoman el
+        mismo trabajo.
+
+        Args:
+            job_id: ID del trabajo
+            owner: Identificador del worker que reclama
+            lease_until: Nuevo vencimiento del lease (epoch en segundos)
+            now: Instante actual (epoch en segundos)
+
+        Returns:
+            Dict con el trabajo reclamado o None si lo tiene otro worker
+        """
+        try:
+            return self.index_jobs_collection.find_one_and_update(
+                {
+                    "job_id": job_id,
+                    "status": {"$in": ["queued", "running"]},
+                    "$or": [
+                        {"owner": owner},
+                        {"lease_expires_at": None},
+                        {"lease_expires_at": {"$lt": now}}
+                    ]
+                },
+                {"$set": {"owner": owner, "lease_expires_at": lease_until}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            print(f"⚠️ Error al reclamar trabajo de indexación: {e}")
+            return None
+
+    # ==================== BUS DE INVALIDACIÓN ====================
+    
+    def bump_generation(self, category: str, scope: str, origin: str) -> Optional[Dict]:
+        """
+        Incrementa la generación de un ámbito de una categoría.
+        
+        Args:
+            category: Categoría modificada
+            scope: Ámbito del cambio (index, prompts, config)
+            origin: Proceso que publica (nodo:pid)
+            
+        Returns:
+            Documento de generaciones de la categoría actualizado
+        """
+        try:
+            return self.generations_collection.find_one_and_update(
+                {"category": category},
+                {
+                    "$inc": {f"{scope}.generation": 1},
+                    "$set": {f"{scope}.published_at": time.time(), f"{scope}.origin": origin}
+                },
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            print(f"⚠️ Error al publicar generación: {e}")
+            return None
+    
+    def list_generations(self) -> List[Dict]:
+        """
+        Lista las generaciones de todas las categorías.
+        
+        Returns:
+            Lista de documentos {category, index, prompts, config}
+        """
+        try:
+            return list(self.generations_collection.find({}, {"_id": 0}))
+        except Exception as e:
+            print(f"⚠️ Error al listar generaciones: {e}")
+            return []
     
     # ==================== MÉTRICAS Y LOGGING ====================
     
@@ -493,6 +725,28 @@ class MongoManager:
                 "timestamp": datetime.utcnow().isoformat()
             }
     
+    def warm_up(self, connections: int = 4) -> Dict:
+        """
+        Abre conexiones del pool antes de recibir tráfico.
+        
+        Args:
+            connections: Número de pings concurrentes (conexiones a abrir)
+            
+        Returns:
+            Dict con el número de conexiones verificadas
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def ping(_):
+            self.client.admin.command('ping')
+            self.cache_collection.find_one({}, {"_id": 1})
+            return True
+        
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            results = list(executor.map(ping, range(connections)))
+        
+        return {"connections": sum(results)}
+    
     def close(self):
         """Cierra la conexión con MongoDB."""
         if self.client:
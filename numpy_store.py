@@ -0,0 +1,440 @@
+"""
+Backend de búsqueda exacta con NumPy
+Para categorías pequeñas y medianas (unos miles de chunks) una matriz float32
+en memoria es suficiente: top-k y MMR se resuelven con productos punto
+vectorizados, sin pasar por SQLite ni HNSW.
+
+Los embeddings se exportan desde la colección Chroma activa a
+chroma_db/numpy/{coleccion}/ (matriz normalizada embeddings.f32, tablas de
+ids, textos y metadata, y el archivo fuente de cada chunk como código int32).
+Todo se abre con np.memmap y en solo lectura: la carga es casi instantánea y
+con varios workers de uvicorn el page cache del sistema operativo comparte
+una única copia entre procesos.
+
+Opcionalmente se guarda además una copia cuantizada de la matriz (float16 o
+int8 con escala por vector). La primera pasada puntúa sobre la copia
+cuantizada (2-4x menos memoria residente) y la lista corta se reordena con los
+vectores float32, que solo se leen de disco para esas filas.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from index_publish import delete_directory, open_published, publish_directory, resolve_directory
+from mmr import maximal_marginal_relevance
+from string_table import StringTable
+
+MATRIX_FILENAME = "embeddings.f32"
+STORE_FILENAME = "store.json"
+SCALES_FILENAME = "scales.f32"
+SOURCES_FILENAME = "sources.i32"
+IDS_TABLE = "ids"
+TEXTS_TABLE = "texts"
+METADATAS_TABLE = "metadatas"
+EXPORT_PAGE_SIZE = 1000
+
+# Formatos cuantizados: archivo y dtype de la copia que se recorre en la primera pasada
+QUANTIZATION_FORMATS = {
+    "float16": ("embeddings.f16", np.float16),
+    "int8": ("embeddings.i8", np.int8)
+}
+
+# Candidatos de la primera pasada = k * multiplicador (se reordenan en float32)
+QUANTIZATION_RESCORE_MULTIPLIER = int(os.getenv("QUANTIZATION_RESCORE_MULTIPLIER", "4"))
+QUANTIZATION_MIN_CANDIDATES = 50
+SCORE_BLOCK_ROWS = 1024
+
+# Evita que dos hilos exporten la misma colección a la vez
+_build_lock = threading.Lock()
+
+
+def collection_fingerprint(collection) -> str:
+    """
+    Versión derivada del contenido de una colección (ids, textos y metadata).
+
+    Para colecciones sin manifiesto: el conteo no sirve como versión, porque
+    una actualización que reemplaza tantos chunks como quita lo deja igual y
+    se seguiría sirviendo una exportación vieja. Recorre la colección entera
+    (sin embeddings).
+    """
+    digest = hashlib.sha256()
+    count = collection.count()
+    for offset in range(0, count, EXPORT_PAGE_SIZE):
+        page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["documents", "metadatas"])
+        for chunk in zip(page["ids"], page["documents"], page["metadatas"]):
+            digest.update(json.dumps(chunk, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return f"content-{count}-{digest.hexdigest()}"
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Cuantiza vectores normalizados.
+
+    Args:
+        vectors: Matriz float32 (n x dim)
+        quantization: "float16" o "int8"
+
+    Returns:
+        (códigos, escala por vector o None). En int8, vector ≈ códigos * escala.
+    """
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Cuantización no soportada: {quantization}")
+
+
+def _open_matrix(path: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class NumpyVectorStore(VectorStore):
+    """Vectorstore de solo lectura sobre archivos memory-mapped (matriz y tablas de chunks)."""
+
+    def __init__(self, directory: str, embedding: Embeddings,
+                 rescore_multiplier: int = QUANTIZATION_RESCORE_MULTIPLIER):
+        """
+        Args:
+            directory: Directorio de la exportación (store.json, embeddings.f32, tablas)
+            embedding: Cliente de embeddings para las consultas
+            rescore_multiplier: Candidatos cuantizados por resultado que se
+                reordenan en float32 (0 = sin reordenar)
+        """
+        self.directory = directory
+        self._embedding = embedding
+        self.rescore_multiplier = rescore_multiplier
+        directory = resolve_directory(directory)
+
+        with open(os.path.join(directory, STORE_FILENAME), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+
+        self.collection_name = header["collection"]
+        self.version = header["version"]
+        self.dimension = header["dimension"]
+        self.quantization: str = header.get("quantization", "none")
+        self.sources: List[str] = header["sources"]
+        self._source_codes = {source: code for code, source in enumerate(self.sources)}
+
+        self.ids = StringTable(os.path.join(directory, IDS_TABLE))
+        self.texts = StringTable(os.path.join(directory, TEXTS_TABLE))
+        self.metadatas = StringTable(os.path.join(directory, METADATAS_TABLE))
+
+        self._codes = None
+        self._scales = None
+        count = len(self.ids)
+        if count:
+            shape = (count, self.dimension)
+            self._matrix = _open_matrix(os.path.join(directory, MATRIX_FILENAME), np.float32, shape)
+            self._chunk_sources = _open_matrix(os.path.join(directory, SOURCES_FILENAME), np.int32, (count,))
+            if self.quantization in QUANTIZATION_FORMATS:
+                filename, dtype = QUANTIZATION_FORMATS[self.quantization]
+                self._codes = _open_matrix(os.path.join(directory, filename), dtype, shape)
+                if self.quantization == "int8":
+                    self._scales = _open_matrix(os.path.join(directory, SCALES_FILENAME), np.float32, (count,))
+        else:
+            self._matrix = np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self._chunk_sources = np.zeros(0, dtype=np.int32)
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    @classmethod
+    def build(cls, collection, directory: str, version: str, quantization: str = "none") -> None:
+        """
+        Exporta una colección Chroma a una matriz normalizada en disco.
+
+        Se escribe en un directorio temporal y se publica de forma atómica
+        (index_publish), así los lectores nunca ven una exportación a medias
+        ni ausente.
+
+        Args:
+            quantization: "none", "float16" o "int8" (copia adicional para la
+                primera pasada; la matriz float32 se conserva para reordenar)
+        """
+        if quantization != "none" and quantization not in QUANTIZATION_FORMATS:
+            raise ValueError(f"Cuantización no soportada: {quantization}")
+
+        count = collection.count()
+        tmp_directory = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_directory)
+
+        try:
+            ids, texts, metadatas = [], [], []
+            matrix = codes = None
+            scales = []
+            dimension = None
+
+            for offset in range(0, count, EXPORT_PAGE_SIZE):
+                page = collection.get(
+                    limit=EXPORT_PAGE_SIZE, offset=offset,
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                if matrix is None:
+                    dimension = vectors.shape[1]
+                    matrix = np.memmap(
+                        os.path.join(tmp_directory, MATRIX_FILENAME),
+                        dtype=np.float32, mode="w+", shape=(count, dimension)
+                    )
+                    if quantization in QUANTIZATION_FORMATS:
+                        filename, dtype = QUANTIZATION_FORMATS[quantization]
+                        codes = np.memmap(
+                            os.path.join(tmp_directory, filename),
+                            dtype=dtype, mode="w+", shape=(count, dimension)
+                        )
+
+                # Filas normalizadas: producto punto = similitud coseno
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                vectors = vectors / norms
+                matrix[len(ids):len(ids) + len(vectors)] = vectors
+
+                if codes is not None:
+                    page_codes, page_scales = quantize(vectors, quantization)
+                    codes[len(ids):len(ids) + len(vectors)] = page_codes
+                    if page_scales is not None:
+                        scales.append(page_scales)
+
+                ids.extend(page["ids"])
+                texts.extend(page["documents"])
+                metadatas.extend(metadata or {} for metadata in (page["metadatas"] or [None] * len(page["ids"])))
+
+            if matrix is not None:
+                matrix.flush()
+                del matrix
+            if codes is not None:
+                codes.flush()
+                del codes
+            if scales:
+                np.concatenate(scales).tofile(os.path.join(tmp_directory, SCALES_FILENAME))
+
+            # Tablas de chunks memory-mapped y archivo fuente de cada chunk como código
+            StringTable.write(os.path.join(tmp_directory, IDS_TABLE), ids, lookup=True)
+            StringTable.write(os.path.join(tmp_directory, TEXTS_TABLE), texts)
+            StringTable.write(
+                os.path.join(tmp_directory, METADATAS_TABLE),
+                (json.dumps(metadata, ensure_ascii=False) for metadata in metadatas)
+            )
+            sources = sorted({metadata.get("source") for metadata in metadatas if metadata.get("source") is not None})
+            source_codes = {source: code for code, source in enumerate(sources)}
+            np.asarray(
+                [source_codes.get(metadata.get("source"), -1) for metadata in metadatas], dtype=np.int32
+            ).tofile(os.path.join(tmp_directory, SOURCES_FILENAME))
+
+            with open(os.path.join(tmp_directory, STORE_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "collection": collection.name,
+                    "version": version,
+                    "dimension": dimension,
+                    "quantization": quantization,
+                    "count": len(ids),
+                    "sources": sources
+                }, f, ensure_ascii=False)
+
+            # Los procesos que tengan mapeada la exportación anterior la siguen
+            # leyendo hasta recargar (los archivos borrados siguen mapeados)
+            publish_directory(tmp_directory, directory)
+        except Exception:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            raise
+
+        suffix = f", {quantization}" if quantization != "none" else ""
+        print(f"🧮 Colección '{collection.name}' exportada a matriz NumPy ({count} chunks{suffix})")
+
+    @classmethod
+    def load_or_build(cls, collection, directory: str, version: str, embedding: Embeddings,
+                      quantization: str = "none") -> "NumpyVectorStore":
+        """Abre la exportación de la colección, regenerándola si está desactualizada o cambió la cuantización."""
+        with _build_lock:
+            store = open_published(lambda path: cls(path, embedding), directory)
+            if store and store.version == version and store.quantization == quantization:
+                return store
+
+            cls.build(collection, directory, version, quantization)
+            return cls(directory, embedding)
+
+    @staticmethod
+    def delete(directory: str):
+        """Elimina la exportación de una colección."""
+        delete_directory(directory)
+
+    # Solo lectura: VectorStore exige estos métodos, pero la única forma de
+    # construir el store es load_or_build y las escrituras van a Chroma
+    # (open_collection), nunca al vectorstore que sirve las consultas
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise TypeError("NumpyVectorStore is read-only: build it from a Chroma collection with load_or_build")
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise TypeError("NumpyVectorStore is read-only: index into Chroma and export again")
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        raise TypeError("NumpyVectorStore is read-only: delete from Chroma and export again")
+
+    # ==================== PROPIEDADES ====================
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def matrix_nbytes(self) -> int:
+        """
+        Matriz que se recorre en cada consulta.
+
+        Con cuantización la matriz float32 solo se lee para la lista corta,
+        así que no cuenta como residente.
+        """
+        if self._codes is not None:
+            return int(self._codes.nbytes + (self._scales.nbytes if self._scales is not None else 0))
+        return int(self._matrix.nbytes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada (páginas mapeadas, compartidas entre procesos): matriz + tablas."""
+        return self.matrix_nbytes + self.ids.nbytes + self.texts.nbytes + self.metadatas.nbytes
+
+    # ==================== BÚSQUEDA ====================
+
+    def _filter_mask(self, filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Máscara de chunks que cumplen un filtro sobre metadata (igualdad, $eq o $in).
+
+        El filtro por "source" (el de la recuperación en dos etapas) se
+        resuelve sobre los códigos int32; el resto decodifica la metadata.
+        """
+        if not filter:
+            return None
+
+        # Cada condición se reduce a un conjunto de valores aceptados
+        conditions = {}
+        for key, value in filter.items():
+            if isinstance(value, dict):
+                conditions[key] = set(value["$in"]) if "$in" in value else {value["$eq"]}
+            else:
+                conditions[key] = {value}
+
+        mask = np.ones(self.count(), dtype=bool)
+        if "source" in conditions:
+            codes = [self._source_codes[source] for source in conditions.pop("source") if source in self._source_codes]
+            mask &= np.isin(self._chunk_sources, codes)
+
+        if conditions:
+            for i in np.flatnonzero(mask):
+                metadata = json.loads(self.metadatas[i])
+                mask[i] = all(metadata.get(key) in accepted for key, accepted in conditions.items())
+        return mask
+
+    def _top_k(self, vector: List[float], k: int, filter: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices y similitudes coseno de los k chunks más cercanos (orden descendente)."""
+        if not self.count():
+            return np.array([], dtype=int), np.array([], dtype=np.float32)
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rescore = self._codes is not None and self.rescore_multiplier > 0
+        scores = self._quantized_scores(query) if self._codes is not None else self._matrix @ query
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        available = len(scores) if mask is None else int(mask.sum())
+        k = min(k, available)
+        if k <= 0:
+            return np.array([], dtype=int), np.array([], dtype=np.float32)
+
+        # Primera pasada (cuantizada): lista corta más amplia que k
+        shortlist = min(max(k * self.rescore_multiplier, QUANTIZATION_MIN_CANDIDATES), available) if rescore else k
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+
+        # Reordenamiento con precisión completa (solo se leen esas filas)
+        if rescore:
+            top = np.sort(top)
+            exact = self._matrix[top] @ query
+            order = np.argsort(-exact)[:k]
+            return top[order], exact[order]
+
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def _quantized_scores(self, query: np.ndarray) -> np.ndarray:
+        """Similitudes aproximadas sobre la copia cuantizada (por bloques, sin copiar la matriz entera a float32)."""
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self._codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + SCORE_BLOCK_ROWS] = block @ query
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        positions = (self.ids.index_of(chunk_id) for chunk_id in ids)
+        return [self._document(position) for position in positions if position is not None]
+
+    def _document(self, index: int) -> Document:
+        index = int(index)
+        return Document(id=self.ids[index], page_content=self.texts[index], metadata=json.loads(self.metadatas[index]))
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        indices, scores = self._top_k(embedding, k, filter)
+        return [(self._document(i), float(score)) for i, score in zip(indices, scores)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def _select_relevance_score_fn(self):
+        # Similitud coseno [-1, 1] -> relevancia [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                                           fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                           filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """MMR vectorizado sobre los fetch_k más cercanos; devuelve (documento, puntuación MMR)."""
+        candidates, _ = self._top_k(embedding, fetch_k, filter)
+        if not len(candidates):
+            return []
+
+        selected, scores = maximal_marginal_relevance(embedding, self._matrix[candidates], k, lambda_mult)
+        return [(self._document(candidates[i]), float(score)) for i, score in zip(selected, scores)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, filter: Optional[Dict] = None,
+                                                **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.max_marginal_relevance_search_with_score_by_vector(
+            embedding, k, fetch_k, lambda_mult, filter
+        )]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, filter: Optional[Dict] = None,
+                                      **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
@@ -1,145 +1,442 @@
 """
-Script para re-indexar todos los documentos en Chroma con nombres de colección correctos
+Re-indexación de documentos (CLI)
+Descubre todas las categorías de docs/ y las indexa en paralelo con la misma
+lógica que la API: colecciones versionadas (blue-green), registro de
+contenido y caché de embeddings. La colección activa sigue sirviendo
+consultas hasta que la nueva se verifica y se activa; ya no se borra
+chroma_db.
+
+Modos:
+    (por defecto)    Re-indexación completa de cada categoría. El avance se
+                     guarda por archivo en chroma_db/reindex_checkpoint.json:
+                     si la ejecución se interrumpe, la siguiente retoma la
+                     misma colección desde el último archivo terminado.
+    --changed-only   Solo se embeben los archivos agregados o modificados
+                     (sha256) respecto al manifiesto de la colección activa;
+                     los demás chunks se copian de ella con sus embeddings.
+                     Igual que la completa, construye una colección nueva que
+                     se verifica y se activa (nunca modifica la activa) y usa
+                     el mismo checkpoint, así que una ejecución interrumpida
+                     se retoma.
+    --dry-run        Muestra las diferencias con el índice activo sin escribir.
+
+Los conteos del resumen salen de la colección (count) y de su manifiesto,
+sin consultas ni llamadas de embeddings.
+
+Uso (con la API detenida o sin trabajos de indexación en curso):
+    python reindex_documents.py
+    python reindex_documents.py --changed-only --workers 4
+    python reindex_documents.py --dry-run
+    python reindex_documents.py --categories geomecanica compliance
 """
+
+import argparse
+import json
 import os
-import shutil
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
-
-# Configuración
-embeddings = OpenAIEmbeddings(model="text-embedding-ada-002")
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1500,
-    chunk_overlap=150,
-    length_function=len
-)
-
-# Directorios de documentos
-DOCS_CONFIG = {
-    "geomecanica": "docs/geomecanica",
-    "compliance": "docs/compliance"
-}
-
-def clear_chroma_db():
-    """Limpia la base de datos Chroma"""
-    if os.path.exists("./chroma_db"):
-        print("🗑️  Eliminando base de datos anterior...")
-        shutil.rmtree("./chroma_db")
-        print("✅ Base de datos eliminada")
-
-def index_category(category: str, docs_path: str):
-    """Indexa todos los PDFs de una categoría"""
-    print(f"\n📚 Indexando categoría: {category}")
-    print(f"📂 Ruta: {docs_path}")
-    
-    if not os.path.exists(docs_path):
-        print(f"⚠️  Directorio no existe: {docs_path}")
-        return
-    
-    # Obtener todos los PDFs
-    pdf_files = [f for f in os.listdir(docs_path) if f.endswith('.pdf')]
-    print(f"📄 Encontrados {len(pdf_files)} archivos PDF")
-    
-    all_documents = []
-    
-    # Procesar cada PDF
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(docs_path, pdf_file)
-        print(f"  ⏳ Procesando: {pdf_file}")
-        
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from content_registry import hash_file
+from index_registry import build_manifest
+
+DOCS_DIRECTORY = "docs"
+CHECKPOINT_FILE = os.path.join("chroma_db", "reindex_checkpoint.json")
+DEFAULT_WORKERS = 4
+MAX_LISTED_FILES = 10
+CHUNK_PAGE_SIZE = 1000
+
+
+class Checkpoint:
+    """
+    Avance de las construcciones de colecciones nuevas, por categoría y archivo.
+
+    {categoria: {"collection", "shards", "changed_only", "started_at",
+                 "files": {ruta: {"sha256", "chunks"}}}}
+    Se escribe de forma atómica (tmp + rename) después de cada archivo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
         try:
-            # Cargar PDF
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Dividir en chunks
-            chunks = text_splitter.split_documents(documents)
-            
-            # Agregar metadata
-            for chunk in chunks:
-                chunk.metadata['category'] = category
-                chunk.metadata['source_file'] = pdf_file
-            
-            all_documents.extend(chunks)
-            print(f"    ✅ {len(chunks)} chunks creados")
-            
-        except Exception as e:
-            print(f"    ❌ Error: {e}")
-    
-    # Crear vectorstore si hay documentos
-    if all_documents:
-        print(f"\n💾 Creando vectorstore para '{category}'...")
-        print(f"📊 Total de chunks: {len(all_documents)}")
-        
-        # Procesar en lotes de 100 documentos para evitar límite de tokens
-        BATCH_SIZE = 100
-        vectorstore = None
-        
-        for i in range(0, len(all_documents), BATCH_SIZE):
-            batch = all_documents[i:i + BATCH_SIZE]
-            batch_num = i // BATCH_SIZE + 1
-            total_batches = (len(all_documents) + BATCH_SIZE - 1) // BATCH_SIZE
-            
-            print(f"  📦 Procesando lote {batch_num}/{total_batches} ({len(batch)} chunks)...")
-            
-            if vectorstore is None:
-                # Crear el vectorstore con el primer lote
-                vectorstore = Chroma.from_documents(
-                    documents=batch,
-                    embedding=embeddings,
-                    collection_name=category,
-                    persist_directory="./chroma_db"
-                )
-            else:
-                # Agregar documentos al vectorstore existente
-                vectorstore.add_documents(batch)
-            
-            print(f"    ✅ Lote {batch_num} procesado")
-        
-        print(f"✅ Vectorstore '{category}' creado exitosamente")
-        
-        # Verificar
-        test_results = vectorstore.similarity_search("test", k=1)
-        print(f"✅ Verificación: {len(test_results)} documentos accesibles")
+            with open(path, 'r', encoding='utf-8') as f:
+                self._state: Dict[str, Dict] = json.load(f)
+        except FileNotFoundError:
+            self._state = {}
+
+    def get(self, category: str) -> Optional[Dict]:
+        with self._lock:
+            state = self._state.get(category)
+            return json.loads(json.dumps(state)) if state else None
+
+    def _write(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def save(self, category: str, state: Dict):
+        with self._lock:
+            self._state[category] = state
+            self._write()
+
+    def clear(self, category: str):
+        with self._lock:
+            if self._state.pop(category, None) is not None:
+                self._write()
+
+
+# ==================== DESCUBRIMIENTO Y DIFERENCIAS ====================
+
+def discover_categories(api) -> List[str]:
+    """Categorías con directorio en docs/ (nombres normalizados)."""
+    if not os.path.isdir(DOCS_DIRECTORY):
+        return []
+    return sorted({
+        api.normalize_category(name) for name in os.listdir(DOCS_DIRECTORY)
+        if os.path.isdir(os.path.join(DOCS_DIRECTORY, name)) and not name.startswith('.')
+    })
+
+
+def category_files(category: str) -> Dict[str, str]:
+    """{ruta: sha256} de los PDFs de una categoría en disco."""
+    docs_path = os.path.join(DOCS_DIRECTORY, category)
+    if not os.path.isdir(docs_path):
+        return {}
+    return {
+        os.path.join(docs_path, name): hash_file(os.path.join(docs_path, name))
+        for name in sorted(os.listdir(docs_path)) if name.endswith('.pdf')
+    }
+
+
+def diff_category(api, category: str) -> Dict:
+    """
+    Compara los PDFs en disco con el manifiesto de la colección activa.
+
+    Returns:
+        files ({ruta: sha256}), added, changed, removed, unchanged y
+        indexed (False si la categoría no tiene un índice activo con manifiesto)
+    """
+    files = category_files(category)
+    collection_name = api.index_registry.get_active(category)
+    manifest = api.index_registry.read_manifest(collection_name)
+    indexed = bool(manifest) and manifest.get("chunk_count", 0) > 0
+    indexed_files = manifest.get("source_files", {}) if indexed else {}
+
+    return {
+        "files": files,
+        "collection": collection_name if indexed else None,
+        "indexed": indexed,
+        "added": [path for path in files if path not in indexed_files],
+        "changed": [path for path, sha in files.items() if path in indexed_files and indexed_files[path] != sha],
+        "removed": [path for path in indexed_files if path not in files],
+        "unchanged": [path for path, sha in files.items() if indexed_files.get(path) == sha]
+    }
+
+
+# ==================== INDEXACIÓN ====================
+
+log_lock = threading.Lock()
+
+
+def log(category: str, message: str):
+    with log_lock:
+        print(f"[{category}] {message}", flush=True)
+
+
+def no_report(**fields):
+    pass
+
+
+def index_file(api, vectorstore, category: str, path: str) -> list:
+    """Reemplaza los chunks de un archivo en una colección; retorna los chunks nuevos."""
+    # Quita también los chunks de un intento interrumpido de este mismo archivo
+    vectorstore._collection.delete(where={"source": path})
+    splits = api.load_category_chunks(category, [path], no_report)
+    if splits:
+        api.add_chunks_in_batches(vectorstore, splits, no_report)
+    return splits
+
+
+def write_manifest(api, category: str, vectorstore, collection_name: str, source_files: Dict[str, str], shards: int):
+    """Manifiesto de una colección construida archivo por archivo."""
+    sample = vectorstore._collection.get(limit=1, include=["embeddings"])
+    api.index_registry.write_manifest(collection_name, build_manifest(
+        category=category,
+        collection_name=collection_name,
+        chunk_count=vectorstore._collection.count(),
+        dimension=len(sample["embeddings"][0]) if len(sample["embeddings"]) else None,
+        source_files=source_files,
+        shards=shards
+    ))
+
+
+def activate(api, category: str, collection_name: str, vectorstore):
+    """Activa una colección verificada, prepara sus índices derivados y avisa a la API."""
+    stale = api.index_registry.activate(category, collection_name)
+    api.serving_vectorstore(collection_name, vectorstore)
+    api.load_derived_indexes(category, collection_name, vectorstore._collection)
+    api.get_invalidation_bus().publish(category, api.SCOPE_INDEX)
+    for name in stale:
+        api.delete_collection(name)
+
+
+def discard_unrecorded_chunks(vectorstore, recorded: Dict[str, Dict]) -> int:
+    """
+    Elimina los chunks de archivos que el checkpoint no registra como terminados.
+
+    Un archivo con más de INDEX_BATCH_SIZE chunks se agrega en varios lotes:
+    si la ejecución se interrumpe a mitad de archivo, sus primeros lotes quedan
+    en la colección sin estar en el checkpoint.
+
+    Returns:
+        Número de chunks eliminados
+    """
+    collection = vectorstore._collection
+    before = collection.count()
+    sources = set()
+    for offset in range(0, before, CHUNK_PAGE_SIZE):
+        page = collection.get(limit=CHUNK_PAGE_SIZE, offset=offset, include=["metadatas"])
+        sources.update((metadata or {}).get("source") for metadata in page["metadatas"])
+
+    for source in sources - set(recorded) - {None}:
+        collection.delete(where={"source": source})
+    return before - collection.count()
+
+
+def copy_file_chunks(source, vectorstore, path: str) -> int:
+    """Copia los chunks de un archivo (con sus embeddings) desde otra colección; retorna cuántos."""
+    vectorstore._collection.delete(where={"source": path})
+    chunks = source._collection.get(where={"source": path}, include=["embeddings", "documents", "metadatas"])
+    for i in range(0, len(chunks["ids"]), CHUNK_PAGE_SIZE):
+        vectorstore._collection.add(
+            ids=chunks["ids"][i:i + CHUNK_PAGE_SIZE],
+            embeddings=chunks["embeddings"][i:i + CHUNK_PAGE_SIZE],
+            documents=chunks["documents"][i:i + CHUNK_PAGE_SIZE],
+            metadatas=chunks["metadatas"][i:i + CHUNK_PAGE_SIZE]
+        )
+    return len(chunks["ids"])
+
+
+def rebuild_category(api, category: str, diff: Dict, checkpoint: Checkpoint, changed_only: bool = False) -> Dict:
+    """
+    Construye, verifica y activa una colección nueva de la categoría (retomable).
+
+    Con changed_only los archivos sin cambios respecto al índice activo se
+    copian de él con sus embeddings en lugar de volver a procesarlos; solo se
+    embeben los agregados y modificados.
+    """
+    files = diff["files"]
+    state = checkpoint.get(category)
+
+    if state:
+        vectorstore = api.open_collection(state["collection"], shards=state["shards"])
+        discarded = discard_unrecorded_chunks(vectorstore, state["files"])
+        if discarded:
+            log(category, f"🧹 {discarded} chunks de un archivo a medias descartados")
+        expected = sum(f["chunks"] for f in state["files"].values())
+        if vectorstore._collection.count() != expected:
+            # La colección pendiente no coincide con el checkpoint: se descarta
+            log(category, f"⚠️ Checkpoint inconsistente ({state['collection']}), se empieza de nuevo")
+            api.delete_collection(state["collection"], shards=state["shards"])
+            state = None
+        else:
+            log(category, f"↩️ Retomando {state['collection']} ({len(state['files'])}/{len(files)} archivos listos)")
+
+    if not state:
+        shards = api.get_category_shards(category)
+        state = {
+            "collection": api.index_registry.new_version(category),
+            "shards": shards,
+            "changed_only": changed_only,
+            "started_at": datetime.now().isoformat(),
+            "files": {}
+        }
+        checkpoint.save(category, state)
+        vectorstore = api.open_collection(state["collection"], shards=shards)
+
+    collection_name = state["collection"]
+    mode = "changed-only" if state.get("changed_only") else "full"
+    # Archivos que se copian del índice activo en lugar de embeberlos
+    reusable = set(diff["unchanged"]) if state.get("changed_only") and diff["indexed"] else set()
+    active = api.open_collection(diff["collection"]) if reusable else None
+    resumed = copied = 0
+    for i, (path, sha256) in enumerate(files.items(), start=1):
+        if state["files"].get(path, {}).get("sha256") == sha256:
+            resumed += 1
+            continue
+        if path in reusable:
+            chunks = copy_file_chunks(active, vectorstore, path)
+            copied += 1
+        else:
+            chunks = len(index_file(api, vectorstore, category, path))
+            log(category, f"📄 {i}/{len(files)} {os.path.basename(path)}: {chunks} chunks")
+        state["files"][path] = {"sha256": sha256, "chunks": chunks}
+        checkpoint.save(category, state)
+    if copied:
+        log(category, f"📋 {copied} archivos sin cambios copiados del índice activo")
+    indexed = len(files) - resumed - copied
+    removed = len(diff["removed"]) if state.get("changed_only") else 0
+
+    # Archivos indexados en un intento anterior que ya no están en disco
+    for path in [p for p in state["files"] if p not in files]:
+        vectorstore._collection.delete(where={"source": path})
+        del state["files"][path]
+        checkpoint.save(category, state)
+
+    expected = sum(f["chunks"] for f in state["files"].values())
+    stored = vectorstore._collection.count()
+    if stored != expected:
+        api.delete_collection(collection_name, shards=state["shards"])
+        checkpoint.clear(category)
+        raise ValueError(f"New collection has {stored} chunks, expected {expected}")
+
+    api.get_content_registry().sync_category(category, list(files))
+    if not expected:
+        api.delete_collection(collection_name, shards=state["shards"])
+        checkpoint.clear(category)
+        log(category, "⚠️ Sin chunks para indexar")
+        return {"mode": mode, "files": len(files), "indexed": 0, "resumed": resumed, "removed": 0}
+
+    write_manifest(api, category, vectorstore, collection_name,
+                   {path: f["sha256"] for path, f in state["files"].items() if f["chunks"]}, state["shards"])
+    # La misma validación que hace la API al cargar, antes de activar
+    api.validate_manifest(api.index_registry.read_manifest(collection_name))
+    activate(api, category, collection_name, vectorstore)
+    checkpoint.clear(category)
+    return {"mode": mode, "files": len(files), "indexed": indexed, "resumed": resumed, "removed": removed}
+
+
+def process_category(api, category: str, changed_only: bool, checkpoint: Checkpoint) -> Dict:
+    inicio = time.perf_counter()
+    diff = diff_category(api, category)
+
+    # Sin índice activo --changed-only hace la completa; una construcción a
+    # medias se retoma en el modo con que empezó
+    pending = checkpoint.get(category)
+    incremental = pending.get("changed_only", False) if pending else changed_only and diff["indexed"]
+    if incremental and not pending and not (diff["added"] or diff["changed"] or diff["removed"]):
+        log(category, "✅ Sin cambios")
+        result = {"mode": "changed-only", "files": len(diff["files"]), "indexed": 0, "resumed": 0, "removed": 0}
+    elif incremental:
+        log(category, f"➕ {len(diff['added'])} nuevos, {len(diff['changed'])} modificados, "
+                      f"{len(diff['removed'])} eliminados")
+        result = rebuild_category(api, category, diff, checkpoint, changed_only=True)
     else:
-        print(f"⚠️  No se encontraron documentos para indexar en {category}")
+        log(category, f"🔄 Re-indexación completa ({len(diff['files'])} archivos)")
+        result = rebuild_category(api, category, diff, checkpoint)
+
+    result["duration"] = time.perf_counter() - inicio
+    return result
+
+
+# ==================== SALIDA ====================
+
+def print_diff(category: str, diff: Dict, checkpoint: Checkpoint):
+    pending = checkpoint.get(category)
+    print(f"\n📂 {category}: {len(diff['files'])} archivos"
+          + (f" (índice activo: {diff['collection']})" if diff["indexed"] else " (sin índice activo)"))
+    if pending:
+        print(f"   ↩️ Re-indexación completa pendiente en {pending['collection']} "
+              f"({len(pending['files'])} archivos listos)")
+    for label, key in (("➕ nuevos", "added"), ("✏️ modificados", "changed"), ("🗑️ eliminados", "removed")):
+        paths = diff[key]
+        if paths:
+            print(f"   {label}: {len(paths)}")
+            for path in paths[:MAX_LISTED_FILES]:
+                print(f"      - {os.path.basename(path)}")
+            if len(paths) > MAX_LISTED_FILES:
+                print(f"      ... y {len(paths) - MAX_LISTED_FILES} más")
+    print(f"   = sin cambios: {len(diff['unchanged'])}")
+
+
+def print_summary(api, categories: List[str], results: Dict[str, Dict], errors: Dict[str, str]):
+    print("\n📊 RESUMEN:")
+    print(f"  {'Categoría':<24}{'Modo':<14}{'Archivos':>9}{'Indexados':>10}{'Retomados':>10}"
+          f"{'Elim.':>7}{'Chunks':>9}{'Tiempo':>9}")
+    print("  " + "─" * 92)
+    for category in categories:
+        if category in errors:
+            print(f"  {category:<24}❌ {errors[category]}")
+            continue
+        result = results[category]
+        # Conteo exacto desde la colección activa y su manifiesto
+        collection_name = api.index_registry.get_active(category)
+        manifest = api.index_registry.read_manifest(collection_name)
+        chunks = api.open_collection(collection_name)._collection.count() if manifest else 0
+        warning = "" if not manifest or manifest["chunk_count"] == chunks else f"  ⚠️ manifiesto: {manifest['chunk_count']}"
+        print(f"  {category:<24}{result['mode']:<14}{result['files']:>9}{result['indexed']:>10}"
+              f"{result['resumed']:>10}{result['removed']:>7}{chunks:>9}{result['duration']:>8.1f}s{warning}")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Re-indexa los documentos de todas las categorías")
+    parser.add_argument("--categories", nargs="+", help="Categorías a procesar (por defecto todas las de docs/)")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Embebe solo los archivos agregados o modificados respecto al índice activo; "
+                             "el resto se copia a una colección nueva que se verifica y se activa")
+    parser.add_argument("--dry-run", action="store_true", help="Muestra las diferencias sin indexar")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Categorías en paralelo")
+    args = parser.parse_args()
+
+    # La lógica de colecciones, registro y caché vive en la API
+    import main as api
+
+    categories = ([api.normalize_category(c) for c in args.categories] if args.categories
+                  else discover_categories(api))
+    checkpoint = Checkpoint(CHECKPOINT_FILE)
+
     print("=" * 60)
-    print("🚀 RE-INDEXACIÓN DE DOCUMENTOS")
+    print("🔍 DIFERENCIAS CON EL ÍNDICE ACTIVO" if args.dry_run else "🚀 RE-INDEXACIÓN DE DOCUMENTOS")
     print("=" * 60)
-    
-    # Limpiar base de datos anterior
-    clear_chroma_db()
-    
-    # Indexar cada categoría
-    for category, docs_path in DOCS_CONFIG.items():
-        index_category(category, docs_path)
-    
+    print(f"📚 {len(categories)} categorías: {', '.join(categories) or '-'}")
+
+    if args.dry_run:
+        for category in categories:
+            print_diff(category, diff_category(api, category), checkpoint)
+        return
+
+    # Limpiar el caché de respuestas de las categorías re-indexadas (si hay MongoDB)
+    try:
+        api.mongo = api.get_mongo_manager()
+    except Exception as e:
+        print(f"⚠️ MongoDB no disponible, el caché de respuestas no se limpiará: {e}")
+
+    # Cliente Chroma y de embeddings compartidos por todos los threads; se
+    # crean antes porque su primera inicialización no admite concurrencia
+    api.get_chroma_client()
+    api.get_embeddings()
+
+    inicio = time.perf_counter()
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            category: executor.submit(process_category, api, category, args.changed_only, checkpoint)
+            for category in categories
+        }
+        for category, future in futures.items():
+            try:
+                results[category] = future.result()
+                if api.mongo and results[category]["indexed"] + results[category]["removed"]:
+                    api.mongo.clear_cache(category=category)
+            except Exception as e:
+                errors[category] = str(e)
+                log(category, f"❌ Error: {e}")
+
     print("\n" + "=" * 60)
-    print("✅ RE-INDEXACIÓN COMPLETADA")
+    print(f"{'⚠️ RE-INDEXACIÓN CON ERRORES' if errors else '✅ RE-INDEXACIÓN COMPLETADA'} "
+          f"en {time.perf_counter() - inicio:.1f}s")
     print("=" * 60)
-    
-    # Resumen final
-    print("\n📊 RESUMEN:")
-    for category in DOCS_CONFIG.keys():
-        try:
-            db = Chroma(
-                collection_name=category,
-                embedding_function=embeddings,
-                persist_directory="./chroma_db"
-            )
-            # Contar documentos (aproximado)
-            test = db.similarity_search("test", k=100)
-            print(f"  • {category}: ~{len(test)}+ documentos")
-        except Exception as e:
-            print(f"  • {category}: Error - {e}")
+    print_summary(api, categories, results, errors)
+    if errors:
+        print("\n↩️ Vuelve a ejecutar el script para retomar las categorías con error")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
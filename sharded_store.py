@@ -0,0 +1,299 @@
+"""
+Colecciones particionadas (shards) por categoría
+Una categoría grande reparte sus chunks en N colecciones Chroma según el hash
+de su archivo fuente ({coleccion}__s0 ... __s{N-1}); todos los chunks de un
+PDF viven en el mismo shard, así que reemplazar o borrar un archivo toca una
+sola colección.
+
+Las consultas se lanzan en paralelo a todos los shards y se fusionan por
+distancia antes de MMR, de modo que la latencia depende del shard más grande
+y no del total de la categoría.
+
+ShardedCollection imita la parte de la API de chromadb que usan la API y los
+índices derivados (count, get paginado, query, delete), por lo que BM25, el
+índice de documentos y la exportación NumPy funcionan sin cambios.
+"""
+
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from mmr import maximal_marginal_relevance
+
+SHARD_SUFFIX = "__s"
+
+# Hilos para consultar los shards en paralelo (compartidos por todo el proceso)
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+
+def shard_names(collection_name: str, shards: int) -> List[str]:
+    """Nombres de las colecciones shard de una colección lógica."""
+    return [f"{collection_name}{SHARD_SUFFIX}{i}" for i in range(shards)]
+
+
+def shard_for_source(source: str, shards: int) -> int:
+    """Shard de un archivo fuente (hash estable entre procesos, a diferencia de hash())."""
+    digest = hashlib.sha1((source or "").encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % shards
+
+
+def _source_of(where: Optional[Dict]) -> Optional[str]:
+    """Archivo fuente de un filtro {"source": x} o {"source": {"$eq": x}}; None si no aplica."""
+    if not where or list(where) != ["source"]:
+        return None
+    value = where["source"]
+    if isinstance(value, dict):
+        return value.get("$eq") if list(value) == ["$eq"] else None
+    return value
+
+
+def _merge_results(results: Sequence[Dict], include: Sequence[str]) -> Dict[str, Any]:
+    """Concatena resultados de get() de varios shards."""
+    merged: Dict[str, Any] = {"ids": [], "included": list(include)}
+    for field in include:
+        merged[field] = []
+    for result in results:
+        merged["ids"].extend(result["ids"])
+        for field in include:
+            values = result.get(field)
+            merged[field].extend(values if values is not None else [None] * len(result["ids"]))
+    return merged
+
+
+class ShardedCollection:
+    """Fachada sobre los shards con la API de una colección chromadb."""
+
+    def __init__(self, name: str, collections: Sequence):
+        """
+        Args:
+            name: Nombre lógico (versionado) de la colección
+            collections: Colecciones chromadb de cada shard, en orden
+        """
+        self.name = name
+        self.collections = list(collections)
+
+    def _route(self, where: Optional[Dict]) -> List:
+        """Shards que pueden contener chunks que cumplen el filtro."""
+        source = _source_of(where)
+        if source is None:
+            return self.collections
+        return [self.collections[shard_for_source(source, len(self.collections))]]
+
+    def _fan_out(self, function, collections: Sequence) -> List:
+        """Ejecuta function(colección) en paralelo y devuelve los resultados en orden."""
+        if len(collections) == 1:
+            return [function(collections[0])]
+        return list(_executor.map(function, collections))
+
+    def count(self) -> int:
+        return sum(self._fan_out(lambda collection: collection.count(), self.collections))
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        """
+        Lee chunks de los shards.
+
+        Sin ids ni filtro la paginación (limit/offset) recorre los shards en
+        orden, igual que sobre una colección única.
+        """
+        include = list(include)
+        if ids is None and where is None and (limit is not None or offset):
+            pages, skip, remaining = [], offset or 0, limit
+            for collection in self.collections:
+                if remaining is not None and remaining <= 0:
+                    break
+                size = collection.count()
+                if skip >= size:
+                    skip -= size
+                    continue
+                page = collection.get(limit=remaining, offset=skip, include=include)
+                pages.append(page)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page["ids"])
+            return _merge_results(pages, include)
+
+        merged = _merge_results(
+            self._fan_out(lambda collection: collection.get(ids=ids, where=where, include=include), self._route(where)),
+            include
+        )
+        if limit is not None or offset:
+            start = offset or 0
+            end = start + limit if limit is not None else None
+            for field in ["ids", *include]:
+                merged[field] = merged[field][start:end]
+        return merged
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10, where: Optional[Dict] = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        """Top n_results de cada shard en paralelo, fusionados por distancia."""
+        fields = [field for field in include if field != "distances"]
+        shard_results = self._fan_out(
+            lambda collection: collection.query(
+                query_embeddings=query_embeddings, n_results=n_results, where=where,
+                include=[*fields, "distances"]
+            ),
+            self._route(where)
+        )
+
+        merged: Dict[str, Any] = {"ids": [], "distances": [], "included": list(include)}
+        for field in fields:
+            merged[field] = []
+
+        for q in range(len(query_embeddings)):
+            candidates = [
+                (result["distances"][q][i], s, i)
+                for s, result in enumerate(shard_results)
+                for i in range(len(result["ids"][q]))
+            ]
+            candidates.sort(key=lambda candidate: candidate[0])
+            candidates = candidates[:n_results]
+
+            merged["ids"].append([shard_results[s]["ids"][q][i] for _, s, i in candidates])
+            merged["distances"].append([distance for distance, _, _ in candidates])
+            for field in fields:
+                merged[field].append([shard_results[s][field][q][i] for _, s, i in candidates])
+        return merged
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        """Agrega chunks ya embebidos al shard de su archivo fuente."""
+        groups = defaultdict(list)
+        for i, metadata in enumerate(metadatas):
+            groups[shard_for_source((metadata or {}).get("source", ""), len(self.collections))].append(i)
+
+        for shard, positions in groups.items():
+            self.collections[shard].add(
+                ids=[ids[i] for i in positions],
+                embeddings=[embeddings[i] for i in positions],
+                documents=[documents[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions]
+            )
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        self._fan_out(lambda collection: collection.delete(ids=ids, where=where), self._route(where))
+
+
+class ShardedVectorStore(VectorStore):
+    """Vectorstore sobre N colecciones Chroma particionadas por archivo fuente."""
+
+    def __init__(self, name: str, shards: Sequence[VectorStore], embedding: Embeddings):
+        """
+        Args:
+            name: Nombre lógico (versionado) de la colección
+            shards: Vectorstores Chroma de cada shard, en orden
+            embedding: Cliente de embeddings compartido
+        """
+        self.name = name
+        self.shards = list(shards)
+        self._embedding = embedding
+        self._collection = ShardedCollection(name, [shard._collection for shard in self.shards])
+
+    # ==================== INDEXACIÓN ====================
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        # Los shards se crean con open_collection; a un store abierto se agrega con add_texts
+        raise TypeError("ShardedVectorStore cannot be built from texts: open it with open_collection and call add_texts")
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Agrega chunks al shard de su archivo fuente (los shards se escriben en paralelo)."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+
+        groups = defaultdict(list)
+        for i, metadata in enumerate(metadatas):
+            groups[shard_for_source((metadata or {}).get("source", ""), len(self.shards))].append(i)
+
+        def add_group(item: Tuple[int, List[int]]) -> List[str]:
+            shard, positions = item
+            return self.shards[shard].add_texts(
+                [texts[i] for i in positions],
+                [metadatas[i] for i in positions],
+                ids=[ids[i] for i in positions] if ids else None,
+                **kwargs
+            )
+
+        added = [None] * len(texts)
+        items = list(groups.items())
+        for (_, positions), shard_ids in zip(items, self._collection._fan_out(add_group, items)):
+            for i, chunk_id in zip(positions, shard_ids):
+                added[i] = chunk_id
+        return added
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self._collection.delete(ids=ids)
+
+    # ==================== PROPIEDADES ====================
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _select_relevance_score_fn(self):
+        return self.shards[0]._select_relevance_score_fn()
+
+    # ==================== BÚSQUEDA ====================
+
+    def _query(self, embedding: List[float], k: int, filter: Optional[Dict],
+               include_embeddings: bool = False) -> List[Tuple[Document, float, Optional[List[float]]]]:
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        results = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter, include=include)
+        return [
+            (
+                Document(id=chunk_id, page_content=results["documents"][0][i], metadata=results["metadatas"][0][i] or {}),
+                float(results["distances"][0][i]),
+                results["embeddings"][0][i] if include_embeddings else None
+            )
+            for i, chunk_id in enumerate(results["ids"][0])
+        ]
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        results = self._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        documents = {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [documents[chunk_id] for chunk_id in ids if chunk_id in documents]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Top-k de todos los shards; la puntuación es la distancia de Chroma (menor = más cercano)."""
+        return [(doc, distance) for doc, distance, _ in self._query(embedding, k, filter)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, filter: Optional[Dict] = None,
+                                                **kwargs: Any) -> List[Document]:
+        """MMR sobre los fetch_k más cercanos del conjunto de shards."""
+        candidates = self._query(embedding, fetch_k, filter, include_embeddings=True)
+        if not candidates:
+            return []
+        selected, _ = maximal_marginal_relevance(
+            embedding, [vector for _, _, vector in candidates], k, lambda_mult
+        )
+        return [candidates[i][0] for i in selected]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, filter: Optional[Dict] = None,
+                                      **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
@@ -0,0 +1,111 @@
+"""
+Tablas de strings memory-mapped
+Guardan una lista de strings como un blob UTF-8 más un array de offsets, ambos
+abiertos con np.memmap: los workers de uvicorn comparten las mismas páginas
+del page cache del sistema operativo en lugar de tener cada uno su copia en
+objetos Python. Solo se decodifica el elemento que se lee.
+
+Opcionalmente se escribe un índice por hash (hashes ordenados + posición) para
+buscar la posición de un string sin construir un dict en cada proceso.
+"""
+
+import hashlib
+import os
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+BLOB_SUFFIX = ".bin"
+OFFSETS_SUFFIX = ".idx"
+HASHES_SUFFIX = ".hash"
+ORDER_SUFFIX = ".order"
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _open(path: str, dtype) -> np.ndarray:
+    """np.memmap de solo lectura (un archivo vacío no se puede mapear)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class StringTable:
+    """Lista de strings de solo lectura sobre archivos memory-mapped."""
+
+    def __init__(self, prefix: str):
+        """
+        Args:
+            prefix: Ruta base de los archivos ({prefix}.bin, {prefix}.idx, ...)
+        """
+        self.prefix = prefix
+        self._offsets = _open(prefix + OFFSETS_SUFFIX, np.int64)
+        self._blob = _open(prefix + BLOB_SUFFIX, np.uint8)
+
+        self._hashes = self._order = None
+        if os.path.exists(prefix + HASHES_SUFFIX):
+            self._hashes = _open(prefix + HASHES_SUFFIX, np.uint64)
+            self._order = _open(prefix + ORDER_SUFFIX, np.int64)
+
+    @staticmethod
+    def write(prefix: str, values: Iterable[str], lookup: bool = False) -> int:
+        """
+        Escribe una tabla.
+
+        Args:
+            lookup: Escribir también el índice por hash (para index_of)
+
+        Returns:
+            Número de strings escritos
+        """
+        offsets = [0]
+        hashes = []
+        with open(prefix + BLOB_SUFFIX, "wb") as blob:
+            for value in values:
+                data = (value or "").encode("utf-8")
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+                if lookup:
+                    hashes.append(_hash64(value or ""))
+
+        np.asarray(offsets, dtype=np.int64).tofile(prefix + OFFSETS_SUFFIX)
+        if lookup:
+            hashes = np.asarray(hashes, dtype=np.uint64)
+            order = np.argsort(hashes, kind="stable")
+            hashes[order].tofile(prefix + HASHES_SUFFIX)
+            order.astype(np.int64).tofile(prefix + ORDER_SUFFIX)
+        return len(offsets) - 1
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def take(self, indices: Sequence[int]) -> list:
+        return [self[int(i)] for i in indices]
+
+    def index_of(self, value: str) -> Optional[int]:
+        """Posición de un string (requiere la tabla escrita con lookup=True)."""
+        if self._hashes is None:
+            raise ValueError(f"String table '{self.prefix}' has no lookup index")
+
+        target = np.uint64(_hash64(value))
+        i = int(np.searchsorted(self._hashes, target))
+        while i < len(self._hashes) and self._hashes[i] == target:
+            position = int(self._order[i])
+            if self[position] == value:
+                return position
+            i += 1
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        extra = self._hashes.nbytes + self._order.nbytes if self._hashes is not None else 0
+        return int(self._blob.nbytes + self._offsets.nbytes + extra)
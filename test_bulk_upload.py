@@ -0,0 +1,73 @@
+"""
+Script de prueba para la subida masiva de PDFs
+
+Sube varios PDFs y un ZIP en una sola llamada a /categories/{name}/upload-bulk
+y verifica que se encola una única indexación incremental.
+"""
+
+import io
+import zipfile
+import requests
+
+# URL base de la API
+BASE_URL = "http://localhost:8000"
+CATEGORY = "test"
+PDF_FILE = "ikea_light_switch_manual.pdf"
+
+
+def build_zip() -> bytes:
+    """Crea un ZIP en memoria con dos copias del PDF de prueba y un archivo inválido."""
+    with open(PDF_FILE, "rb") as f:
+        pdf = f.read()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("manuales/bulk_zip_1.pdf", pdf)
+        archive.writestr("manuales/bulk_zip_2.pdf", pdf)
+        archive.writestr("manuales/notas.txt", "no es un PDF")
+    return buffer.getvalue()
+
+
+def test_bulk_upload():
+    """Sube PDFs sueltos + ZIP y muestra el resumen por archivo."""
+    print("=" * 60)
+    print("📦 TEST: Subida masiva (PDFs + ZIP)")
+    print("=" * 60)
+
+    with open(PDF_FILE, "rb") as f:
+        pdf = f.read()
+
+    files = [
+        ("files", ("bulk_1.pdf", pdf, "application/pdf")),
+        ("files", ("bulk_invalido.pdf", b"no es un PDF", "application/pdf")),
+        ("files", ("manuales.zip", build_zip(), "application/zip")),
+    ]
+
+    response = requests.post(f"{BASE_URL}/categories/{CATEGORY}/upload-bulk", files=files)
+
+    if response.status_code not in (202, 400):
+        print(f"❌ Error: {response.status_code}")
+        print(response.text)
+        return
+
+    data = response.json()
+    summary = data if response.status_code == 202 else data["detail"]
+
+    print(f"\n📊 Guardados: {summary['stored']} - Rechazados: {summary['rejected']}")
+    for result in summary["files"]:
+        icon = "✅" if result["status"] == "stored" else "❌"
+        print(f"   {icon} {result['filename']:<25} {result.get('error') or result.get('sha256', '')[:16]}")
+
+    if response.status_code == 202:
+        print(f"\n⚙️ Trabajo de indexación: {data['job_id']} ({data['status_url']})")
+
+
+if __name__ == "__main__":
+    try:
+        test_bulk_upload()
+        print("\n" + "=" * 60)
+        print("✅ Prueba completada")
+        print("=" * 60)
+    except requests.exceptions.ConnectionError:
+        print("\n❌ Error: No se puede conectar a la API")
+        print("   Asegúrate de que el servidor esté corriendo en http://localhost:8000")
@@ -0,0 +1,93 @@
+"""
+Script de prueba para la cola de indexación en segundo plano
+
+Sube un PDF, verifica que la API responde 202 con un job_id y consulta
+/jobs/{job_id} hasta que el trabajo termina.
+"""
+
+import requests
+import time
+
+# URL base de la API
+BASE_URL = "http://localhost:8000"
+CATEGORY = "test"
+PDF_FILE = "ikea_light_switch_manual.pdf"
+
+
+def wait_for_job(job_id: str, timeout: int = 300) -> dict:
+    """Consulta el estado del trabajo hasta que termine."""
+    start = time.time()
+    job = {}
+    while time.time() - start < timeout:
+        job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+        print(f"   ⏳ {job['status']:<10} etapa={job['stage']:<10} "
+              f"avance={job['progress']:.0%} chunks={job['chunks_done']}/{job['chunks_total']}")
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(1)
+    return job
+
+
+def test_upload_enqueues_job():
+    """La subida responde 202 de inmediato con un job_id."""
+    print("=" * 60)
+    print("📤 TEST 1: Subida encola re-indexación")
+    print("=" * 60)
+
+    start = time.time()
+    with open(PDF_FILE, "rb") as f:
+        response = requests.post(
+            f"{BASE_URL}/categories/{CATEGORY}/upload",
+            files={"file": (PDF_FILE, f, "application/pdf")}
+        )
+    elapsed = time.time() - start
+
+    if response.status_code == 400:
+        print(f"⚠️ {PDF_FILE} ya existe en '{CATEGORY}', se omite la subida")
+        return None
+
+    if response.status_code != 202:
+        print(f"❌ Error: {response.status_code}")
+        print(response.text)
+        return None
+
+    data = response.json()
+    print(f"✅ 202 en {elapsed:.2f}s - job_id: {data['job_id']}")
+    return data["job_id"]
+
+
+def test_duplicate_reindex_is_deduplicated():
+    """Dos re-indexaciones seguidas de la misma categoría comparten trabajo."""
+    print("\n" + "=" * 60)
+    print("🔁 TEST 2: Deduplicación de trabajos por categoría")
+    print("=" * 60)
+
+    first = requests.post(f"{BASE_URL}/categories/{CATEGORY}/reindex").json()
+    second = requests.post(f"{BASE_URL}/categories/{CATEGORY}/reindex").json()
+
+    if first["job_id"] == second["job_id"] and second["deduplicated"]:
+        print(f"✅ Trabajo reutilizado: {second['job_id']}")
+    else:
+        print(f"⚠️ Se crearon trabajos distintos: {first['job_id']} / {second['job_id']}")
+        print("   (puede ocurrir si el primero ya había empezado a procesarse)")
+
+    return second["job_id"]
+
+
+if __name__ == "__main__":
+    try:
+        job_id = test_upload_enqueues_job()
+        if job_id:
+            job = wait_for_job(job_id)
+            print(f"\n📊 Resultado: {job['status']} en {job['duration_seconds']}s - {job.get('result')}")
+
+        job_id = test_duplicate_reindex_is_deduplicated()
+        wait_for_job(job_id)
+
+        print("\n" + "=" * 60)
+        print("✅ Pruebas completadas")
+        print("=" * 60)
+
+    except requests.exceptions.ConnectionError:
+        print("\n❌ Error: No se puede conectar a la API")
+        print("   Asegúrate de que el servidor esté corriendo en http://localhost:8000")
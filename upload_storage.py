@@ -0,0 +1,264 @@
+"""
+Almacenamiento de archivos subidos por streaming
+Escribe la subida en disco por bloques de tamaño fijo mientras calcula su
+SHA-256, aplica un límite de tamaño configurable y mueve el archivo a su
+destino de forma atómica. También extrae PDFs desde archivos ZIP.
+
+FastAPI lee el cuerpo multipart completo (y lo vuelca a un temporal de
+Starlette) antes de llamar al endpoint, así que el límite que corta la
+transferencia lo aplica UploadSizeLimitMiddleware, antes de ese volcado.
+"""
+
+import hashlib
+import os
+import uuid
+import zipfile
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+# Tamaño de bloque de lectura (1 MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Límite de tamaño por archivo (configurable por variable de entorno)
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "100"))
+MAX_UPLOAD_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+
+# Máximo de archivos por subida masiva (incluye PDFs dentro de ZIPs)
+MAX_BULK_FILES = int(os.getenv("MAX_BULK_FILES", "200"))
+
+# Límite del cuerpo completo de una subida masiva
+MAX_BULK_UPLOAD_SIZE_MB = int(os.getenv("MAX_BULK_UPLOAD_SIZE_MB", "1024"))
+MAX_BULK_UPLOAD_SIZE = MAX_BULK_UPLOAD_SIZE_MB * 1024 * 1024
+
+# Margen para los encabezados multipart y los campos del formulario
+MULTIPART_OVERHEAD = 64 * 1024
+
+PDF_MAGIC = b"%PDF-"
+
+
+class _StreamingFileWriter:
+    """Escribe bloques en un temporal calculando hash y tamaño; publica al final."""
+
+    def __init__(self, filename: str, dest_dir: str, max_size: int):
+        self.filename = os.path.basename(filename)
+        self.final_path = os.path.join(dest_dir, self.filename)
+        self.max_size = max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+        if os.path.exists(self.final_path):
+            raise HTTPException(status_code=400, detail=f"File '{self.filename}' already exists")
+
+        os.makedirs(dest_dir, exist_ok=True)
+        self.tmp_path = os.path.join(dest_dir, f".{self.filename}.{uuid.uuid4().hex}.part")
+        self._buffer = open(self.tmp_path, "wb")
+
+    def write(self, chunk: bytes):
+        if self.size == 0 and not chunk.startswith(PDF_MAGIC):
+            raise HTTPException(status_code=400, detail=f"File '{self.filename}' is not a valid PDF")
+
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File '{self.filename}' exceeds the {self.max_size // (1024 * 1024)} MB limit"
+            )
+
+        self.sha256.update(chunk)
+        self._buffer.write(chunk)
+
+    def publish(self) -> Dict:
+        """Mueve el temporal a su nombre final de forma atómica."""
+        self._buffer.close()
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail=f"File '{self.filename}' is empty")
+
+        # os.link falla si el destino ya existe, así dos subidas simultáneas
+        # del mismo nombre no se pisan
+        try:
+            os.link(self.tmp_path, self.final_path)
+        except FileExistsError:
+            raise HTTPException(status_code=400, detail=f"File '{self.filename}' already exists")
+        except OSError:
+            # Sistemas de archivos sin hard links
+            os.replace(self.tmp_path, self.final_path)
+
+        return {
+            "filename": self.filename,
+            "path": self.final_path,
+            "size": self.size,
+            "sha256": self.sha256.hexdigest()
+        }
+
+    def cleanup(self):
+        self._buffer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+async def save_upload_streaming(file: UploadFile, dest_dir: str, max_size: int = MAX_UPLOAD_SIZE) -> Dict:
+    """
+    Copia un UploadFile a dest_dir por bloques, calculando su SHA-256.
+
+    El archivo se escribe primero en un temporal dentro de dest_dir (mismo
+    sistema de archivos) y solo se publica con su nombre final al terminar,
+    por lo que el indexador nunca ve un PDF a medio escribir.
+
+    Cuando se llama, Starlette ya recibió el cuerpo completo y lo volcó a su
+    propio temporal: la copia no usa más memoria que un bloque, pero el archivo
+    ocupa disco dos veces hasta que termina la petición, y max_size aquí solo
+    rechaza el archivo después de recibido. Para cortar la transferencia se
+    usa UploadSizeLimitMiddleware.
+
+    Args:
+        file: Archivo recibido por FastAPI
+        dest_dir: Directorio de destino (docs/{categoria})
+        max_size: Tamaño máximo permitido en bytes
+
+    Returns:
+        Dict con filename, path, size y sha256
+
+    Raises:
+        HTTPException: 400 si el archivo ya existe o no es PDF, 413 si supera el límite
+    """
+    writer = _StreamingFileWriter(file.filename, dest_dir, max_size)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.publish()
+    finally:
+        writer.cleanup()
+
+
+def extract_zip_pdfs(file: UploadFile, dest_dir: str, max_size: int = MAX_UPLOAD_SIZE,
+                     max_files: Optional[int] = None) -> List[Dict]:
+    """
+    Extrae los PDFs de un ZIP subido, miembro a miembro y por streaming.
+
+    Cada miembro se valida por separado; los errores no detienen el resto.
+
+    Args:
+        max_files: PDFs que se pueden guardar como máximo; los siguientes se
+                   rechazan sin escribirlos a disco
+
+    Returns:
+        Lista de resultados por archivo: {"filename", "status", ...}
+    """
+    results = []
+    stored = 0
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile:
+        return [{"filename": file.filename, "status": "rejected", "error": "Invalid ZIP archive"}]
+
+    with archive:
+        for member in archive.infolist():
+            name = os.path.basename(member.filename)
+            if member.is_dir() or not name or name.startswith(".") or "__MACOSX" in member.filename:
+                continue
+            if not name.lower().endswith(".pdf"):
+                results.append({"filename": name, "status": "rejected", "error": "Only PDF files are allowed"})
+                continue
+            if max_files is not None and stored >= max_files:
+                results.append({"filename": name, "status": "rejected", "error": "Too many files per upload"})
+                continue
+
+            try:
+                writer = _StreamingFileWriter(name, dest_dir, max_size)
+            except HTTPException as e:
+                results.append({"filename": name, "status": "rejected", "error": e.detail})
+                continue
+
+            try:
+                with archive.open(member) as source:
+                    for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                        writer.write(chunk)
+                results.append({**writer.publish(), "status": "stored"})
+                stored += 1
+            except HTTPException as e:
+                results.append({"filename": name, "status": "rejected", "error": e.detail})
+            except Exception as e:
+                results.append({"filename": name, "status": "rejected", "error": str(e)})
+            finally:
+                writer.cleanup()
+
+    return results
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Middleware ASGI que corta las subidas demasiado grandes antes de leerlas.
+
+    Rechaza con 413 según Content-Length sin leer el cuerpo y, si el cliente
+    no lo envía (chunked) o miente, deja de leer en cuanto lo recibido supera
+    el límite, antes de que Starlette lo vuelque completo a disco.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: Aplicación ASGI
+            limits: {sufijo de ruta: bytes máximos del cuerpo} para peticiones POST
+        """
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, scope) -> Optional[int]:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        for suffix, limit in self.limits.items():
+            if scope["path"].endswith(suffix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the {limit // (1024 * 1024)} MB limit"}
+        )
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await response(scope, receive, send)
+            return
+
+        state = {"received": 0, "too_large": False, "responded": False}
+
+        async def limited_receive():
+            if state["too_large"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    # El parser ve una desconexión y deja de leer el cuerpo
+                    state["too_large"] = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not state["too_large"]:
+                await send(message)
+            elif not state["responded"]:
+                # Reemplaza la respuesta de error del parser por el 413
+                state["responded"] = True
+                await response(scope, receive, send)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not state["too_large"]:
+                raise
+        if state["too_large"] and not state["responded"]:
+            state["responded"] = True
+            await response(scope, receive, send)
@@ -0,0 +1,182 @@
+"""
+Caché LRU de vectorstores con presupuesto de memoria
+Reemplaza el dict global vectorstore_cache: limita el número de entradas y la
+memoria estimada, expulsa las menos usadas recientemente y nunca expulsa una
+entrada que una consulta está usando (pin).
+
+Los bytes son una estimación. Expulsar un índice NumPy, BM25 o de documentos
+suelta su memoria; expulsar una colección de Chroma solo suelta el envoltorio,
+y sus segmentos HNSW los descarga el cliente de Chroma según su propia política
+(ver get_chroma_client en main.py).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# Presupuesto por defecto (configurable por variables de entorno)
+VECTORSTORE_CACHE_MAX_ENTRIES = int(os.getenv("VECTORSTORE_CACHE_MAX_ENTRIES", "64"))
+VECTORSTORE_CACHE_MAX_MB = int(os.getenv("VECTORSTORE_CACHE_MAX_MB", "1024"))
+
+# Estimación de memoria por chunk: vector float32 + enlaces del grafo HNSW
+# (M=16 vecinos, dos capas, ids de 4 bytes) + estructuras auxiliares
+DEFAULT_EMBEDDING_DIMENSION = 1536
+HNSW_BYTES_PER_CHUNK = 16 * 2 * 4
+OVERHEAD_BYTES_PER_CHUNK = 256
+
+
+def estimate_index_bytes(chunk_count: int, dimension: Optional[int]) -> int:
+    """Memoria aproximada que ocupa un índice cargado."""
+    dimension = dimension or DEFAULT_EMBEDDING_DIMENSION
+    return chunk_count * (dimension * 4 + HNSW_BYTES_PER_CHUNK + OVERHEAD_BYTES_PER_CHUNK)
+
+
+class VectorstoreCache:
+    """Caché LRU con interfaz de dict (in, [], del, pop, clear, len)."""
+
+    def __init__(self, max_entries: int = VECTORSTORE_CACHE_MAX_ENTRIES,
+                 max_memory_mb: int = VECTORSTORE_CACHE_MAX_MB,
+                 estimate_size: Optional[Callable[[Any], int]] = None):
+        """
+        Args:
+            max_entries: Máximo de vectorstores en memoria (0 = sin límite)
+            max_memory_mb: Presupuesto de memoria estimada en MB (0 = sin límite)
+            estimate_size: Función que estima los bytes de un vectorstore
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_memory_mb * 1024 * 1024
+        self.estimate_size = estimate_size or (lambda value: 0)
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ==================== INTERFAZ DE DICT ====================
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __getitem__(self, key: str):
+        with self._lock:
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            entry["uses"] += 1
+            return entry["value"]
+
+    def get(self, key: str, default=None):
+        """Consulta que cuenta como acierto/fallo en las estadísticas."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self[key]
+            self.misses += 1
+            return default
+
+    def __setitem__(self, key: str, value):
+        try:
+            size = int(self.estimate_size(value))
+        except Exception as e:
+            print(f"⚠️ No se pudo estimar memoria de '{key}': {e}")
+            size = 0
+
+        with self._lock:
+            self._entries[key] = {
+                "value": value,
+                "bytes": size,
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "uses": 0
+            }
+            self._entries.move_to_end(key)
+            self._evict(protect=key)
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            del self._entries[key]
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry["value"] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    # ==================== PIN / LRU ====================
+
+    @contextmanager
+    def pinned(self, *keys: str):
+        """Marca una o varias entradas como en uso durante el bloque (no se expulsan)."""
+        with self._lock:
+            for key in keys:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+                self._evict()
+
+    def _total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def _over_budget(self) -> bool:
+        if self.max_entries and len(self._entries) > self.max_entries:
+            return True
+        return bool(self.max_bytes) and self._total_bytes() > self.max_bytes
+
+    def _evict(self, protect: Optional[str] = None):
+        """Expulsa entradas LRU no fijadas hasta volver al presupuesto."""
+        for key in list(self._entries.keys()):
+            if not self._over_budget():
+                break
+            if key == protect or self._pins.get(key):
+                continue
+            entry = self._entries.pop(key)
+            self.evictions += 1
+            print(f"♻️ Vectorstore '{key}' expulsado del caché (estimado ~{entry['bytes'] / 1024 / 1024:.1f} MB)")
+
+    # ==================== ESTADÍSTICAS ====================
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "estimated_bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "items": [
+                    {
+                        "key": key,
+                        "estimated_bytes": entry["bytes"],
+                        "pinned": self._pins.get(key, 0),
+                        "uses": entry["uses"],
+                        "loaded_at": entry["loaded_at"],
+                        "last_used": entry["last_used"]
+                    }
+                    # Del más reciente al menos reciente
+                    for key, entry in reversed(self._entries.items())
+                ]
+            }